@@ -0,0 +1,107 @@
+"""Chunker throughput benchmark.
+
+Chunks a synthetic corpus with the current chunker and with the previous
+per-entry implementation (one ``encode`` per entry, one ``decode`` per
+window) and reports tokens/sec for each as JSON.
+
+    python -m benchmarks.chunker --entries 2000 --words 800 --snap
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from typing import Dict, Iterator, List
+
+from chunker import chunk_text, get_encoder
+from models import Chunk, RawEntry, db_settings
+
+_WORDS = (
+    "invoice refund policy warranty shipping order account password reset error code "
+    "device firmware update battery network latency timeout server region backup "
+    "license subscription billing cycle customer support ticket escalation manual "
+    "café naïve façade Zürich"
+).split()
+
+
+def synthetic_entries(n: int, words: int, seed: int = 0) -> List[RawEntry]:
+    rng = random.Random(seed)
+    entries = []
+    for i in range(n):
+        sentences = []
+        remaining = words
+        while remaining > 0:
+            length = min(remaining, rng.randint(6, 30))
+            sentences.append(" ".join(rng.choice(_WORDS) for _ in range(length)).capitalize() + ".")
+            remaining -= length
+        entries.append(
+            RawEntry(
+                document_name="bench.txt", page=i + 1, text=" ".join(sentences),
+                is_ocr=False, source="bench", chunk_index=i,
+            )
+        )
+    return entries
+
+
+def _baseline(entries: List[RawEntry]) -> Iterator[Chunk]:
+    """The pre-batching chunker, kept here as the reference point."""
+    encoder = get_encoder()
+    max_tokens, overlap = db_settings.MAX_TOKENS, db_settings.OVERLAP
+    for entry in entries:
+        tokens = encoder.encode(entry.text)
+        start = sub_idx = 0
+        while start < len(tokens):
+            end = min(start + max_tokens, len(tokens))
+            yield Chunk(
+                document_name=entry.document_name, page=entry.page,
+                text=encoder.decode(tokens[start:end]), is_ocr=entry.is_ocr,
+                source=entry.source, chunk_index=entry.chunk_index, sub_chunk_index=sub_idx,
+            )
+            sub_idx += 1
+            start += max_tokens - overlap
+
+
+def _run(fn, entries: List[RawEntry], tokens: int, repeat: int) -> Dict[str, float]:
+    best = float("inf")
+    chunks = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        chunks = sum(1 for _ in fn(entries))
+        best = min(best, time.perf_counter() - started)
+    return {"seconds": best, "chunks": chunks, "tokens_per_sec": tokens / best}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=800, help="words per entry")
+    parser.add_argument("--repeat", type=int, default=3, help="best of N runs")
+    parser.add_argument("--snap", action="store_true", help="enable sentence snapping")
+    args = parser.parse_args()
+
+    db_settings.CHUNK_SNAP_SENTENCES = args.snap
+    entries = synthetic_entries(args.entries, args.words)
+    encoder = get_encoder()
+    tokens = sum(len(t) for t in encoder.encode_ordinary_batch([e.text for e in entries]))
+    chunk_text(entries[:1]).__next__()  # build the byte-length table outside the timing
+
+    baseline = _run(_baseline, entries, tokens, args.repeat)
+    current = _run(chunk_text, entries, tokens, args.repeat)
+    report = {
+        "entries": len(entries),
+        "tokens": tokens,
+        "max_tokens": db_settings.MAX_TOKENS,
+        "overlap": db_settings.OVERLAP,
+        "threads": db_settings.CHUNKER_THREADS,
+        "batch_size": db_settings.CHUNKER_BATCH_SIZE,
+        "snap_sentences": args.snap,
+        "baseline": baseline,
+        "chunker": current,
+        "speedup": baseline["seconds"] / current["seconds"],
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
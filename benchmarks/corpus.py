@@ -0,0 +1,196 @@
+"""Synthetic PDF / DOCX / TXT corpora for the offline benchmarks.
+
+Documents are generated from a fixed vocabulary and a seed, so two runs
+with the same arguments ingest byte-identical files.  Text PDFs carry a
+text layer; "scanned" PDFs are page images only and go through OCR.
+
+    python -m benchmarks.corpus ./bench-corpus --docs 10 --pages 5
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List
+
+from docx import Document
+from PIL import Image, ImageDraw, ImageFont
+
+WORDS = (
+    "invoice refund policy warranty shipping order account password reset error code "
+    "device firmware update battery network latency timeout server region backup "
+    "license subscription billing cycle customer support ticket escalation manual "
+    "contract renewal discount payment method delivery address tracking number return "
+    "replacement repair technician appointment schedule outage maintenance window"
+).split()
+
+_LINE_CHARS = 90  # characters per line on generated PDF pages
+
+
+@dataclass
+class Corpus:
+    root: str
+    files: Dict[str, List[str]] = field(default_factory=dict)  # kind → paths
+    pages: int = 0
+    bytes: int = 0
+
+    def paths(self, *kinds: str) -> List[str]:
+        return [p for kind in (kinds or self.files) for p in self.files.get(kind, [])]
+
+    def as_dict(self) -> Dict:
+        out = asdict(self)
+        out["files"] = {kind: len(paths) for kind, paths in self.files.items()}
+        return out
+
+
+def paragraphs(rng: random.Random, words: int) -> List[str]:
+    """Sentences of 6–30 words grouped into paragraphs, ``words`` words in total."""
+    paras, sentences, remaining = [], [], words
+    while remaining > 0:
+        length = min(remaining, rng.randint(6, 30))
+        sentences.append(" ".join(rng.choice(WORDS) for _ in range(length)).capitalize() + ".")
+        remaining -= length
+        if len(sentences) >= rng.randint(3, 6):
+            paras.append(" ".join(sentences))
+            sentences = []
+    if sentences:
+        paras.append(" ".join(sentences))
+    return paras
+
+
+def _lines(text: str, width: int = _LINE_CHARS) -> List[str]:
+    lines, line = [], ""
+    for word in text.split():
+        if line and len(line) + 1 + len(word) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    if line:
+        lines.append(line)
+    return lines
+
+
+# ──────────────── Writers ────────────────
+def write_txt(path: str, pages: List[List[str]]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n\n".join(p for page in pages for p in page))
+
+
+def write_docx(path: str, pages: List[List[str]]) -> None:
+    doc = Document()
+    for page in pages:
+        for para in page:
+            doc.add_paragraph(para)
+    doc.save(path)
+
+
+def write_pdf(path: str, pages: List[List[str]]) -> None:
+    """Minimal PDF 1.4 writer: one Helvetica text stream per page."""
+    objects: List[bytes] = [b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    font_id, pages_id = 1, 2 + 2 * len(pages)
+    kids = []
+    for page in pages:
+        ops = ["BT /F1 10 Tf 12 TL 50 760 Td"]
+        for para in page:
+            ops.extend(f"({line}) Tj T*" for line in _lines(para))
+            ops.append("T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_id, len(objects), font_id)
+        )
+        kids.append(len(objects))
+    objects.append(
+        b"<< /Type /Pages /Kids [%s] /Count %d >>"
+        % (b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+    )
+    objects.append(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, len(objects), xref,
+    )
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def write_scanned_pdf(path: str, pages: List[List[str]]) -> None:
+    """Image-only PDF (no text layer), rendered at 150 dpi."""
+    font = ImageFont.load_default(size=22)
+    images = []
+    for page in pages:
+        image = Image.new("L", (1275, 1650), 255)
+        draw = ImageDraw.Draw(image)
+        y = 100
+        for para in page:
+            for line in _lines(para, width=80):
+                draw.text((100, y), line, fill=0, font=font)
+                y += 30
+            y += 20
+        images.append(image)
+    images[0].save(path, "PDF", resolution=150.0, save_all=True, append_images=images[1:])
+
+
+_WRITERS = {
+    "pdf": (write_pdf, "pdf"),
+    "docx": (write_docx, "docx"),
+    "txt": (write_txt, "txt"),
+    "scanned": (write_scanned_pdf, "pdf"),
+}
+
+
+def generate(
+    root: str,
+    docs: int = 5,
+    pages: int = 4,
+    words_per_page: int = 350,
+    scanned: int = 1,
+    seed: int = 0,
+) -> Corpus:
+    """Write ``docs`` files of each format (plus ``scanned`` image PDFs) under ``root``."""
+    os.makedirs(root, exist_ok=True)
+    rng = random.Random(seed)
+    corpus = Corpus(root=root)
+    counts = {"pdf": docs, "docx": docs, "txt": docs, "scanned": scanned}
+    for kind, count in counts.items():
+        write, ext = _WRITERS[kind]
+        for i in range(count):
+            content = [paragraphs(rng, words_per_page) for _ in range(pages)]
+            path = os.path.join(root, f"{kind}-{i:04d}.{ext}")
+            write(path, content)
+            corpus.files.setdefault(kind, []).append(path)
+            corpus.pages += pages
+            corpus.bytes += os.path.getsize(path)
+    return corpus
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("root", help="output directory")
+    parser.add_argument("--docs", type=int, default=5, help="documents per format")
+    parser.add_argument("--pages", type=int, default=4, help="pages per document")
+    parser.add_argument("--words-per-page", type=int, default=350)
+    parser.add_argument("--scanned", type=int, default=1, help="image-only PDFs (OCR)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    corpus = generate(
+        args.root, args.docs, args.pages, args.words_per_page, args.scanned, args.seed
+    )
+    print(json.dumps(corpus.as_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""ONNX vs PyTorch parity check and CPU benchmark.
+
+Embeds a synthetic corpus and scores (query, passage) pairs with both
+backends, then reports cosine drift of the embeddings, score drift of the
+cross-encoder and throughput of each backend as JSON.
+
+    python -m benchmarks.onnx_backend --texts 512 --quantized
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from model_registry import get_cross_encoder, get_sentence_transformer
+from models import db_settings
+
+_WORDS = (
+    "invoice refund policy warranty shipping order account password reset error code "
+    "device firmware update battery network latency timeout server region backup "
+    "license subscription billing cycle customer support ticket escalation manual"
+).split()
+
+
+def synthetic_texts(n: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [
+        " ".join(rng.choice(_WORDS) for _ in range(rng.randint(12, 120))) for _ in range(n)
+    ]
+
+
+def _timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - started
+
+
+def embedding_report(texts: List[str], quantized: bool, batch_size: int) -> Dict[str, float]:
+    torch_model = get_sentence_transformer(backend="torch")
+    onnx_model = get_sentence_transformer(backend="onnx", quantized=quantized)
+    # one warm-up call each so session / graph set-up is not timed
+    torch_model.encode(texts[:2]), onnx_model.encode(texts[:2])
+
+    ref, t_torch = _timed(
+        torch_model.encode, texts, batch_size=batch_size, normalize_embeddings=True
+    )
+    out, t_onnx = _timed(
+        onnx_model.encode, texts, batch_size=batch_size, normalize_embeddings=True
+    )
+    drift = 1.0 - np.sum(ref * out, axis=1)  # both unit-norm → 1 - cosine
+    return {
+        "texts": len(texts),
+        "cosine_drift_mean": float(drift.mean()),
+        "cosine_drift_max": float(drift.max()),
+        "torch_texts_per_sec": len(texts) / t_torch,
+        "onnx_texts_per_sec": len(texts) / t_onnx,
+        "speedup": t_torch / t_onnx,
+    }
+
+
+def reranker_report(texts: List[str], quantized: bool, batch_size: int) -> Dict[str, float]:
+    name = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    torch_model = get_cross_encoder(name, backend="torch")
+    onnx_model = get_cross_encoder(name, backend="onnx", quantized=quantized)
+    queries = synthetic_texts(max(1, len(texts) // 16), seed=1)
+    pairs = [(queries[i % len(queries)][:80], t) for i, t in enumerate(texts)]
+    torch_model.predict(pairs[:2]), onnx_model.predict(pairs[:2])
+
+    ref, t_torch = _timed(torch_model.predict, pairs, batch_size=batch_size)
+    out, t_onnx = _timed(onnx_model.predict, pairs, batch_size=batch_size)
+    ref, out = np.asarray(ref, dtype=float), np.asarray(out, dtype=float)
+    # rank agreement: Spearman correlation via Pearson on ranks
+    rank_corr = float(np.corrcoef(ref.argsort().argsort(), out.argsort().argsort())[0, 1])
+    return {
+        "pairs": len(pairs),
+        "score_drift_mean": float(np.abs(ref - out).mean()),
+        "score_drift_max": float(np.abs(ref - out).max()),
+        "rank_correlation": rank_corr,
+        "torch_pairs_per_sec": len(pairs) / t_torch,
+        "onnx_pairs_per_sec": len(pairs) / t_onnx,
+        "speedup": t_torch / t_onnx,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=db_settings.EMBED_BATCH_SIZE)
+    parser.add_argument("--quantized", action="store_true", help="compare against int8 ONNX")
+    parser.add_argument("--max-drift", type=float, default=None,
+                        help="exit non-zero if mean embedding cosine drift exceeds this")
+    args = parser.parse_args()
+
+    texts = synthetic_texts(args.texts)
+    report = {
+        "model": db_settings.EMBEDDING_MODEL_NAME,
+        "quantized": args.quantized,
+        "threads": db_settings.INFERENCE_THREADS,
+        "embedding": embedding_report(texts, args.quantized, args.batch_size),
+        "reranker": reranker_report(texts, args.quantized, args.batch_size),
+    }
+    print(json.dumps(report, indent=2))
+    if args.max_drift is not None and report["embedding"]["cosine_drift_mean"] > args.max_drift:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+"""Offline end-to-end benchmark: ingest stage throughput and query latency.
+
+Runs without any external service: Qdrant in local in-memory mode (or the
+embedded index with ``VECTOR_BACKEND=local``), a stub LLM in place of
+``ChatOpenAI`` and a generated PDF / DOCX / TXT corpus (see
+`benchmarks.corpus`).  Only the embedding and reranker models must be
+available locally (they are the code under test).
+
+Reports, as JSON:
+
+* ingest — parse, OCR, chunk, embed and upsert measured one stage at a
+  time, then `ingest_and_store` end to end (stages overlapped);
+* query  — p50 / p95 / p99 latency and requests/sec of ``POST /api/query``
+  at each requested concurrency, through the real ASGI app.
+
+Pass ``--baseline`` with an earlier result to flag regressions:
+
+    python -m benchmarks.pipeline --docs 10 --concurrency 1,8,32 --out run.json
+    python -m benchmarks.pipeline --docs 10 --concurrency 1,8,32 --baseline run.json
+"""
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+
+# Settings are read at import time, so the offline environment is set up
+# before any application module is imported.  The embedding cache is off so
+# that "embed" measures the model, not SQLite lookups of an earlier run.
+_STATE_DIR = tempfile.mkdtemp(prefix="rag-bench-")
+os.environ.update(
+    QDRANT_URL=":memory:",
+    EMBED_CACHE_ENABLED="false",
+    WARMUP_ON_STARTUP="false",
+    CONVERSATION_BACKEND="memory",
+    JOBS_DB_PATH=os.path.join(_STATE_DIR, "jobs.sqlite3"),
+    JOBS_SPOOL_DIR=os.path.join(_STATE_DIR, "uploads"),
+    LOCAL_INDEX_PATH=os.path.join(_STATE_DIR, "vector_index"),
+)
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import json  # noqa: E402
+import platform  # noqa: E402
+import random  # noqa: E402
+import time  # noqa: E402
+import uuid  # noqa: E402
+from datetime import datetime, timezone  # noqa: E402
+from typing import Any, AsyncIterator, Dict, List, Optional  # noqa: E402
+
+import httpx  # noqa: E402
+import numpy as np  # noqa: E402
+import pytesseract  # noqa: E402
+from langchain_core.messages import AIMessage, AIMessageChunk  # noqa: E402
+
+from benchmarks import corpus as corpus_gen  # noqa: E402
+from chunker import chunk_text  # noqa: E402
+from embedder import embed_text  # noqa: E402
+from models import db_settings  # noqa: E402
+from services.ingest_service import (  # noqa: E402
+    _to_points, chunk_point_id, ingest_and_store, parse_document,
+)
+from storage.vector_store import get_store  # noqa: E402
+
+
+# ──────────────── Stub LLM ────────────────
+class StubLLM:
+    """Stands in for `ChatOpenAI`: a fixed answer after ``latency_ms``.
+
+    The delay models network + generation time; it is awaited (not slept)
+    on the async paths, like a real HTTP call.
+    """
+
+    def __init__(self, latency_ms: float = 50.0, answer_words: int = 48) -> None:
+        self.latency = latency_ms / 1000
+        self.words = ["stub"] * answer_words
+
+    def invoke(self, prompt: str) -> AIMessage:
+        time.sleep(self.latency)
+        return AIMessage(content=" ".join(self.words))
+
+    async def ainvoke(self, prompt: str) -> AIMessage:
+        await asyncio.sleep(self.latency)
+        return AIMessage(content=" ".join(self.words))
+
+    async def astream(self, prompt: str) -> AsyncIterator[AIMessageChunk]:
+        delay = self.latency / len(self.words)
+        for word in self.words:
+            await asyncio.sleep(delay)
+            yield AIMessageChunk(content=word + " ")
+
+
+def _rate(count: float, seconds: float) -> float:
+    return count / seconds if seconds > 0 else 0.0
+
+
+def _batches(items: List, size: int) -> List[List]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+# ──────────────── Ingest ────────────────
+def ingest_report(corpus: corpus_gen.Corpus) -> Dict[str, Any]:
+    """Throughput of each ingest stage in isolation, then of the pipeline."""
+    batch = db_settings.INGEST_BATCH_SIZE
+    # warm-up: model load, tokenizer tables and collection creation are not timed
+    store = get_store()
+    store.ensure()
+    embed_text(["warm-up"])
+    list(chunk_text(parse_document(corpus.paths("txt")[0])))
+
+    # 1️⃣  parse (text layer / paragraphs)
+    parsed: Dict[str, list] = {}
+    started = time.perf_counter()
+    for path in corpus.paths("pdf", "docx", "txt"):
+        parsed[path] = list(parse_document(path))
+    seconds = time.perf_counter() - started
+    size = sum(os.path.getsize(p) for p in parsed)
+    stages: Dict[str, Dict[str, Any]] = {
+        "parse": {
+            "seconds": seconds,
+            "files": len(parsed),
+            "entries": sum(len(e) for e in parsed.values()),
+            "files_per_sec": _rate(len(parsed), seconds),
+            "mb_per_sec": _rate(size / 2**20, seconds),
+        }
+    }
+
+    # 2️⃣  OCR (image-only PDFs)
+    scanned = corpus.paths("scanned")
+    try:
+        started = time.perf_counter()
+        ocr_entries = {path: list(parse_document(path)) for path in scanned}
+        seconds = time.perf_counter() - started
+        pages = sum(len(e) for e in ocr_entries.values())
+        stages["ocr"] = {
+            "seconds": seconds,
+            "pages": pages,
+            "pages_per_sec": _rate(pages, seconds),
+        }
+        parsed.update(ocr_entries)
+    except pytesseract.TesseractNotFoundError:
+        stages["ocr"] = {"skipped": "tesseract is not installed"}
+
+    # 3️⃣  chunk
+    chunked: Dict[str, list] = {}
+    started = time.perf_counter()
+    for path, entries in parsed.items():
+        chunked[path] = list(chunk_text(entries))
+    seconds = time.perf_counter() - started
+    n_chunks = sum(len(c) for c in chunked.values())
+    stages["chunk"] = {
+        "seconds": seconds,
+        "entries": sum(len(e) for e in parsed.values()),
+        "chunks": n_chunks,
+        "chunks_per_sec": _rate(n_chunks, seconds),
+    }
+
+    # 4️⃣  embed (dense model + BM25 sparse vectors + payloads)
+    points = []
+    started = time.perf_counter()
+    for path, chunks in chunked.items():
+        document_id = str(uuid.uuid4())
+        for group in _batches(chunks, batch):
+            ids = [chunk_point_id(document_id, ch) for ch in group]
+            points.append(_to_points(group, ids, document_id, os.path.basename(path)))
+    seconds = time.perf_counter() - started
+    stages["embed"] = {
+        "seconds": seconds,
+        "chunks": n_chunks,
+        "chunks_per_sec": _rate(n_chunks, seconds),
+    }
+
+    # 5️⃣  upsert
+    started = time.perf_counter()
+    for group in points:
+        store.upsert(group)
+    seconds = time.perf_counter() - started
+    stages["upsert"] = {
+        "seconds": seconds,
+        "points": n_chunks,
+        "points_per_sec": _rate(n_chunks, seconds),
+    }
+
+    # 6️⃣  the real pipeline, stages overlapped, one file after the other
+    stored = 0
+    started = time.perf_counter()
+    for path in parsed:
+        stored += ingest_and_store(path, str(uuid.uuid4())).stored
+    seconds = time.perf_counter() - started
+    return {
+        "stages": stages,
+        "end_to_end": {
+            "seconds": seconds,
+            "files": len(parsed),
+            "chunks": stored,
+            "files_per_sec": _rate(len(parsed), seconds),
+            "chunks_per_sec": _rate(stored, seconds),
+        },
+    }
+
+
+# ──────────────── Query ────────────────
+def synthetic_queries(n: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [
+        f"What does the {rng.choice(corpus_gen.WORDS)} {rng.choice(corpus_gen.WORDS)} "
+        f"section say about {rng.choice(corpus_gen.WORDS)}?"
+        for _ in range(n)
+    ]
+
+
+def _latency_summary(latencies: List[float], errors: int, seconds: float) -> Dict[str, Any]:
+    ms = np.asarray(latencies) * 1000 if latencies else np.zeros(1)
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "seconds": seconds,
+        "requests_per_sec": _rate(len(latencies), seconds),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(ms.max()),
+    }
+
+
+async def _load(
+    client: httpx.AsyncClient, queries: List[str], concurrency: int, top_k: int
+) -> Dict[str, Any]:
+    """``concurrency`` clients issue ``queries`` back to back."""
+    latencies: List[float] = []
+    errors = 0
+    pending = iter(queries)
+
+    async def _client() -> None:
+        nonlocal errors
+        for query in pending:
+            started = time.perf_counter()
+            response = await client.post("/api/query", json={"query": query, "top_k": top_k})
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(_client() for _ in range(concurrency)))
+    return _latency_summary(latencies, errors, time.perf_counter() - started)
+
+
+async def query_report(
+    concurrency: List[int], requests: int, warmup: int, top_k: int, llm: StubLLM, seed: int
+) -> Dict[str, Any]:
+    import main  # the app builds its job queue / stores on import
+
+    results: Dict[str, Any] = {}
+    async with main.app.router.lifespan_context(main.app):
+        manager = await asyncio.to_thread(main.get_chatbot_manager)
+        manager.llm = llm
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench", timeout=None
+        ) as client:
+            await _load(client, synthetic_queries(warmup, seed=seed + 1), 1, top_k)
+            for level in concurrency:
+                queries = synthetic_queries(requests, seed=seed + level)
+                results[f"concurrency_{level}"] = await _load(client, queries, level, top_k)
+    return results
+
+
+# ──────────────── Comparison ────────────────
+def _flatten(report: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat: Dict[str, float] = {}
+    for key, value in report.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[prefix + key] = float(value)
+    return flat
+
+
+def regressions(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Throughputs (``*_per_sec``) that fell, or latency percentiles that rose,
+    by more than ``tolerance`` (a fraction) against ``baseline``."""
+    now, before = _flatten(current), _flatten(baseline)
+    found = []
+    for key, old in sorted(before.items()):
+        new = now.get(key)
+        if new is None or old <= 0:
+            continue
+        worse = (
+            key.endswith("_per_sec") and new < old * (1 - tolerance)
+            or key.endswith(("p50_ms", "p95_ms", "p99_ms")) and new > old * (1 + tolerance)
+        )
+        if worse:
+            found.append(f"{key}: {old:.2f} -> {new:.2f} ({(new - old) / old:+.0%})")
+    return found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=5, help="documents per format")
+    parser.add_argument("--pages", type=int, default=4, help="pages per document")
+    parser.add_argument("--words-per-page", type=int, default=350)
+    parser.add_argument("--scanned", type=int, default=1, help="image-only PDFs (OCR stage)")
+    parser.add_argument("--concurrency", default="1,8,32",
+                        help="comma-separated client counts for the query benchmark")
+    parser.add_argument("--requests", type=int, default=200, help="queries per concurrency level")
+    parser.add_argument("--warmup", type=int, default=10, help="untimed queries first")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0,
+                        help="stub LLM response time")
+    parser.add_argument("--answer-cache", action="store_true",
+                        help="keep the semantic answer cache on (off: every query runs fully)")
+    parser.add_argument("--skip-query", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="also write the JSON report to this file")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="allowed relative regression before exiting non-zero")
+    args = parser.parse_args()
+    db_settings.ANSWER_CACHE_ENABLED = args.answer_cache
+
+    try:
+        corpus = corpus_gen.generate(
+            os.path.join(_STATE_DIR, "corpus"),
+            args.docs, args.pages, args.words_per_page, args.scanned, args.seed,
+        )
+        report: Dict[str, Any] = {
+            "meta": {
+                "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "embedding_model": db_settings.EMBEDDING_MODEL_NAME,
+                "embedding_backend": db_settings.EMBEDDING_BACKEND,
+                "reranker_backend": db_settings.RERANKER_BACKEND,
+                "vector_backend": db_settings.VECTOR_BACKEND,
+                "hybrid_search": db_settings.HYBRID_SEARCH,
+                "args": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")},
+                "corpus": corpus.as_dict(),
+            },
+            "ingest": ingest_report(corpus),
+        }
+        if not args.skip_query:
+            levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+            report["query"] = asyncio.run(
+                query_report(
+                    levels, args.requests, args.warmup, args.top_k,
+                    StubLLM(args.llm_latency_ms), args.seed,
+                )
+            )
+    finally:
+        shutil.rmtree(_STATE_DIR, ignore_errors=True)
+
+    failed: Optional[List[str]] = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            failed = regressions(report, json.load(f), args.tolerance)
+        report["regressions"] = failed
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
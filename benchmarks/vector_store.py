@@ -0,0 +1,275 @@
+"""Vector store conformance checks and benchmark, shared by every backend.
+
+Runs the same checks (upsert / overwrite, filtered search, payload round
+trip, scoped deletes, reopen) and the same workload against:
+
+* ``qdrant``        — `QdrantStore` on an in-process Qdrant (``:memory:``);
+* ``local-float32`` / ``local-float16`` — `LocalVectorStore`, exact search;
+* ``local-hnsw``    — `LocalVectorStore` with HNSW (skipped without hnswlib).
+
+It reports upserts/sec, unfiltered and per-document search latency and
+recall@k against exact search as JSON.  It exits non-zero if any backend
+fails a check.
+
+    python -m benchmarks.vector_store --points 20000 --queries 200
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import tempfile
+import time
+import traceback
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from qdrant_client.http.models import PointStruct
+
+from models import db_settings
+from storage.local_index import LocalVectorStore
+from storage.vector_store import VECTOR_SIZE, VectorStore
+
+Factory = Callable[[], VectorStore]
+
+
+def _points(vectors: np.ndarray, document_ids: List[str], start: int = 0) -> List[PointStruct]:
+    return [
+        PointStruct(
+            id=str(uuid.uuid5(uuid.NAMESPACE_OID, f"{doc}:{start + i}")),
+            vector=vec.tolist(),
+            payload={
+                "document_id": doc,
+                "page": start + i,
+                "page_content": f"chunk {start + i} of {doc}",
+            },
+        )
+        for i, (vec, doc) in enumerate(zip(vectors, document_ids))
+    ]
+
+
+def _unit(rng: np.random.Generator, n: int) -> np.ndarray:
+    v = rng.standard_normal((n, VECTOR_SIZE)).astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+# ──────────────── Conformance ────────────────
+def conformance(make: Factory, reopen: Optional[Factory]) -> Dict[str, str]:
+    """Run every check on a fresh store; ``reopen`` opens the same storage again."""
+    rng = np.random.default_rng(0)
+    store = make()
+    store.ensure()
+    docs = [f"doc-{uuid.uuid4()}" for _ in range(3)]
+    vectors = _unit(rng, 60)
+    points = _points(vectors, [docs[i % 3] for i in range(60)])
+    by_doc = {d: {p.id for p in points if p.payload["document_id"] == d} for d in docs}
+    results: Dict[str, str] = {}
+
+    def check(name: str, fn: Callable[[], None]) -> None:
+        try:
+            fn()
+            results[name] = "ok"
+        except Exception as exc:  # report and keep going
+            results[name] = f"FAIL: {type(exc).__name__}: {exc}"
+            traceback.print_exc()
+
+    def upsert_and_count():
+        store.upsert(points)
+        assert store.count() >= len(points), store.count()
+        for doc in docs:
+            assert store.document_ids(doc) == by_doc[doc], doc
+
+    def nearest_is_self():
+        for i in (0, 17, 59):
+            hit = store.search(vectors[i].tolist(), limit=1)[0]
+            assert hit.id == points[i].id, (i, hit.id)
+            assert abs(hit.score - 1.0) < 1e-2, hit.score
+
+    def ordered_and_limited():
+        hits = store.search(vectors[5].tolist(), limit=10)
+        assert len(hits) == 10, len(hits)
+        scores = [h.score for h in hits]
+        assert scores == sorted(scores, reverse=True), scores
+
+    def filtered_search():
+        hits = store.search(vectors[0].tolist(), limit=50, document_id=docs[1])
+        assert {h.id for h in hits} == by_doc[docs[1]], len(hits)
+        assert store.search(vectors[0].tolist(), limit=5, document_id="no-such-doc") == []
+
+    def payload_round_trip():
+        hit = store.search(vectors[7].tolist(), limit=1)[0]
+        assert hit.payload == points[7].payload, hit.payload
+
+    def overwrite_in_place():
+        before = store.count()
+        moved = _unit(rng, 1)[0]
+        store.upsert([PointStruct(id=points[3].id, vector=moved.tolist(),
+                                  payload={**points[3].payload, "page": -1})])
+        assert store.count() == before, (store.count(), before)
+        hit = store.search(moved.tolist(), limit=1)[0]
+        assert hit.id == points[3].id and hit.payload["page"] == -1, hit
+
+    def scoped_delete_points():
+        victims = sorted(by_doc[docs[0]])[:5]
+        foreign = sorted(by_doc[docs[2]])[:1]
+        store.delete_points(docs[0], victims + foreign)  # foreign ID: not docs[0]'s
+        assert store.document_ids(docs[0]) == by_doc[docs[0]] - set(victims)
+        assert store.document_ids(docs[2]) == by_doc[docs[2]]
+        by_doc[docs[0]] -= set(victims)
+
+    def survives_reopen():
+        if reopen is None:
+            return
+        store.close()  # the local index admits one opener at a time
+        again = reopen()
+        again.ensure()
+        try:
+            for doc in docs:
+                assert again.document_ids(doc) == by_doc[doc], doc
+            hit = again.search(vectors[1].tolist(), limit=1)[0]
+            assert hit.id == points[1].id, hit.id
+        finally:
+            again.close()
+            store.ensure()
+
+    def delete_document():
+        store.delete_document(docs[0])
+        assert store.document_ids(docs[0]) == set()
+        assert store.search(vectors[0].tolist(), limit=5, document_id=docs[0]) == []
+        assert store.document_ids(docs[1]) == by_doc[docs[1]]
+        for doc in docs[1:]:
+            store.delete_document(doc)
+
+    for name, fn in [
+        ("upsert_and_count", upsert_and_count),
+        ("nearest_is_self", nearest_is_self),
+        ("ordered_and_limited", ordered_and_limited),
+        ("filtered_search", filtered_search),
+        ("payload_round_trip", payload_round_trip),
+        ("overwrite_in_place", overwrite_in_place),
+        ("scoped_delete_points", scoped_delete_points),
+        ("survives_reopen", survives_reopen),
+        ("delete_document", delete_document),
+    ]:
+        check(name, fn)
+    return results
+
+
+# ──────────────── Benchmark ────────────────
+def _latency(fn: Callable[[], Any], n: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(n):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    ms = np.asarray(samples) * 1000
+    return {
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "queries_per_sec": n / float(ms.sum() / 1000),
+    }
+
+
+def benchmark(make: Factory, n_points: int, n_queries: int, k: int, docs: int) -> Dict[str, Any]:
+    rng = np.random.default_rng(1)
+    store = make()
+    store.ensure()
+    vectors = _unit(rng, n_points)
+    doc_ids = [f"bench-{i % docs}" for i in range(n_points)]
+
+    started = time.perf_counter()
+    for start in range(0, n_points, 256):
+        store.upsert(_points(vectors[start:start + 256], doc_ids[start:start + 256], start))
+    upsert_seconds = time.perf_counter() - started
+
+    # queries near stored points, so the true neighbours are well defined
+    queries = vectors[rng.integers(0, n_points, n_queries)] + 0.05 * _unit(rng, n_queries)
+    exact = np.argsort(-(vectors @ queries.T), axis=0)[:k].T
+    id_of = [str(uuid.uuid5(uuid.NAMESPACE_OID, f"{d}:{i}")) for i, d in enumerate(doc_ids)]
+    found = 0
+    for q, truth in zip(queries, exact):
+        hits = {h.id for h in store.search(q.tolist(), limit=k)}
+        found += len(hits & {id_of[i] for i in truth})
+
+    it = iter(range(10**9))
+    report = {
+        "points": n_points,
+        "upserts_per_sec": n_points / upsert_seconds,
+        f"recall_at_{k}": found / (n_queries * k),
+        "search": _latency(lambda: store.search(queries[next(it) % n_queries].tolist(), limit=k),
+                           n_queries),
+        "filtered_search": _latency(
+            lambda: store.search(queries[next(it) % n_queries].tolist(), limit=k,
+                                 document_id=f"bench-{next(it) % docs}"),
+            n_queries,
+        ),
+    }
+    for i in range(docs):
+        store.delete_document(f"bench-{i}")
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--docs", type=int, default=50, help="documents the points spread over")
+    parser.add_argument("--backends", default="qdrant,local-float32,local-float16,local-hnsw")
+    parser.add_argument("--skip-benchmark", action="store_true", help="conformance only")
+    args = parser.parse_args()
+
+    db_settings.QDRANT_URL = ":memory:"  # never touch a configured server
+    db_settings.HYBRID_SEARCH = False
+    tmp = tempfile.mkdtemp(prefix="vector-store-bench-")
+    report: Dict[str, Any] = {}
+    try:
+        for name in args.backends.split(","):
+            if name == "local-hnsw":
+                try:
+                    import hnswlib  # noqa: F401
+                except ImportError:
+                    report[name] = {"skipped": "hnswlib is not installed"}
+                    continue
+            hnsw_min = 0 if name == "local-hnsw" else 10**12
+            path = f"{tmp}/{name}"
+            if name == "qdrant":
+                from storage.qdrant_client import QdrantStore
+
+                make, reopen = QdrantStore, None  # in-process Qdrant does not persist
+            else:
+                dtype = "float16" if name == "local-float16" else "float32"
+                make = reopen = (
+                    lambda p=path, d=dtype, m=hnsw_min: LocalVectorStore(
+                        p, VECTOR_SIZE, d, hnsw=m == 0, hnsw_min=m
+                    )
+                )
+            entry: Dict[str, Any] = {"conformance": conformance(make, reopen)}
+            if not args.skip_benchmark:
+                bench_path = f"{tmp}/{name}-bench"
+                bench_make = make if name == "qdrant" else (
+                    lambda p=bench_path, d=dtype, m=hnsw_min: LocalVectorStore(
+                        p, VECTOR_SIZE, d, hnsw=m == 0, hnsw_min=m
+                    )
+                )
+                entry["benchmark"] = benchmark(
+                    bench_make, args.points, args.queries, args.k, args.docs
+                )
+            report[name] = entry
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    print(json.dumps(report, indent=2))
+    failed = [
+        f"{name}.{check}"
+        for name, entry in report.items()
+        for check, outcome in entry.get("conformance", {}).items()
+        if outcome != "ok"
+    ]
+    if failed:
+        raise SystemExit(f"conformance failures: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
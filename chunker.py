@@ -1,51 +1,109 @@
-from typing import List
+import functools
+import itertools
+import re
+from typing import Iterable, Iterator, List
+
+import numpy as np
 import tiktoken
 
 from models import RawEntry, Chunk, db_settings
 
-def chunk_text(entries: List[RawEntry]) -> List[Chunk]:
+ENCODING_NAME = "cl100k_base"
+
+# a window may end early at one of these, if one falls in its last stretch
+_SENTENCE_END = re.compile(rb"[.!?][\"')\]]*(?=\s)|\n")
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoder() -> tiktoken.Encoding:
+    """Shared tokenizer, loaded once per process on first use."""
+    return tiktoken.get_encoding(ENCODING_NAME)
+
+
+@functools.lru_cache(maxsize=None)
+def _token_byte_lengths() -> np.ndarray:
+    """UTF-8 byte length of every token ID (lookup table, built once)."""
+    encoder = get_encoder()
+    lengths = np.zeros(encoder.max_token_value + 1, dtype=np.int64)
+    for token in range(encoder.n_vocab):
+        try:
+            lengths[token] = len(encoder.decode_single_token_bytes(token))
+        except KeyError:  # gaps in the vocabulary
+            pass
+    return lengths
+
+
+def _sentence_end(data: bytes, lo: int, hi: int) -> int:
+    """Byte offset just past the last sentence end in ``data[lo:hi]``, or -1."""
+    last = -1
+    for match in _SENTENCE_END.finditer(data, lo, hi):
+        last = match.end()
+    return last
+
+
+def _windows(entry: RawEntry, tokens: List[int]) -> Iterator[Chunk]:
+    """Slide the token window over one entry, slicing text by byte offsets."""
+    max_tokens = db_settings.MAX_TOKENS
+    overlap = db_settings.OVERLAP
+    snap = db_settings.CHUNK_SNAP_SENTENCES
+    snap_from = max_tokens - int(max_tokens * db_settings.CHUNK_SNAP_WINDOW)
+
+    # offsets[i] = byte position where token i starts; decoding each token
+    # span is replaced by slicing the UTF-8 text once per window
+    data = entry.text.encode("utf-8")
+    offsets = np.zeros(len(tokens) + 1, dtype=np.int64)
+    np.cumsum(_token_byte_lengths()[np.asarray(tokens, dtype=np.int64)], out=offsets[1:])
+
+    start = 0
+    sub_idx = 0
+    while start < len(tokens):
+        end = min(start + max_tokens, len(tokens))
+        if snap and end < len(tokens):
+            cut = _sentence_end(data, int(offsets[start + snap_from]), int(offsets[end]))
+            if cut > 0:
+                # first token starting at or after the sentence end (tiktoken
+                # keeps the following space on the next word's token)
+                end = int(np.searchsorted(offsets, cut, side="left"))
+
+        yield Chunk(
+            document_name=entry.document_name,
+            page=entry.page,
+            text=data[offsets[start]:offsets[end]].decode("utf-8", errors="replace"),
+            is_ocr=entry.is_ocr,
+            source=entry.source,
+            chunk_index=entry.chunk_index,
+            sub_chunk_index=sub_idx,
+        )
+
+        if end >= len(tokens):
+            break
+        # Advance window (always by at least one token)
+        sub_idx += 1
+        start = max(start + 1, end - overlap)
+
+
+def chunk_text(entries: Iterable[RawEntry]) -> Iterator[Chunk]:
     """
     Splits each RawEntry into smaller, overlapping token chunks.
 
+    Entries are tokenized in batches of ``CHUNKER_BATCH_SIZE`` across
+    ``CHUNKER_THREADS`` threads (tiktoken releases the GIL).  With
+    ``CHUNK_SNAP_SENTENCES`` a window ends at the last sentence boundary in
+    its final ``CHUNK_SNAP_WINDOW`` fraction, when there is one.
+
     Args:
-        entries (List[RawEntry]): List of raw text blocks extracted from documents.
+        entries (Iterable[RawEntry]): Raw text blocks extracted from documents;
+            consumed lazily, so parsers can stream pages.
 
-    Returns:
-        List[Chunk]: List of tokenized sub-chunks with metadata.
+    Yields:
+        Chunk: Tokenized sub-chunks with metadata, in input order.
     """
-    # Load tokenizer and settings
-    encoder = tiktoken.get_encoding("cl100k_base")
-    max_tokens = db_settings.MAX_TOKENS
-    overlap = db_settings.OVERLAP
-
-    chunks: List[Chunk] = []
-
-    for entry in entries:
-        # Tokenize the full text of this entry
-        tokens = encoder.encode(entry.text)
-        start = 0
-        sub_idx = 0
-
-        # Slide window over tokens
-        while start < len(tokens):
-            end = min(start + max_tokens, len(tokens))
-            chunk_tokens = tokens[start:end]
-            text_chunk = encoder.decode(chunk_tokens)
-
-            # Build Chunk model
-            chunk = Chunk(
-                document_name=entry.document_name,
-                page=entry.page,
-                text=text_chunk,
-                is_ocr=entry.is_ocr,
-                source=entry.source,
-                chunk_index=entry.chunk_index,
-                sub_chunk_index=sub_idx,
-            )
-            chunks.append(chunk)
-
-            # Advance window
-            sub_idx += 1
-            start += max_tokens - overlap
-
-    return chunks
+    encoder = get_encoder()
+    threads = max(1, db_settings.CHUNKER_THREADS)
+    it = iter(entries)
+    while batch := list(itertools.islice(it, db_settings.CHUNKER_BATCH_SIZE)):
+        token_lists = encoder.encode_ordinary_batch(
+            [entry.text for entry in batch], num_threads=threads
+        )
+        for entry, tokens in zip(batch, token_lists):
+            yield from _windows(entry, tokens)
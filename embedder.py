@@ -8,33 +8,41 @@ The code now detects ndarray vs list and coerces correctly.
 from __future__ import annotations
 
 import logging
-from typing import List, Sequence
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
 
 import requests
-from sentence_transformers import SentenceTransformer
 import numpy as np
+from langchain_core.embeddings import Embeddings
 
+import metrics
+from embedding_cache import EmbeddingCache
+from model_registry import embedding_model_key, get_sentence_transformer
 from models import db_settings
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 # ──────────────────────────────────────────────────────────────────────────────
-# Local Sentence‑Transformer model
+# Local Sentence‑Transformer model (shared via the model registry, lazy)
 # ──────────────────────────────────────────────────────────────────────────────
-try:
-    _local_model: SentenceTransformer | None = SentenceTransformer(
-        db_settings.EMBEDDING_MODEL_NAME, trust_remote_code=True
-    )
-    logger.info("Loaded local embedding model '%s'", db_settings.EMBEDDING_MODEL_NAME)
-except Exception as exc:  # pragma: no cover
-    logger.warning("Failed to load local embedding model: %s", exc)
-    _local_model = None
+
+def _local_model():
+    """Registry-owned model, or None when it cannot be loaded (→ HF API)."""
+    try:
+        return get_sentence_transformer()
+    except Exception as exc:  # pragma: no cover
+        logger.warning("Failed to load local embedding model: %s", exc)
+        return None
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Hugging Face Inference API fallback
 # ──────────────────────────────────────────────────────────────────────────────
-_USE_HF_API = "false"
+_USE_HF_API = db_settings.USE_HF_INFERENCE_API
 _HF_TOKEN = db_settings.HF_TOKEN
 _HF_ENDPOINT = (
     "https://api-inference.huggingface.co/pipeline/feature-extraction/"
@@ -69,26 +77,290 @@ def _to_list(vec) -> List[float]:
 
 
 # ──────────────────────────────────────────────────────────────────────────────
-# Public function
+# Model call
 # ──────────────────────────────────────────────────────────────────────────────
 
-def embed_text(text: str | Sequence[str]) -> List[float] | List[List[float]]:
-    """Generate embedding(s) for a single string or a list of strings."""
-    is_single = isinstance(text, str)
-    sentences: List[str] = [text] if is_single else list(text)  # type: ignore[arg-type]
-
+def _encode(sentences: List[str]) -> List[List[float]]:
+    """Run one model (or API) call over an already-batched list of strings."""
     try:
-        if _USE_HF_API or _local_model is None:
-            vectors = _embed_via_hf(sentences)
-        else:
-            # We request numpy for easy dtype management
-            raw = _local_model.encode(sentences, convert_to_numpy=True)
-            if raw.ndim == 1:
-                vectors = [_to_list(raw)]
-            else:
-                vectors = [_to_list(row) for row in raw]
+        model = None if _USE_HF_API else _local_model()
+        if model is None:
+            return _embed_via_hf(sentences)
+        # We request numpy for easy dtype management
+        raw = model.encode(
+            sentences,
+            batch_size=max(1, len(sentences)),
+            convert_to_numpy=True,
+        )
+        if raw.ndim == 1:
+            return [_to_list(raw)]
+        return [_to_list(row) for row in raw]
     except Exception as exc:
         logger.exception("Embedding failed")
         raise RuntimeError("Embedding generation error") from exc
 
-    return vectors[0] if is_single else vectors
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Micro-batching engine
+# ──────────────────────────────────────────────────────────────────────────────
+
+@dataclass
+class _Request:
+    texts: List[str]
+    future: Future
+    enqueued: float = field(default_factory=time.perf_counter)
+
+
+class EmbeddingBatcher:
+    """Coalesce embedding requests from concurrent callers into shared batches.
+
+    Callers submit lists of texts; a single worker thread drains the queue and
+    runs one model call per batch of up to ``batch_size`` texts.  A partially
+    filled batch is flushed once its oldest request has waited ``max_wait_ms``,
+    so a lone query never waits longer than that for company.
+
+    Requests of at most ``priority_max_texts`` texts (queries, small ingests)
+    go to a separate lane that is always drained first and never shares a
+    batch with bulk work, so a query waits for at most the batch already
+    running, not for every ingest slice queued ahead of it.
+    """
+
+    def __init__(
+        self, encode_fn, batch_size: int, max_wait_ms: float, priority_max_texts: int = 0
+    ) -> None:
+        self._encode = encode_fn
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.priority_max_texts = max(0, priority_max_texts)
+        self._cond = threading.Condition()
+        self._priority: Deque[_Request] = deque()
+        self._bulk: Deque[_Request] = deque()
+        self._worker: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._priority_batches = 0
+        self._texts = 0
+        self._requests = 0
+        self._max_batch = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    # ───────────────────── public API ─────────────────────
+    def submit(self, texts: Sequence[str], priority: Optional[bool] = None) -> Future:
+        """Queue ``texts`` for embedding and return a future of their vectors.
+
+        ``priority`` defaults to whether ``texts`` is small enough for the
+        priority lane.
+        """
+        req = _Request(texts=list(texts), future=Future())
+        if not req.texts:
+            req.future.set_result([])
+            return req.future
+        if priority is None:
+            priority = len(req.texts) <= self.priority_max_texts
+        self._ensure_worker()
+        with self._cond:
+            (self._priority if priority else self._bulk).append(req)
+            self._cond.notify()
+        return req.future
+
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        """Embed ``texts`` in ``batch_size`` slices and wait for all results."""
+        texts = list(texts)
+        priority = len(texts) <= self.priority_max_texts
+        futures = [
+            self.submit(texts[i : i + self.batch_size], priority)
+            for i in range(0, len(texts), self.batch_size)
+        ]
+        vectors: List[List[float]] = []
+        for fut in futures:
+            vectors.extend(fut.result())
+        return vectors
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            depth = len(self._priority) + len(self._bulk)
+        with self._lock:
+            return {
+                "batch_size": self.batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "priority_max_texts": self.priority_max_texts,
+                "batches": self._batches,
+                "priority_batches": self._priority_batches,
+                "requests": self._requests,
+                "texts": self._texts,
+                "avg_batch_size": self._texts / self._batches if self._batches else 0.0,
+                "max_batch_size": self._max_batch,
+                "avg_queue_wait_ms": (
+                    self._wait_total / self._requests * 1000 if self._requests else 0.0
+                ),
+                "max_queue_wait_ms": self._wait_max * 1000,
+                "queue_depth": depth,
+            }
+
+    # ───────────────────── worker ─────────────────────
+    def _ensure_worker(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="embedding-batcher", daemon=True
+                )
+                self._worker.start()
+
+    def _next_batch(self) -> Tuple[List[_Request], bool]:
+        """Block until work is queued; return one batch and whether it is priority."""
+        with self._cond:
+            while not (self._priority or self._bulk):
+                self._cond.wait()
+            lane = self._priority or self._bulk
+            first = lane.popleft()
+            pending = [first]
+            size = len(first.texts)
+            deadline = first.enqueued + self.max_wait
+
+            while size < self.batch_size:
+                if lane is self._bulk and self._priority:
+                    break  # don't hold a waiting query back for bulk company
+                if lane:
+                    if size + len(lane[0].texts) > self.batch_size:
+                        break  # stays at the head of its lane for the next batch
+                    req = lane.popleft()
+                    pending.append(req)
+                    size += len(req.texts)
+                    continue
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                self._cond.wait(timeout)
+            return pending, lane is self._priority
+
+    def _run(self) -> None:
+        while True:
+            pending, priority = self._next_batch()
+            self._dispatch(pending, priority)
+
+    def _dispatch(self, pending: List[_Request], priority: bool = False) -> None:
+        started = time.perf_counter()
+        texts = [t for req in pending for t in req.texts]
+        waits = [started - req.enqueued for req in pending]
+
+        with self._lock:
+            self._batches += 1
+            self._priority_batches += priority
+            self._requests += len(pending)
+            self._texts += len(texts)
+            self._max_batch = max(self._max_batch, len(texts))
+            self._wait_total += sum(waits)
+            self._wait_max = max(self._wait_max, *waits)
+
+        try:
+            vectors = self._encode(texts)
+        except Exception as exc:
+            for req in pending:
+                req.future.set_exception(exc)
+            return
+        metrics.EMBED_BATCH_SECONDS.observe(time.perf_counter() - started)
+        metrics.EMBED_BATCH_TEXTS.observe(len(texts))
+
+        offset = 0
+        for req in pending:
+            req.future.set_result(vectors[offset : offset + len(req.texts)])
+            offset += len(req.texts)
+
+
+_batcher = EmbeddingBatcher(
+    _encode,
+    batch_size=db_settings.EMBED_BATCH_SIZE,
+    max_wait_ms=db_settings.EMBED_MAX_WAIT_MS,
+    priority_max_texts=db_settings.EMBED_PRIORITY_MAX_TEXTS,
+)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Persistent embedding cache
+# ──────────────────────────────────────────────────────────────────────────────
+try:
+    _cache: EmbeddingCache | None = (
+        EmbeddingCache(db_settings.EMBED_CACHE_PATH, db_settings.EMBED_CACHE_MAX_ENTRIES)
+        if db_settings.EMBED_CACHE_ENABLED
+        else None
+    )
+except Exception as exc:  # pragma: no cover
+    logger.warning("Embedding cache disabled: %s", exc)
+    _cache = None
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Public function
+# ──────────────────────────────────────────────────────────────────────────────
+
+def embed_text(
+    text: str | Sequence[str], priority: bool = False
+) -> List[float] | List[List[float]]:
+    """Generate embedding(s) for a single string or a list of strings.
+
+    Cached vectors are returned without touching the model; the remaining
+    texts go through the shared micro-batcher, so concurrent single-text
+    calls (queries, small ingests) are merged into one model call.  With
+    ``priority`` the texts go to the priority lane as one request, i.e. one
+    model call ahead of queued ingest batches, whatever their number (a
+    batch of queries).
+    """
+    is_single = isinstance(text, str)
+    sentences: List[str] = [text] if is_single else list(text)  # type: ignore[arg-type]
+
+    def _embed(texts: List[str]) -> List[List[float]]:
+        if priority:
+            return _batcher.submit(texts, priority=True).result()
+        return _batcher.embed(texts)
+
+    if _cache is None:
+        vectors = _embed(sentences)
+        return vectors[0] if is_single else vectors
+
+    # torch and (int8) ONNX vectors differ: each variant has its own entries
+    model_name = embedding_model_key()
+    cached = _cache.get_many(model_name, sentences)
+    missing = list(dict.fromkeys(s for s, v in zip(sentences, cached) if v is None))
+    if missing:
+        fresh = dict(zip(missing, _embed(missing)))
+        _cache.put_many(model_name, missing, [fresh[s] for s in missing])
+        cached = [v if v is not None else fresh[s] for s, v in zip(sentences, cached)]
+
+    return cached[0] if is_single else cached  # type: ignore[return-value]
+
+
+class SharedEmbeddings(Embeddings):
+    """LangChain `Embeddings` adapter over `embed_text`.
+
+    Lets LangChain components reuse the registry model, the micro-batcher and
+    the persistent cache instead of loading a second copy of the model.
+    """
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return embed_text(texts)  # type: ignore[return-value]
+
+    def embed_query(self, text: str) -> List[float]:
+        return embed_text(text)  # type: ignore[return-value]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Many queries in one priority-lane model call (batch queries)."""
+        return embed_text(texts, priority=True)  # type: ignore[return-value]
+
+
+def embedding_stats() -> Dict[str, float]:
+    """Batch-size and queue-wait statistics of the embedding engine."""
+    return _batcher.stats()
+
+
+def flush_embedding_cache() -> None:
+    """Write the cache's pending LRU bookkeeping (call on shutdown)."""
+    if _cache is not None:
+        _cache.flush()
+
+
+def embedding_cache_stats() -> Dict[str, float]:
+    """Hit/miss counters and size of the persistent embedding cache."""
+    return _cache.stats() if _cache is not None else {"enabled": False}
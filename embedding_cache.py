@@ -0,0 +1,189 @@
+"""Embedding cache — persistent, content-addressed store of dense vectors.
+
+Vectors are keyed on ``sha256(model name + normalised text)`` and kept in a
+single SQLite file, so identical chunks (re-uploads, repeated headers,
+footers and disclaimers) are embedded once per model.  The table is bounded
+to ``max_entries`` rows; the least recently used rows are evicted first.
+
+Lookups do not write: hits are remembered in memory and their ``last_used``
+is written in one batch with the next `put_many` (or once enough hits have
+piled up), so the read path costs no commit.  The bound is checked against
+``SELECT COUNT(*)`` in the writing transaction, so several processes sharing
+the file still keep it to ``max_entries``.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_WS_RE = re.compile(r"\s+")
+# pending `last_used` updates are written once there are this many, or they are this old
+_TOUCH_BATCH = 1024
+_TOUCH_INTERVAL = 30.0
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for hashing: NFKC, collapsed whitespace, stripped."""
+    return _WS_RE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def cache_key(model_name: str, text: str) -> str:
+    digest = hashlib.sha256()
+    digest.update(model_name.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalize_text(text).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite-backed LRU cache of embedding vectors with hit/miss counters."""
+
+    def __init__(self, path: str, max_entries: int) -> None:
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key       TEXT PRIMARY KEY,
+                model     TEXT NOT NULL,
+                dim       INTEGER NOT NULL,
+                vector    BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)"
+        )
+        self._conn.commit()
+
+        self._entries = self._count()  # as of the last write; only for stats
+        self._touched: Dict[str, float] = {}
+        self._touched_since = time.monotonic()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    # ───────────────────── public API ─────────────────────
+    def get_many(self, model_name: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Return cached vectors aligned with ``texts`` (``None`` on miss)."""
+        keys = [cache_key(model_name, t) for t in texts]
+        found: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(keys))
+
+        with self._lock:
+            # SQLite caps bound parameters; 500 is well below every default.
+            for i in range(0, len(unique), 500):
+                part = unique[i : i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})",
+                    part,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).astype(float).tolist()
+            if found:
+                now = time.time()
+                if not self._touched:
+                    self._touched_since = time.monotonic()
+                self._touched.update((k, now) for k in found)
+                if (
+                    len(self._touched) >= _TOUCH_BATCH
+                    or time.monotonic() - self._touched_since >= _TOUCH_INTERVAL
+                ):
+                    self._write_touched()
+                    self._conn.commit()
+
+            result = [found.get(k) for k in keys]
+            hits = sum(1 for v in result if v is not None)
+            self._hits += hits
+            self._misses += len(result) - hits
+        return result
+
+    def put_many(
+        self, model_name: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]
+    ) -> None:
+        """Store ``vectors`` for ``texts`` and evict LRU rows above the bound."""
+        if not texts:
+            return
+        now = time.time()
+        rows = {}
+        for text, vec in zip(texts, vectors):
+            arr = np.asarray(vec, dtype=np.float32)
+            rows[cache_key(model_name, text)] = (model_name, arr.shape[0], arr.tobytes(), now)
+
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, model, dim, vector, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(k, *v) for k, v in rows.items()],
+            )
+            if self._conn.total_changes > before:
+                self._write_touched()  # before evicting, so recent hits are kept
+                self._entries = self._count()
+                if self._entries > self.max_entries:
+                    self._evict()
+            self._conn.commit()
+
+    def flush(self) -> None:
+        """Write pending ``last_used`` updates now."""
+        with self._lock:
+            if self._touched:
+                self._write_touched()
+                self._conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": self._entries,
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+            }
+
+    # ───────────────────── internals ─────────────────────
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _write_touched(self) -> None:
+        """Apply pending ``last_used`` updates (caller holds the lock and commits)."""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(t, k) for k, t in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _evict(self) -> None:
+        """Drop the oldest rows down to 90 % of capacity (caller holds the lock)."""
+        target = int(self.max_entries * 0.9)
+        excess = self._entries - target
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN "
+            "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+            (excess,),
+        )
+        self._evictions += excess
+        self._entries = target
+        logger.info("Embedding cache evicted %d entries", excess)
@@ -1,24 +1,142 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from typing import List
-import tempfile
 import os
+import shutil
+import tempfile
 import uuid
 import asyncio
+import json
 import logging
+import threading
+import time
 from pydantic import BaseModel
 
 from services.ingest_service import ingest_and_store
+from services.bulk_ingest import content_document_id, file_sha256, ingest_directory
 from services.rag_assistant import ChatbotManager
-from models import QueryRequest, QueryResponse
-from fastapi.responses import JSONResponse
-from typing import Dict, List
+from services.job_queue import BULK, IngestJobQueue, JobStore, QueueFullError
+from services.conversation_store import ConversationStore, create_backend
+from services.uploads import (
+    UploadSizeLimitMiddleware, extract_archive, spool_upload, unique_path,
+)
+from storage.vector_store import get_store
+from embedder import embedding_stats, embedding_cache_stats, flush_embedding_cache
+import metrics
+from metrics import InstrumentationMiddleware
+from model_registry import registry as model_registry, get_sentence_transformer
+from models import (
+    BatchQueryRequest, QueryRequest, QueryResponse, JobStatusResponse, db_settings,
+)
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# ChatbotManager is built on first use (or by the warm-up), not at import
+_chatbot_manager: ChatbotManager | None = None
+_manager_lock = threading.Lock()
+
+
+def get_chatbot_manager() -> ChatbotManager:
+    global _chatbot_manager
+    if _chatbot_manager is None:
+        with _manager_lock:
+            if _chatbot_manager is None:
+                _chatbot_manager = ChatbotManager()
+    return _chatbot_manager
+
+
+def _invalidate_answers(document_id: str) -> None:
+    # no manager yet → nothing cached yet
+    if _chatbot_manager is not None:
+        _chatbot_manager.invalidate_document(document_id)
+
+
+# Background ingest queue (jobs persisted in SQLite, files spooled to disk)
+job_queue = IngestJobQueue(
+    JobStore(db_settings.JOBS_DB_PATH),
+    handler=ingest_and_store,
+    workers=db_settings.JOB_WORKERS,
+    max_queued=db_settings.JOB_QUEUE_MAX,
+    on_finished=_invalidate_answers,
+    # bulk uploads: document IDs derived from file contents, so identical files
+    # share a document and a job re-run after a restart continues incrementally
+    bulk_handler=lambda path, job_id, **kw: ingest_directory(path, by_content=True, **kw),
+)
+
+# Startup timing report: phase → seconds, plus warm-up state for /api/ready
+startup_report: Dict[str, object] = {"phases": {}, "warmup": "pending", "error": None}
+_warmup_lock = threading.Lock()
+_warmup_retry_lock = threading.Lock()
+_warmup_attempted = float("-inf")  # monotonic time of the last warm-up start
+
+
+def _timed(phase: str, fn) -> None:
+    started = time.perf_counter()
+    fn()
+    startup_report["phases"][phase] = round(time.perf_counter() - started, 3)
+
+
+def _warm_up() -> None:
+    """Load heavy resources ahead of the first request (runs in a thread)."""
+    global _warmup_attempted
+    if not _warmup_lock.acquire(blocking=False):
+        return  # already running
+    _warmup_attempted = time.monotonic()
+    try:
+        if startup_report["warmup"] == "failed":
+            model_registry.reset_failures()  # a retry should really load again
+        startup_report["warmup"] = "running"
+        _timed("vector_store", get_store().ensure)
+        _timed("chatbot_manager", get_chatbot_manager)
+        _timed("embedding_model", get_sentence_transformer)
+        _timed("reranker_model", lambda: get_chatbot_manager().reranker)
+        startup_report["warmup"] = "done"
+        startup_report["error"] = None
+        logger.info("Warm-up finished: %s", startup_report["phases"])
+    except Exception as exc:
+        startup_report["warmup"] = "failed"
+        startup_report["error"] = str(exc)
+        logger.warning("Warm-up failed (will retry on /api/ready): %s", exc)
+    finally:
+        _warmup_lock.release()
+
+
+def _retry_warm_up() -> bool:
+    """Start another warm-up unless one started less than WARMUP_RETRY_SECONDS ago."""
+    global _warmup_attempted
+    with _warmup_retry_lock:
+        if time.monotonic() - _warmup_attempted < db_settings.WARMUP_RETRY_SECONDS:
+            return False
+        _warmup_attempted = time.monotonic()
+    threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
+    return True
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    os.makedirs(db_settings.JOBS_SPOOL_DIR, exist_ok=True)
+    _timed("job_queue", job_queue.start)
+    if db_settings.WARMUP_ON_STARTUP:
+        threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
+    else:
+        startup_report["warmup"] = "disabled"
+    startup_report["phases"]["startup"] = round(time.perf_counter() - started, 3)
+    logger.info("Startup phase finished: %s", startup_report["phases"])
+    yield
+    job_queue.stop(timeout=5)
+    flush_embedding_cache()
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title="RAG Chatbot API",
     description="API for ingesting documents, embedding them, and querying with RAG",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # CORS middleware to allow cross-origin requests
@@ -30,72 +148,213 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize ChatbotManager
-chatbot_manager = ChatbotManager()
-
-conversation_store: Dict[str, List[Dict[str, str]]] = {}  # {conv_id: [{q,r}, …]}
-
-logger = logging.getLogger(__name__)
+# Bounded conversation memory (token budget, idle TTL, LRU; pluggable backend)
+conversation_store = ConversationStore(
+    create_backend(), token_budget=db_settings.CONVERSATION_TOKEN_BUDGET
+)
 
 ALLOWED_EXT = {"pdf", "docx", "txt"}
 MAX_SIZE_MB = 100  # hard limit
+MAX_SIZE_BYTES = MAX_SIZE_MB * 1024 * 1024
+
+# Abort oversized bodies while they stream in (1 MB slack for multipart framing)
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_bytes=MAX_SIZE_BYTES + 1024 * 1024,
+    paths=("/api/embedding",),
+)
+BULK_MAX_BYTES = db_settings.BULK_MAX_MB * 1024 * 1024
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_bytes=BULK_MAX_BYTES + 1024 * 1024,
+    paths=("/api/batch/embedding",),
+)
+
+# Outermost: request latency histogram, Server-Timing header, sampled profiles
+app.add_middleware(InstrumentationMiddleware, server_timing=db_settings.SERVER_TIMING)
 
 
 class EmbeddingResponse(BaseModel):
+    job_id: str | None = None  # None for content ingested by a bulk job
     document_id: str
-    chunks_stored: int
-    status: str = "success"
+    status: str = "queued"
 
 
-@app.post("/api/embedding", response_model=EmbeddingResponse)
+@app.post("/api/embedding", response_model=EmbeddingResponse, status_code=202)
 async def ingest_document(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
+    priority: int = Form(10, ge=0, le=100),
+    document_id: str | None = Form(None),
 ):
+    """
+    Spool the upload and queue it for ingestion; poll GET /api/jobs/{job_id}.
+    Lower `priority` values are processed first.  Re-uploading identical
+    content returns the existing job with status "duplicate" (``job_id`` is
+    null when a bulk upload ingested that content).
+
+    Passing the `document_id` of an earlier upload re-ingests that document
+    incrementally: only changed chunks are embedded, removed ones deleted.
+    """
     # ◇ 1. Validate extension
     ext = file.filename.rsplit(".", 1)[-1].lower()
     if ext not in ALLOWED_EXT:
         raise HTTPException(415, f"File type .{ext} not supported")
 
-    # ◇ 2. Size check (StreamingUpload already in memory / spooled to disk)
-    size_mb = file.size / (1024 * 1024) if hasattr(file, "size") else None
-    if size_mb and size_mb > MAX_SIZE_MB:
-        raise HTTPException(413, f"File larger than {MAX_SIZE_MB} MB")
+    # ◇ 2. Stream to the spool dir in chunks: size limit + sha256 in one pass
+    upload = await spool_upload(
+        file, db_settings.JOBS_SPOOL_DIR, suffix=f".{ext}", max_bytes=MAX_SIZE_BYTES
+    )
 
-    document_id = str(uuid.uuid4())
+    # ◇ 3. Identical content already ingested (or in flight) → reuse it
+    duplicate = job_queue.find_duplicate(upload.sha256)
+    if duplicate is None and document_id is None:
+        duplicate = await asyncio.to_thread(_bulk_duplicate, upload.sha256)
+    if duplicate is not None and document_id in (None, duplicate["document_id"]):
+        os.remove(upload.path)
+        return EmbeddingResponse(
+            job_id=duplicate["id"],
+            document_id=duplicate["document_id"],
+            status="duplicate",
+        )
 
-    # ◇ 3. Save to a secure temp file
-    with tempfile.NamedTemporaryFile(suffix=f".{ext}", delete=False, dir="temp") as tmp:
-        content = await file.read()
-        tmp.write(content)
-        temp_path = tmp.name
+    document_id = document_id or str(uuid.uuid4())
+
+    # ◇ 4. Queue the CPU‑heavy ingest for the worker pool
+    try:
+        job_id = job_queue.submit(
+            upload.path, document_id, file.filename, priority, content_hash=upload.sha256
+        )
+    except QueueFullError as exc:
+        os.remove(upload.path)
+        raise HTTPException(503, str(exc))
+
+    return EmbeddingResponse(job_id=job_id, document_id=document_id)
+
+
+def _bulk_duplicate(sha256: str) -> Dict[str, Any] | None:
+    """Bulk jobs record no per-file hash; their files are stored under the
+    content-derived ID, which holds this content unless it was re-ingested
+    (or deleted) since."""
+    document_id = content_document_id(sha256)
+    if job_queue.has_document(document_id) or not get_store().document_ids(document_id):
+        return None
+    return {"id": None, "document_id": document_id}
 
-    async def cleanup(path: str):
-        try:
-            os.remove(path)
-        except FileNotFoundError:
-            pass
 
-    background_tasks.add_task(cleanup, temp_path)
+class BulkEmbeddingResponse(BaseModel):
+    job_id: str | None = None  # None when every file was a duplicate
+    files: List[str]  # queued for ingestion
+    document_ids: Dict[str, str] = {}  # file → document ID, duplicates included
+    duplicates: List[str] = []  # content already ingested (or in this upload twice)
+    rejected: List[str] = []
+    status: str = "queued"  # or "duplicate"
 
-    # ◇ 4. Off‑load CPU‑heavy ingest to thread pool
+
+@app.post("/api/batch/embedding", response_model=BulkEmbeddingResponse, status_code=202)
+async def ingest_documents_bulk(
+    files: List[UploadFile] = File(...),
+    priority: int = Form(20, ge=0, le=100),
+):
+    """
+    Queue many documents as one bulk job: several files and / or zip archives.
+    Files are parsed in parallel processes; GET /api/jobs/{job_id} reports
+    per-file results and files/sec + chunks/sec in `summary`.
+
+    Document IDs are derived from file contents and returned per file.
+    Content already uploaded through /api/embedding keeps its document ID
+    and is not ingested again, like a duplicate single upload.
+    """
+    spool_dir = tempfile.mkdtemp(prefix="bulk-", dir=db_settings.JOBS_SPOOL_DIR)
+    spooled: List[tuple[str, str]] = []  # (path, sha256)
+    accepted: List[str] = []
+    duplicates: List[str] = []
+    document_ids: Dict[str, str] = {}
+    rejected: List[str] = []
+    budget = BULK_MAX_BYTES
     try:
-        chunks_stored = await asyncio.to_thread(
-            ingest_and_store, temp_path, document_id
+        for file in files:
+            ext = (file.filename or "").rsplit(".", 1)[-1].lower()
+            if ext not in ALLOWED_EXT and ext != "zip":
+                rejected.append(file.filename)
+                continue
+            # ◇ stream to the job's spool dir under the budget left
+            upload = await spool_upload(file, spool_dir, suffix=f".{ext}", max_bytes=budget)
+            budget -= upload.size
+            if ext == "zip":
+                members = await asyncio.to_thread(
+                    extract_archive, upload.path, spool_dir, ALLOWED_EXT, budget
+                )
+                os.remove(upload.path)
+                budget -= sum(os.path.getsize(m) for m in members)
+                hashes = await asyncio.to_thread(lambda: [file_sha256(m) for m in members])
+                spooled.extend(zip(members, hashes))
+            else:
+                target = unique_path(spool_dir, file.filename)
+                os.replace(upload.path, target)
+                spooled.append((target, upload.sha256))
+        if not spooled:
+            raise HTTPException(415, "No supported documents (.pdf, .docx, .txt) in the upload")
+
+        # ◇ content seen before (an earlier upload, or this one) → not ingested again
+        for path, sha256 in spooled:
+            name = os.path.basename(path)
+            duplicate = job_queue.find_duplicate(sha256)
+            document_id = duplicate["document_id"] if duplicate else content_document_id(sha256)
+            if duplicate is not None or document_id in document_ids.values():
+                os.remove(path)
+                duplicates.append(name)
+            else:
+                accepted.append(name)
+            document_ids[name] = document_id
+        if not accepted:
+            shutil.rmtree(spool_dir, ignore_errors=True)
+            return BulkEmbeddingResponse(
+                files=[], document_ids=document_ids, duplicates=duplicates,
+                rejected=rejected, status="duplicate",
+            )
+
+        # ◇ one job for the whole batch; the spool dir is removed when it ends
+        job_id = job_queue.submit(
+            spool_dir, "", f"{len(accepted)} files", priority, kind=BULK
         )
-    except ValueError as ve:
-        # Parser raised unsupported / empty etc.
-        logger.warning("Ingest error: %s", ve)
-        raise HTTPException(400, str(ve))
-    except Exception as exc:
-        # Log full traceback, return generic 500
-        logger.exception("Fatal ingest error")
-        raise HTTPException(500, "Embedding failed, see server logs")
+    except QueueFullError as exc:
+        shutil.rmtree(spool_dir, ignore_errors=True)
+        raise HTTPException(503, str(exc))
+    except BaseException:
+        shutil.rmtree(spool_dir, ignore_errors=True)
+        raise
+    return BulkEmbeddingResponse(
+        job_id=job_id, files=accepted, document_ids=document_ids,
+        duplicates=duplicates, rejected=rejected,
+    )
 
-    if chunks_stored == 0:
-        raise HTTPException(400, "No valid text chunks found")
 
-    return EmbeddingResponse(document_id=document_id, chunks_stored=chunks_stored)
+@app.get("/api/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    """
+    Stage, chunk progress and error of an ingest job.
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Unknown job ID")
+    job["job_id"] = job.pop("id")
+    return JobStatusResponse(**job)
+
+def _open_conversation(conversation_id: str | None) -> tuple[str, str]:
+    """Validate an existing conversation ID or start a new one.
+
+    Returns ``(conversation_id, rendered prior turns)``; expired or evicted
+    conversations are rejected like unknown ones.
+    """
+    if conversation_id:
+        turns = conversation_store.history(conversation_id)
+        if turns is None:
+            raise HTTPException(
+                400, "Invalid conversation ID. Please start a new session."
+            )
+        return conversation_id, conversation_store.render(turns)
+    return conversation_store.create(), ""
+
 
 @app.post("/api/query", response_model=QueryResponse)
 async def query_documents(request: QueryRequest):
@@ -103,49 +362,26 @@ async def query_documents(request: QueryRequest):
     Query the indexed documents and return an answer (with citations if requested),
     while maintaining optional conversation history.
     """
-    # 1️⃣  conversation‑id handling
-    if request.conversation_id:
-        if request.conversation_id not in conversation_store:
-            raise HTTPException(
-                400, "Invalid conversation ID. Please start a new session."
-            )
-        conv_id = request.conversation_id
-    else:
-        conv_id = str(uuid.uuid4())
-        conversation_store[conv_id] = []
+    # 1️⃣  conversation‑id handling (+ prior turns, for the LLM prompt only)
+    conv_id, history = await asyncio.to_thread(_open_conversation, request.conversation_id)
 
-    # 2️⃣  pass document‑id filter to ChatbotManager
-    chatbot_manager.retriever.search_kwargs["filter"] = {
-        "document_id": request.document_id
-    }
+    chatbot_manager = await asyncio.to_thread(get_chatbot_manager)
 
-    # 3️⃣  include prior messages in prompt (simple linear memory)
-    history = conversation_store[conv_id]
-    if history:
-        prior_context = (
-            "\n".join(f"User: {h['query']}\nAssistant: {h['answer']}" for h in history)
-            + "\n\n"
-        )
-    else:
-        prior_context = ""
-
-    # 4️⃣  get answer from ChatbotManager (it already produces citations list)
-    # answer, citations = chatbot_manager.get_response(
-    #     prior_context + request.query,
-    #     top_k=request.top_k,
-    # )
-    answer, citations = chatbot_manager.get_response(
-        query=prior_context + request.query,
+    # 2️⃣  get answer from ChatbotManager (it already produces citations list);
+    #     the document filter and k are passed per call, never stored on the
+    #     shared manager; history only reaches the prompt
+    answer, citations = await chatbot_manager.aget_response(
+        query=request.query,
         top_k=request.top_k,
         document_id=request.document_id,
         require_citations=request.require_citations,
+        history=history,
     )
 
+    # 3️⃣  update conversation memory (trimmed to the token budget)
+    await asyncio.to_thread(conversation_store.append, conv_id, request.query, answer)
 
-    # 5️⃣  update conversation memory
-    history.append({"query": request.query, "answer": answer})
-
-    # 6️⃣  build response payload
+    # 4️⃣  build response payload
     resp_payload = {
         "answer": answer,
     }
@@ -162,14 +398,185 @@ async def query_documents(request: QueryRequest):
     )
 
 
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/api/query/stream")
+async def query_documents_stream(request: QueryRequest):
+    """
+    Server-Sent Events variant of /api/query.
+
+    Emits one `citations` event (with the conversation ID), then `token`
+    events as the LLM produces them, then `done`.  The conversation history
+    is updated once the answer has streamed completely.
+    """
+    conv_id, history = await asyncio.to_thread(_open_conversation, request.conversation_id)
+    chatbot_manager = await asyncio.to_thread(get_chatbot_manager)
+
+    async def events():
+        parts: List[str] = []
+        try:
+            async for kind, payload in chatbot_manager.astream_response(
+                query=request.query,
+                top_k=request.top_k,
+                document_id=request.document_id,
+                require_citations=request.require_citations,
+                history=history,
+            ):
+                if kind == "citations":
+                    body = {"conversation_id": conv_id}
+                    if request.require_citations:
+                        body["citations"] = payload
+                    yield _sse("citations", body)
+                else:
+                    parts.append(payload)
+                    yield _sse("token", {"text": payload})
+        except Exception:
+            logger.exception("Streaming query failed")
+            yield _sse("error", {"detail": "Query failed, see server logs"})
+            return
+
+        await asyncio.to_thread(
+            conversation_store.append, conv_id, request.query, "".join(parts)
+        )
+        yield _sse("done", {"conversation_id": conv_id})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/api/query/batch")
+async def query_documents_batch(request: BatchQueryRequest):
+    """
+    Answer many independent questions in one request (evaluation jobs,
+    upstream batch integrations).
+
+    Embedding, vector search and reranking run once for the whole batch;
+    the LLM calls run `QUERY_BATCH_LLM_CONCURRENCY` at a time.  Results come
+    back in request order, each with its own status: one failed answer does
+    not fail the batch.  No conversation memory is used or created.
+    """
+    if len(request.queries) > db_settings.QUERY_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            413, f"At most {db_settings.QUERY_BATCH_MAX_ITEMS} queries per batch"
+        )
+    chatbot_manager = await asyncio.to_thread(get_chatbot_manager)
+    outcomes = await chatbot_manager.aget_batch_responses(
+        [(item.query, item.top_k, item.document_id) for item in request.queries],
+        concurrency=db_settings.QUERY_BATCH_LLM_CONCURRENCY,
+    )
+
+    results = []
+    for index, (item, outcome) in enumerate(zip(request.queries, outcomes)):
+        if isinstance(outcome, BaseException):
+            logger.error("Batch query %d failed", index, exc_info=outcome)
+            results.append(
+                {"index": index, "status": "error", "detail": "Query failed, see server logs"}
+            )
+            continue
+        answer, citations = outcome
+        payload = {"answer": answer}
+        if item.require_citations:
+            payload["citations"] = citations
+        results.append({"index": index, "status": "success", "response": payload})
+
+    failed = sum(r["status"] == "error" for r in results)
+    return {
+        "status": "success" if not failed else "partial",
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "results": results,
+    }
+
+
+@app.delete("/api/documents/{document_id}")
+async def delete_document(document_id: str):
+    """
+    Remove every chunk of a document and drop answers cached for it.
+    Re-uploading the same file afterwards ingests it again as a new document.
+    """
+    await asyncio.to_thread(get_store().delete_document, document_id)
+    await asyncio.to_thread(job_queue.forget_document, document_id)
+    _invalidate_answers(document_id)
+    return {"status": "deleted", "document_id": document_id}
+
+
+@app.get("/api/stats")
+async def runtime_stats():
+    """
+    Runtime statistics of the ingest / query engines.
+    """
+    return {
+        "embedding": embedding_stats(),
+        "embedding_cache": embedding_cache_stats(),
+        "ingest_queue": {"queued": job_queue.queued()},
+        "answer_cache": (
+            _chatbot_manager.answer_cache.stats()
+            if _chatbot_manager is not None and _chatbot_manager.answer_cache is not None
+            # not built yet: it will be if enabled; built without one: disabled
+            else {"enabled": _chatbot_manager is None and db_settings.ANSWER_CACHE_ENABLED}
+        ),
+        "reranker": (
+            _chatbot_manager.reranker_engine.stats() if _chatbot_manager is not None else {}
+        ),
+        "conversations": await asyncio.to_thread(conversation_store.stats),
+        "models": model_registry.stats(),
+        "startup": startup_report,
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint (stage histograms, counters, token usage)."""
+    if not metrics.enabled():
+        raise HTTPException(
+            404, "Metrics disabled: install prometheus-client and set METRICS_ENABLED=true"
+        )
+    body, content_type = await asyncio.to_thread(metrics.exposition)
+    return Response(content=body, media_type=content_type)
+
+
 @app.get("/api/health")
 async def health_check():
     """
-    Simple health check endpoint.
+    Liveness probe: the process is up and serving; checks no dependencies.
     """
     return {"status": "healthy"}
 
 
+@app.get("/api/ready")
+async def readiness_check():
+    """
+    Readiness probe: vector store reachable and warm-up (if enabled) finished.
+    Returns 503 until then; a failed warm-up is retried in the background,
+    at most once per WARMUP_RETRY_SECONDS however often the probe runs.
+    """
+    checks: Dict[str, object] = {}
+    try:
+        await asyncio.to_thread(get_store().ping)
+        checks["vector_store"] = "ok"
+    except Exception as exc:
+        checks["vector_store"] = f"unreachable: {exc}"
+
+    if startup_report["warmup"] == "failed" and checks["vector_store"] == "ok":
+        _retry_warm_up()
+    checks["warmup"] = startup_report["warmup"]
+
+    ready = checks["vector_store"] == "ok" and checks["warmup"] in ("done", "disabled")
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "not_ready",
+            "checks": checks,
+            "startup": startup_report["phases"],
+        },
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,280 @@
+"""Instrumentation — Prometheus metrics, Server-Timing headers, sampled profiling.
+
+Ingest and query stages are timed with :func:`ingest_stage` /
+:func:`query_stage`.  Each timing is observed in a Prometheus histogram
+labelled by stage and, inside an HTTP request, added to that response's
+``Server-Timing`` header (see :class:`InstrumentationMiddleware`).
+
+``prometheus_client`` is optional: without it (or with
+``METRICS_ENABLED=false``) every metric is a no-op and ``/metrics`` reports
+that metrics are disabled; Server-Timing headers work either way.  With
+``PROFILE_SAMPLE_RATE > 0`` that fraction of requests and ingest jobs runs
+under the pyinstrument sampling profiler (optional as well), and an HTML
+report is written to ``PROFILE_DIR``.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+from models import db_settings
+
+try:
+    import prometheus_client
+except ImportError:  # optional dependency
+    prometheus_client = None
+
+logger = logging.getLogger(__name__)
+
+_STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+# ──────────────── Metric definitions ────────────────
+class _NoopMetric:
+    """Stands in for every metric when Prometheus is unavailable or disabled."""
+
+    def labels(self, *args: Any, **kwargs: Any) -> "_NoopMetric":
+        return self
+
+    def observe(self, value: float) -> None:
+        pass
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+
+_NOOP = _NoopMetric()
+
+
+def enabled() -> bool:
+    return prometheus_client is not None and db_settings.METRICS_ENABLED
+
+
+def _histogram(name: str, doc: str, labels: Tuple[str, ...] = (), buckets=_STAGE_BUCKETS):
+    if not enabled():
+        return _NOOP
+    return prometheus_client.Histogram(name, doc, labels, buckets=buckets)
+
+
+def _counter(name: str, doc: str, labels: Tuple[str, ...] = ()):
+    if not enabled():
+        return _NOOP
+    return prometheus_client.Counter(name, doc, labels)
+
+
+# ingest: parse / chunk / delete per document, embed / upsert per batch
+INGEST_STAGE_SECONDS = _histogram(
+    "rag_ingest_stage_seconds", "Time spent in each ingest stage", ("stage",)
+)
+INGEST_CHUNKS = _counter(
+    "rag_ingest_chunks", "Chunks by ingest outcome (stored / skipped / deleted)", ("result",)
+)
+INGEST_DOCUMENT_CHUNKS = _histogram(
+    "rag_ingest_document_chunks", "Chunks per ingested document",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000),
+)
+OCR_PAGES = _counter("rag_ingest_ocr_pages", "Pages / images whose text came from OCR")
+EMBED_BATCH_SECONDS = _histogram(
+    "rag_embed_batch_seconds", "Embedding model time per micro-batch"
+)
+EMBED_BATCH_TEXTS = _histogram(
+    "rag_embed_batch_texts", "Texts per embedding micro-batch",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512),
+)
+
+# query: embed / retrieve / rerank / llm
+QUERY_STAGE_SECONDS = _histogram(
+    "rag_query_stage_seconds", "Time spent in each query stage", ("stage",)
+)
+ANSWER_CACHE_LOOKUPS = _counter(
+    "rag_answer_cache_lookups", "Semantic answer cache lookups", ("result",)
+)
+LLM_TOKENS = _counter("rag_llm_tokens", "LLM tokens used (input / output)", ("kind",))
+
+HTTP_REQUEST_SECONDS = _histogram(
+    "rag_http_request_seconds", "HTTP request latency", ("method", "route", "status")
+)
+
+
+def exposition() -> Tuple[bytes, str]:
+    """Body and content type for ``/metrics``.
+
+    With ``PROMETHEUS_MULTIPROC_DIR`` set (several server workers), the
+    samples of all worker processes are aggregated.
+    """
+    registry = prometheus_client.REGISTRY
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
+
+
+# ──────────────── Stage timing ────────────────
+# (stage, seconds) of the current HTTP request; None outside requests
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar(
+    "request_timings", default=None
+)
+
+
+@contextmanager
+def _timed(histogram, stage: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        histogram.labels(stage).observe(seconds)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((stage, seconds))
+
+
+def ingest_stage(stage: str):
+    """Time the ``with`` block as ingest stage ``stage``."""
+    return _timed(INGEST_STAGE_SECONDS, stage)
+
+
+def query_stage(stage: str):
+    """Time the ``with`` block as query stage ``stage``."""
+    return _timed(QUERY_STAGE_SECONDS, stage)
+
+
+class IterTimer:
+    """Accumulates the time spent producing the items of wrapped iterables.
+
+    For lazy pipeline stages (parsing, chunking) that have no block to time.
+    """
+
+    def __init__(self) -> None:
+        self.seconds = 0.0
+
+    def wrap(self, iterable: Iterable) -> Iterator:
+        it = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            finally:
+                self.seconds += time.perf_counter() - started
+            yield item
+
+
+def record_llm_usage(message: Any) -> None:
+    """Count the tokens reported in a LangChain message's ``usage_metadata``."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    for kind in ("input", "output"):
+        tokens = usage.get(f"{kind}_tokens")
+        if tokens:
+            LLM_TOKENS.labels(kind).inc(tokens)
+
+
+# ──────────────── Sampled profiling ────────────────
+_profiler_missing_logged = False
+_profile_lock = threading.Lock()
+
+
+def _profiler_class():
+    global _profiler_missing_logged
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        if not _profiler_missing_logged:
+            _profiler_missing_logged = True
+            logger.warning("PROFILE_SAMPLE_RATE is set but pyinstrument is not installed")
+        return None
+    return Profiler
+
+
+@contextmanager
+def profiled(name: str, async_mode: str = "disabled") -> Iterator[None]:
+    """Run the block under pyinstrument for ``PROFILE_SAMPLE_RATE`` of calls.
+
+    Reports are written as ``PROFILE_DIR/<timestamp>-<name>.html``.  Use
+    ``async_mode="enabled"`` around ``await``s so that only the current
+    task is profiled.
+    """
+    rate = db_settings.PROFILE_SAMPLE_RATE
+    profiler_cls = _profiler_class() if rate > 0 and random.random() < rate else None
+    if profiler_cls is None:
+        yield
+        return
+
+    profiler = profiler_cls(
+        interval=db_settings.PROFILE_INTERVAL_MS / 1000, async_mode=async_mode
+    )
+    profiler.start()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", name).strip("_")[:80]
+        path = os.path.join(
+            db_settings.PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{slug}.html"
+        )
+        try:
+            with _profile_lock:
+                os.makedirs(db_settings.PROFILE_DIR, exist_ok=True)
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(profiler.output_html())
+            logger.info("Profile of %s written to %s", name, path)
+        except OSError as exc:
+            logger.warning("Could not write profile %s: %s", path, exc)
+
+
+# ──────────────── HTTP middleware ────────────────
+class InstrumentationMiddleware:
+    """Per-request latency histogram, ``Server-Timing`` header and profiling.
+
+    The header lists the stages timed while the response was prepared plus
+    ``total``; for streamed responses only the stages finished before the
+    first byte are included.
+    """
+
+    def __init__(self, app, server_timing: bool = True) -> None:
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: List[Tuple[str, float]] = []
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+        status = 500
+
+        async def timed_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    timings.append(("total", time.perf_counter() - started))
+                    header = ", ".join(f"{name};dur={s * 1000:.1f}" for name, s in timings)
+                    message = {
+                        **message,
+                        "headers": [*message.get("headers", []), (b"server-timing", header.encode())],
+                    }
+            await send(message)
+
+        try:
+            with profiled(f"{scope['method']} {scope['path']}", async_mode="enabled"):
+                await self.app(scope, receive, timed_send)
+        finally:
+            _request_timings.reset(token)
+            # route template, not the raw path: keeps IDs out of the label values
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route, str(status)).observe(
+                time.perf_counter() - started
+            )
@@ -0,0 +1,209 @@
+"""Model registry — one lazily loaded instance per model, shared process-wide.
+
+Ingest (embedder), retrieval (query embeddings) and reranking all ask the
+registry for their model instead of constructing their own, so each model
+is loaded at most once per process, on first use.  Load time and the
+resident-memory growth observed while loading are recorded per model.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Tuple
+
+from models import db_settings
+
+logger = logging.getLogger(__name__)
+
+
+def _rss_bytes() -> int:
+    """Current resident set size (falls back to peak RSS off Linux)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class _Failure:
+    """Last failed load of a model and when it may be retried."""
+
+    def __init__(self, exc: Exception, attempts: int, retry_at: float) -> None:
+        self.exc = exc
+        self.attempts = attempts
+        self.retry_at = retry_at
+
+
+class ModelRegistry:
+    """Thread-safe cache of loaded models keyed on ``(kind, name)``."""
+
+    def __init__(self, retry_base_seconds: float = 30.0, retry_max_seconds: float = 600.0) -> None:
+        self.retry_base = retry_base_seconds
+        self.retry_max = retry_max_seconds
+        self._models: Dict[Tuple[str, str], Any] = {}
+        self._failures: Dict[Tuple[str, str], _Failure] = {}
+        self._stats: Dict[Tuple[str, str], Dict[str, float]] = {}
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def get(self, kind: str, name: str, loader: Callable[[], Any]) -> Any:
+        """Return the model for ``(kind, name)``, calling ``loader`` on first use.
+
+        A failed load is remembered and re-raised, so callers falling back to
+        another backend do not retry the download on every request.  It is
+        retried once a backoff has passed (``retry_base`` doubling per failed
+        attempt, up to ``retry_max``), or after `reset_failures`.
+        """
+        key = (kind, name)
+        if key in self._models:
+            return self._models[key]
+        with self._guard:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            if key in self._models:
+                return self._models[key]
+            failure = self._failures.get(key)
+            if failure is not None and time.monotonic() < failure.retry_at:
+                raise failure.exc
+
+            rss_before = _rss_bytes()
+            started = time.perf_counter()
+            try:
+                model = loader()
+            except Exception as exc:
+                attempts = failure.attempts + 1 if failure is not None else 1
+                backoff = min(self.retry_max, self.retry_base * 2 ** (attempts - 1))
+                self._failures[key] = _Failure(exc, attempts, time.monotonic() + backoff)
+                logger.warning("Loading %s '%s' failed (retry in %.0fs): %s", kind, name, backoff, exc)
+                raise
+            self._failures.pop(key, None)
+            seconds = time.perf_counter() - started
+            rss_mb = (_rss_bytes() - rss_before) / (1024 * 1024)
+
+            self._stats[key] = {"load_seconds": seconds, "rss_delta_mb": rss_mb}
+            self._models[key] = model
+            logger.info("Loaded %s '%s' in %.2fs (+%.0f MB RSS)", kind, name, seconds, rss_mb)
+            return model
+
+    def reset_failures(self) -> None:
+        """Allow every failed model to be loaded again on its next use."""
+        with self._guard:
+            self._failures.clear()
+
+    def loaded(self, kind: str, name: str) -> bool:
+        return (kind, name) in self._models
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {f"{kind}:{name}": dict(s) for (kind, name), s in self._stats.items()}
+
+
+registry = ModelRegistry()
+
+
+# ──────────────── Inference backends ────────────────
+# "torch" runs the PyTorch weights; "onnx" runs the exported ONNX graph through
+# onnxruntime (optionally dynamic-int8 quantized), which is usually the faster
+# choice on CPU-only nodes.
+
+def _backend_kwargs(name: str, backend: str, quantized: bool, model_cls) -> Dict[str, Any]:
+    """Constructor kwargs selecting the backend for a sentence-transformers model."""
+    threads = db_settings.INFERENCE_THREADS
+    if backend == "torch":
+        if threads > 0:
+            import torch
+
+            torch.set_num_threads(threads)
+        return {}
+    if backend != "onnx":
+        raise ValueError(f"Unknown inference backend: {backend}")
+
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    if threads > 0:
+        options.intra_op_num_threads = threads
+    model_kwargs: Dict[str, Any] = {
+        "provider": "CPUExecutionProvider",
+        "session_options": options,
+    }
+    kwargs: Dict[str, Any] = {"backend": "onnx", "model_kwargs": model_kwargs}
+    if quantized:
+        path, file_name = _quantized_export(name, model_cls)
+        kwargs["model_name_or_path"] = path
+        model_kwargs["file_name"] = file_name
+    return kwargs
+
+
+def _quantized_export(name: str, model_cls) -> Tuple[str, str]:
+    """Export a dynamic-int8 ONNX copy of ``name`` once; return (dir, file name)."""
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    config = db_settings.ONNX_QUANTIZATION_CONFIG
+    target = os.path.join(db_settings.ONNX_EXPORT_DIR, name.replace("/", "__"))
+    file_name = f"onnx/model_qint8_{config}.onnx"
+    if not os.path.exists(os.path.join(target, file_name)):
+        logger.info("Exporting int8 ONNX model for '%s' to %s", name, target)
+        model = model_cls(name, backend="onnx")
+        model.save_pretrained(target)
+        export_dynamic_quantized_onnx_model(model, config, target)
+    return target, file_name
+
+
+def _variant(backend: str, quantized: bool) -> str:
+    return f"{backend}-int8" if backend == "onnx" and quantized else backend
+
+
+def embedding_model_key(
+    name: str | None = None,
+    backend: str | None = None,
+    quantized: bool | None = None,
+) -> str:
+    """``name@variant`` of the embedding model; variants produce different vectors."""
+    name = name or db_settings.EMBEDDING_MODEL_NAME
+    backend = backend or db_settings.EMBEDDING_BACKEND
+    quantized = db_settings.ONNX_QUANTIZED if quantized is None else quantized
+    return f"{name}@{_variant(backend, quantized)}"
+
+
+def get_sentence_transformer(
+    name: str | None = None,
+    backend: str | None = None,
+    quantized: bool | None = None,
+):
+    """Shared `SentenceTransformer` for ingest and query embeddings."""
+    name = name or db_settings.EMBEDDING_MODEL_NAME
+    backend = backend or db_settings.EMBEDDING_BACKEND
+    quantized = db_settings.ONNX_QUANTIZED if quantized is None else quantized
+
+    def _load():
+        from sentence_transformers import SentenceTransformer
+
+        kwargs = _backend_kwargs(name, backend, quantized, SentenceTransformer)
+        path = kwargs.pop("model_name_or_path", name)
+        return SentenceTransformer(path, trust_remote_code=True, **kwargs)
+
+    return registry.get("embedding", embedding_model_key(name, backend, quantized), _load)
+
+
+def get_cross_encoder(
+    name: str,
+    backend: str | None = None,
+    quantized: bool | None = None,
+):
+    """Shared `CrossEncoder` for reranking."""
+    backend = backend or db_settings.RERANKER_BACKEND
+    quantized = db_settings.ONNX_QUANTIZED if quantized is None else quantized
+
+    def _load():
+        from sentence_transformers import CrossEncoder
+
+        kwargs = _backend_kwargs(name, backend, quantized, CrossEncoder)
+        path = kwargs.pop("model_name_or_path", name)
+        return CrossEncoder(path, **kwargs)
+
+    return registry.get("reranker", f"{name}@{_variant(backend, quantized)}", _load)
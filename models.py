@@ -44,7 +44,85 @@ class Settings(BaseSettings):
     COLLECTION_NAME: str = config("QDRANT_COLLECTION", default="documents")
     MAX_TOKENS: int = config("MAX_TOKENS", cast=int, default=500)
     OVERLAP: int = config("OVERLAP", cast=int, default=50)
+    CHUNKER_THREADS: int = config("CHUNKER_THREADS", cast=int, default=min(8, os.cpu_count() or 1))
+    CHUNKER_BATCH_SIZE: int = config("CHUNKER_BATCH_SIZE", cast=int, default=32)
+    CHUNK_SNAP_SENTENCES: bool = config("CHUNK_SNAP_SENTENCES", cast=bool, default=False)
+    CHUNK_SNAP_WINDOW: float = config("CHUNK_SNAP_WINDOW", cast=float, default=0.2)
     EMBEDDING_MODEL_NAME: str = config("EMBEDDING_MODEL", default="BAAI/bge-small-en-v1.5")
+    INGEST_BATCH_SIZE: int = config("INGEST_BATCH_SIZE", cast=int, default=256)
+    INGEST_QUEUE_DEPTH: int = config("INGEST_QUEUE_DEPTH", cast=int, default=2)
+    PDF_WORKERS: int = config("PDF_WORKERS", cast=int, default=min(4, os.cpu_count() or 1))
+    PDF_PAGES_PER_SHARD: int = config("PDF_PAGES_PER_SHARD", cast=int, default=8)
+    OCR_MAX_CONCURRENCY: int = config("OCR_MAX_CONCURRENCY", cast=int, default=2)
+    BULK_WORKERS: int = config("BULK_WORKERS", cast=int, default=min(4, os.cpu_count() or 1))
+    BULK_INGEST_THREADS: int = config("BULK_INGEST_THREADS", cast=int, default=4)
+    BULK_MAX_MB: int = config("BULK_MAX_MB", cast=int, default=1024)
+    JOBS_DB_PATH: str = config("JOBS_DB_PATH", default="cache/jobs.sqlite3")
+    JOBS_SPOOL_DIR: str = config("JOBS_SPOOL_DIR", default="cache/uploads")
+    JOB_WORKERS: int = config("JOB_WORKERS", cast=int, default=2)
+    JOB_QUEUE_MAX: int = config("JOB_QUEUE_MAX", cast=int, default=100)
+    ANSWER_CACHE_ENABLED: bool = config("ANSWER_CACHE_ENABLED", cast=bool, default=True)
+    ANSWER_CACHE_THRESHOLD: float = config("ANSWER_CACHE_THRESHOLD", cast=float, default=0.95)
+    ANSWER_CACHE_TTL_SECONDS: float = config("ANSWER_CACHE_TTL_SECONDS", cast=float, default=3600)
+    ANSWER_CACHE_MAX_ENTRIES: int = config("ANSWER_CACHE_MAX_ENTRIES", cast=int, default=1000)
+    WARMUP_ON_STARTUP: bool = config("WARMUP_ON_STARTUP", cast=bool, default=True)
+    WARMUP_RETRY_SECONDS: float = config("WARMUP_RETRY_SECONDS", cast=float, default=30.0)
+    EMBEDDING_BACKEND: str = config("EMBEDDING_BACKEND", default="torch")  # torch | onnx
+    RERANKER_BACKEND: str = config("RERANKER_BACKEND", default="torch")  # torch | onnx
+    ONNX_QUANTIZED: bool = config("ONNX_QUANTIZED", cast=bool, default=False)
+    ONNX_QUANTIZATION_CONFIG: str = config("ONNX_QUANTIZATION_CONFIG", default="avx512_vnni")
+    ONNX_EXPORT_DIR: str = config("ONNX_EXPORT_DIR", default="cache/onnx")
+    INFERENCE_THREADS: int = config("INFERENCE_THREADS", cast=int, default=0)  # 0 = runtime default
+    RERANK_POOL_FACTOR: int = config("RERANK_POOL_FACTOR", cast=int, default=2)
+    RERANK_POOL_MIN: int = config("RERANK_POOL_MIN", cast=int, default=5)
+    RERANK_POOL_MAX: int = config("RERANK_POOL_MAX", cast=int, default=30)
+    RERANK_SKIP_MARGIN: float = config("RERANK_SKIP_MARGIN", cast=float, default=0.0)  # 0 = always rerank
+    RERANK_CACHE_SIZE: int = config("RERANK_CACHE_SIZE", cast=int, default=10_000)
+    CONTEXT_TOKEN_BUDGET: int = config("CONTEXT_TOKEN_BUDGET", cast=int, default=3000)  # 0 = no limit
+    QUERY_BATCH_MAX_ITEMS: int = config("QUERY_BATCH_MAX_ITEMS", cast=int, default=500)
+    QUERY_BATCH_LLM_CONCURRENCY: int = config("QUERY_BATCH_LLM_CONCURRENCY", cast=int, default=8)
+    QDRANT_PREFER_GRPC: bool = config("QDRANT_PREFER_GRPC", cast=bool, default=False)
+    QDRANT_GRPC_PORT: int = config("QDRANT_GRPC_PORT", cast=int, default=6334)
+    QDRANT_ON_DISK_VECTORS: bool = config("QDRANT_ON_DISK_VECTORS", cast=bool, default=False)
+    QDRANT_ON_DISK_PAYLOAD: bool = config("QDRANT_ON_DISK_PAYLOAD", cast=bool, default=False)
+    QDRANT_QUANTIZATION: str = config("QDRANT_QUANTIZATION", default="none")  # none | scalar | binary
+    QDRANT_QUANTIZATION_ALWAYS_RAM: bool = config("QDRANT_QUANTIZATION_ALWAYS_RAM", cast=bool, default=True)
+    QDRANT_RESCORE: bool = config("QDRANT_RESCORE", cast=bool, default=True)
+    QDRANT_OVERSAMPLING: float = config("QDRANT_OVERSAMPLING", cast=float, default=2.0)
+    QDRANT_HNSW_M: int = config("QDRANT_HNSW_M", cast=int, default=16)
+    QDRANT_HNSW_EF_CONSTRUCT: int = config("QDRANT_HNSW_EF_CONSTRUCT", cast=int, default=100)
+    QDRANT_HNSW_EF: int = config("QDRANT_HNSW_EF", cast=int, default=0)  # 0 = server default
+    QDRANT_UPLOAD_PARALLEL: int = config("QDRANT_UPLOAD_PARALLEL", cast=int, default=4)
+    QDRANT_UPSERT_WAIT: bool = config("QDRANT_UPSERT_WAIT", cast=bool, default=False)
+    HYBRID_SEARCH: bool = config("HYBRID_SEARCH", cast=bool, default=True)
+    HYBRID_PREFETCH_FACTOR: int = config("HYBRID_PREFETCH_FACTOR", cast=int, default=2)
+    BM25_AVG_DOC_TERMS: float = config("BM25_AVG_DOC_TERMS", cast=float, default=250.0)
+    FILTER_CACHE_SIZE: int = config("FILTER_CACHE_SIZE", cast=int, default=4096)
+    CONVERSATION_BACKEND: str = config("CONVERSATION_BACKEND", default="memory")  # memory | sqlite | redis
+    CONVERSATION_DB_PATH: str = config("CONVERSATION_DB_PATH", default="cache/conversations.sqlite3")
+    CONVERSATION_REDIS_URL: str = config("CONVERSATION_REDIS_URL", default="redis://localhost:6379/0")
+    CONVERSATION_TOKEN_BUDGET: int = config("CONVERSATION_TOKEN_BUDGET", cast=int, default=1500)
+    CONVERSATION_TTL_SECONDS: float = config("CONVERSATION_TTL_SECONDS", cast=float, default=3600)
+    CONVERSATION_MAX: int = config("CONVERSATION_MAX", cast=int, default=10_000)
+    USE_HF_INFERENCE_API: bool = config("USE_HF_INFERENCE_API", cast=bool, default=False)
+    EMBED_BATCH_SIZE: int = config("EMBED_BATCH_SIZE", cast=int, default=64)
+    EMBED_MAX_WAIT_MS: float = config("EMBED_MAX_WAIT_MS", cast=float, default=5.0)
+    EMBED_PRIORITY_MAX_TEXTS: int = config("EMBED_PRIORITY_MAX_TEXTS", cast=int, default=8)
+    EMBED_CACHE_ENABLED: bool = config("EMBED_CACHE_ENABLED", cast=bool, default=True)
+    EMBED_CACHE_PATH: str = config("EMBED_CACHE_PATH", default="cache/embeddings.sqlite3")
+    EMBED_CACHE_MAX_ENTRIES: int = config("EMBED_CACHE_MAX_ENTRIES", cast=int, default=500_000)
+    VECTOR_BACKEND: str = config("VECTOR_BACKEND", default="qdrant")  # qdrant | local
+    LOCAL_INDEX_PATH: str = config("LOCAL_INDEX_PATH", default="cache/vector_index")
+    LOCAL_INDEX_DTYPE: str = config("LOCAL_INDEX_DTYPE", default="float32")  # float32 | float16
+    LOCAL_INDEX_HNSW: bool = config("LOCAL_INDEX_HNSW", cast=bool, default=True)  # needs hnswlib
+    LOCAL_INDEX_HNSW_MIN: int = config("LOCAL_INDEX_HNSW_MIN", cast=int, default=20_000)
+    LOCAL_INDEX_HNSW_M: int = config("LOCAL_INDEX_HNSW_M", cast=int, default=16)
+    LOCAL_INDEX_HNSW_EF: int = config("LOCAL_INDEX_HNSW_EF", cast=int, default=64)
+    METRICS_ENABLED: bool = config("METRICS_ENABLED", cast=bool, default=True)
+    SERVER_TIMING: bool = config("SERVER_TIMING", cast=bool, default=True)
+    PROFILE_SAMPLE_RATE: float = config("PROFILE_SAMPLE_RATE", cast=float, default=0.0)  # 0 = off
+    PROFILE_INTERVAL_MS: float = config("PROFILE_INTERVAL_MS", cast=float, default=1.0)
+    PROFILE_DIR: str = config("PROFILE_DIR", default="cache/profiles")
 
 # Instantiate service settings
 
@@ -64,6 +142,23 @@ class QueryRequest(BaseModel):
     conversation_id: Optional[str] = None
 
 
+class BatchQueryItem(BaseModel):
+    """
+    One question of POST /api/query/batch
+    """
+    query: str = Field(..., min_length=1, max_length=1000)
+    document_id: Optional[str] = None
+    top_k: int = Field(default=3, ge=1, le=10)
+    require_citations: bool = True
+
+
+class BatchQueryRequest(BaseModel):
+    """
+    Body for POST /api/query/batch (no conversation memory)
+    """
+    queries: List[BatchQueryItem] = Field(..., min_length=1)
+
+
 class Citation(BaseModel):
     document_name: str
     page: Optional[int] = None
@@ -78,6 +173,27 @@ class QueryResponse(BaseModel):
     response: Dict[str, Any]  # keys: answer, citations?
     conversation_id: str
 
+class JobStatusResponse(BaseModel):
+    """
+    Reply of GET /api/jobs/{job_id}
+    """
+    job_id: str
+    document_id: str
+    filename: Optional[str] = None
+    status: str  # queued | running | succeeded | failed
+    stage: Optional[str] = None  # parsing | embedding | done
+    chunks_done: int = 0
+    chunks_total: Optional[int] = None  # known once chunking has finished
+    chunks_stored: Optional[int] = None  # embedded + upserted by this job
+    chunks_skipped: Optional[int] = None  # unchanged since the previous ingest
+    chunks_deleted: Optional[int] = None  # removed since the previous ingest
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+    content_hash: Optional[str] = None  # sha256 of the uploaded bytes
+    kind: str = "document"  # document | bulk
+    summary: Optional[dict] = None  # bulk jobs: per-file results + throughput
+
 # ──────────────── Core Data Models ────────────────
 
 class RawEntry(BaseModel):
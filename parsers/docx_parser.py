@@ -1,15 +1,16 @@
 import io
 from pathlib import Path
-from typing import List
+from typing import Iterator
 
 from docx import Document
 from PIL import Image
-import pytesseract
 
 from models import RawEntry
+from parsers import ocr
 
-def ingest_docx(path: str) -> List[RawEntry]:
-    results: List[RawEntry] = []
+def ingest_docx(path: str) -> Iterator[RawEntry]:
+    """Yield paragraph entries, then OCR entries for embedded images."""
+    emitted = 0
     doc_name = Path(path).name
     doc = Document(path)
 
@@ -17,32 +18,28 @@ def ingest_docx(path: str) -> List[RawEntry]:
     for idx, para in enumerate(doc.paragraphs):
         text = para.text.strip()
         if text:
-            results.append(
-                RawEntry(
-                    document_name=doc_name,
-                    page=None,
-                    text=text,
-                    is_ocr=False,
-                    source="paragraph",
-                    chunk_index=idx,
-                )
+            yield RawEntry(
+                document_name=doc_name,
+                page=None,
+                text=text,
+                is_ocr=False,
+                source="paragraph",
+                chunk_index=idx,
             )
+            emitted += 1
 
-    # images (unique chunk_index continues from current len)
+    # images (unique chunk_index continues from the number emitted so far)
     for rel in doc.part._rels.values():
         if "image" in rel.target_ref:
             img_bytes = rel.target_part.blob
             img = Image.open(io.BytesIO(img_bytes))
-            ocr_text = pytesseract.image_to_string(img)
-            results.append(
-                RawEntry(
-                    document_name=doc_name,
-                    page=None,
-                    text=ocr_text,
-                    is_ocr=True,
-                    source="image",
-                    chunk_index=len(results),   # ensure uniqueness
-                )
+            ocr_text = ocr.image_to_string(img)
+            yield RawEntry(
+                document_name=doc_name,
+                page=None,
+                text=ocr_text,
+                is_ocr=True,
+                source="image",
+                chunk_index=emitted,   # ensure uniqueness
             )
-
-    return results
+            emitted += 1
@@ -0,0 +1,46 @@
+"""Shared Tesseract entry point with a process-wide concurrency cap.
+
+Every OCR call (PDF pages in worker processes, DOCX images in the API
+process) goes through :func:`image_to_string`, which holds one slot of a
+cross-process semaphore for the duration of the Tesseract run.  At most
+``OCR_MAX_CONCURRENCY`` Tesseract processes therefore run at once per server
+process (its PDF pool workers share the semaphore), leaving cores free for the
+query path.  Separate server processes (several uvicorn workers, a CLI bulk
+run) each have their own semaphore, so size it per process.
+"""
+import multiprocessing
+import os
+import threading
+
+import pytesseract
+
+from models import db_settings
+
+# spawn: safe to start from a multi-threaded server process, portable to macOS/Windows
+mp_context = multiprocessing.get_context("spawn")
+
+_slots = None
+_slots_lock = threading.Lock()
+
+
+def ocr_slots():
+    """Return the process-shared OCR semaphore, creating it on first use."""
+    global _slots
+    if _slots is None:
+        with _slots_lock:
+            if _slots is None:
+                _slots = mp_context.Semaphore(max(1, db_settings.OCR_MAX_CONCURRENCY))
+    return _slots
+
+
+def init_worker(slots) -> None:
+    """Process-pool initializer: adopt the parent's semaphore."""
+    global _slots
+    _slots = slots
+    # one Tesseract run should use one core; the semaphore bounds the total
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+
+def image_to_string(image) -> str:
+    with ocr_slots():
+        return pytesseract.image_to_string(image)
@@ -1,27 +1,120 @@
-import pdfplumber, pytesseract
-from typing import List
-from models import RawEntry
+import pdfplumber
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Deque, Iterator, List, Tuple
+from models import RawEntry, db_settings
+from parsers import ocr
+import itertools
 import os
+import threading
 
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
 
-def ingest_pdf(path: str) -> List[dict]:
-    results = []
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Lazily create the page-extraction pool shared by all concurrent ingests."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=db_settings.PDF_WORKERS,
+                    mp_context=ocr.mp_context,
+                    initializer=ocr.init_worker,
+                    initargs=(ocr.ocr_slots(),),
+                )
+    return _pool
+
+
+def _replace_pool(broken: ProcessPoolExecutor) -> ProcessPoolExecutor:
+    """Drop ``broken`` (a worker died) unless another ingest already has; return a live pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+    return _get_pool()
+
+
+def _extract_page(page, idx: int, name: str) -> RawEntry:
+    text = page.extract_text() or ""
+    is_ocr = False
+    if not text.strip():
+        text = ocr.image_to_string(page.to_image(300).original)
+        is_ocr = True
+    return RawEntry(
+        document_name=name,
+        page=idx,
+        text=text,
+        is_ocr=is_ocr,
+        source="page",
+        chunk_index=idx - 1,
+    )
+
+
+def _extract_range(path: str, start: int, stop: int) -> List[RawEntry]:
+    """Extract pages ``start``..``stop - 1`` (1-based); runs in a worker process."""
     name = os.path.basename(path)
+    results: List[RawEntry] = []
     with pdfplumber.open(path) as pdf:
-        for idx, page in enumerate(pdf.pages, start=1):
-            text = page.extract_text() or ""
-            is_ocr = False
-            if not text.strip():
-                text = pytesseract.image_to_string(page.to_image(300).original)
-                is_ocr = True
-            results.append(
-                {
-                    "document_name": name,
-                    "page": idx,
-                    "text": text,
-                    "is_ocr": is_ocr,
-                    "source": "page",  # <- add
-                    "chunk_index": idx - 1,  # <- add
-                }
-            )
+        for idx in range(start, stop):
+            page = pdf.pages[idx - 1]
+            results.append(_extract_page(page, idx, name))
+            page.close()
     return results
+
+
+def ingest_pdf(path: str) -> Iterator[RawEntry]:
+    """Yield one RawEntry per page, OCR-ing pages without a text layer.
+
+    Documents longer than one shard (``PDF_PAGES_PER_SHARD`` pages) are split
+    into page ranges and extracted across the shared process pool; results are
+    yielded in page order with at most two shards per worker in flight.
+    """
+    name = os.path.basename(path)
+    shard = max(1, db_settings.PDF_PAGES_PER_SHARD)
+    workers = db_settings.PDF_WORKERS
+
+    with pdfplumber.open(path) as pdf:
+        n_pages = len(pdf.pages)
+        if workers <= 1 or n_pages <= shard:
+            for idx, page in enumerate(pdf.pages, start=1):
+                yield _extract_page(page, idx, name)
+                # drop pdfplumber's per-page object cache so memory stays flat
+                page.close()
+            return
+
+    pool = _get_pool()
+    ranges = ((s, min(s + shard, n_pages + 1)) for s in range(1, n_pages + 1, shard))
+    pending: Deque[Tuple[Tuple[int, int], Future]] = deque(
+        ((s, e), pool.submit(_extract_range, path, s, e))
+        for s, e in itertools.islice(ranges, workers * 2)
+    )
+    retried = False
+    try:
+        while pending:
+            span, fut = pending[0]
+            try:
+                entries = fut.result()
+            except BrokenProcessPool:
+                # A worker died (OOM, segfault in a native parser); every
+                # future of that pool fails.  Resubmit this file's shards to a
+                # fresh pool once; a second crash fails just this file.
+                if retried:
+                    raise
+                retried = True
+                pool = _replace_pool(pool)
+                pending = deque(
+                    (span, pool.submit(_extract_range, path, *span)) for span, _ in pending
+                )
+                continue
+            pending.popleft()
+            nxt = next(ranges, None)
+            if nxt is not None:
+                pending.append((nxt, pool.submit(_extract_range, path, *nxt)))
+            yield from entries
+    finally:
+        for _, fut in pending:
+            fut.cancel()
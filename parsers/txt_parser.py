@@ -1,10 +1,10 @@
 from pathlib import Path
-from typing import List
+from typing import Iterator
 from models import RawEntry
 
-def ingest_txt(path: str) -> List[RawEntry]:
+def ingest_txt(path: str) -> Iterator[RawEntry]:
+    """Yield one RawEntry per blank-line separated paragraph."""
     doc_name = Path(path).name
-    results: List[RawEntry] = []
     para: list[str] = []
     chunk_idx = 0
 
@@ -15,28 +15,23 @@ def ingest_txt(path: str) -> List[RawEntry]:
                 para.append(line.strip())
             else:                      # blank ⇒ end paragraph
                 if para:
-                    results.append(
-                        RawEntry(
-                            document_name=doc_name,
-                            page=None,
-                            text=" ".join(para),
-                            is_ocr=False,
-                            source="paragraph",
-                            chunk_index=chunk_idx,
-                        )
+                    yield RawEntry(
+                        document_name=doc_name,
+                        page=None,
+                        text=" ".join(para),
+                        is_ocr=False,
+                        source="paragraph",
+                        chunk_index=chunk_idx,
                     )
                     chunk_idx += 1
                     para = []
         # flush tail
         if para:
-            results.append(
-                RawEntry(
-                    document_name=doc_name,
-                    page=None,
-                    text=" ".join(para),
-                    is_ocr=False,
-                    source="paragraph",
-                    chunk_index=chunk_idx,
-                )
+            yield RawEntry(
+                document_name=doc_name,
+                page=None,
+                text=" ".join(para),
+                is_ocr=False,
+                source="paragraph",
+                chunk_index=chunk_idx,
             )
-    return results
@@ -1,2 +1,3 @@
 from .ingest_service import ingest_and_store
-from .rag_assistant import ChatbotManager
\ No newline at end of file
+from .rag_assistant import ChatbotManager
+from .job_queue import IngestJobQueue, JobStore
@@ -0,0 +1,170 @@
+"""Semantic answer cache — reuse answers for near-duplicate questions.
+
+Entries are grouped by scope (``document_id`` + ``top_k``).  A lookup embeds
+nothing itself: the caller passes the query vector it already computed, and
+the cache returns the stored answer whose query vector has the highest
+cosine similarity within the same scope, provided it clears ``threshold``.
+Entries expire after ``ttl_seconds``; above ``max_entries`` the least
+recently used entry is evicted.
+
+An answer computed while its document was being re-ingested must not
+outlive the invalidation that follows: callers take a `generation` before
+retrieval and pass it to `store`, which drops the answer if the scope was
+invalidated in between.
+"""
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+@dataclass
+class _Entry:
+    scope: Tuple[Optional[str], Hashable]
+    vector: np.ndarray
+    answer: str
+    citations: List[dict]
+    compute_seconds: float
+    created: float = field(default_factory=time.monotonic)
+
+
+class SemanticAnswerCache:
+    """Thread-safe TTL + LRU cache of answers keyed on query embeddings."""
+
+    def __init__(self, threshold: float, ttl_seconds: float, max_entries: int) -> None:
+        self.threshold = threshold
+        self.ttl = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._by_scope: Dict[Tuple[Optional[str], Hashable], List[int]] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._saved_seconds = 0.0
+        self._invalidations = 0
+        self._generations: Dict[Optional[str], int] = {}  # document_id → invalidations
+        self._stale = 0
+
+    # ───────────────────── public API ─────────────────────
+    def lookup(
+        self, document_id: Optional[str], variant: Hashable, vector: Sequence[float]
+    ) -> Optional[Tuple[str, List[dict]]]:
+        """Return ``(answer, citations)`` of the closest cached query, if close enough."""
+        scope = (document_id, variant)
+        query = _unit(vector)
+        now = time.monotonic()
+        with self._lock:
+            ids = [i for i in self._by_scope.get(scope, []) if self._alive(i, now)]
+            self._by_scope[scope] = ids
+            if ids:
+                sims = np.stack([self._entries[i].vector for i in ids]) @ query
+                best = int(np.argmax(sims))
+                if sims[best] >= self.threshold:
+                    entry_id = ids[best]
+                    entry = self._entries[entry_id]
+                    self._entries.move_to_end(entry_id)
+                    self._hits += 1
+                    self._saved_seconds += entry.compute_seconds
+                    return entry.answer, list(entry.citations)
+            self._misses += 1
+            return None
+
+    def generation(self, document_id: Optional[str]) -> int:
+        """Token for `store`, taken before the answer's retrieval starts."""
+        with self._lock:
+            return self._generation(document_id)
+
+    def store(
+        self,
+        document_id: Optional[str],
+        variant: Hashable,
+        vector: Sequence[float],
+        answer: str,
+        citations: List[dict],
+        compute_seconds: float,
+        generation: Optional[int] = None,
+    ) -> None:
+        """Cache an answer, unless ``document_id`` was invalidated since
+        ``generation`` was taken (the answer may predate the new content)."""
+        scope = (document_id, variant)
+        with self._lock:
+            if generation is not None and generation != self._generation(document_id):
+                self._stale += 1
+                return
+            entry_id = next(self._ids)
+            self._entries[entry_id] = _Entry(
+                scope=scope,
+                vector=_unit(vector),
+                answer=answer,
+                citations=list(citations),
+                compute_seconds=compute_seconds,
+            )
+            self._by_scope.setdefault(scope, []).append(entry_id)
+            while len(self._entries) > self.max_entries:
+                old_id, old = self._entries.popitem(last=False)
+                self._drop_from_scope(old_id, old.scope)
+
+    def invalidate(self, document_id: Optional[str]) -> None:
+        """Drop answers that may depend on ``document_id``.
+
+        Unscoped answers (``document_id=None``) search every document, so they
+        are dropped on any invalidation.
+        """
+        with self._lock:
+            for scope in [s for s in self._by_scope if s[0] in (document_id, None)]:
+                for entry_id in self._by_scope.pop(scope):
+                    self._entries.pop(entry_id, None)
+            if document_id is not None:
+                self._generations[document_id] = self._generations.get(document_id, 0) + 1
+            self._invalidations += 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "latency_saved_seconds": self._saved_seconds,
+                "invalidations": self._invalidations,
+                "stale_skipped": self._stale,
+            }
+
+    # ───────────────────── internals (caller holds the lock) ─────────────────────
+    def _generation(self, document_id: Optional[str]) -> int:
+        # unscoped answers search every document: any invalidation counts
+        if document_id is None:
+            return self._invalidations
+        return self._generations.get(document_id, 0)
+
+    def _alive(self, entry_id: int, now: float) -> bool:
+        entry = self._entries.get(entry_id)
+        if entry is None:
+            return False
+        if now - entry.created > self.ttl:
+            del self._entries[entry_id]
+            return False
+        return True
+
+    def _drop_from_scope(self, entry_id: int, scope) -> None:
+        ids = self._by_scope.get(scope)
+        if ids and entry_id in ids:
+            ids.remove(entry_id)
+            if not ids:
+                del self._by_scope[scope]
+
+
+def _unit(vector: Sequence[float]) -> np.ndarray:
+    arr = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(arr))
+    return arr / norm if norm else arr
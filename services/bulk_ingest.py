@@ -0,0 +1,291 @@
+"""Bulk ingest — many files at once, parsed in parallel processes.
+
+Files are parsed (text extraction + OCR) across a process pool, while a
+few threads in this process run :func:`ingest_and_store` on the parsed
+entries.  Embedding therefore stays in this process, where the concurrent
+ingests share one model and coalesce in the embedding micro-batcher.
+
+A worker process that dies (e.g. a native crash in a PDF library) breaks
+the shared pool: it is replaced, and the files that were parsing in it are
+parsed again, each in a process of its own, so only the file that crashes
+fails.
+
+Used by the ``POST /api/batch/embedding`` job and from the command line:
+
+    python -m services.bulk_ingest ./customer-docs --workers 8
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from models import RawEntry, db_settings
+from parsers import ocr
+from services.ingest_service import ProgressCallback, ingest_and_store, parse_document
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXT = {"pdf", "docx", "txt"}
+_PATH_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "rag-chatbot/paths")
+_CONTENT_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "rag-chatbot/content")
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+@dataclass
+class FileResult:
+    name: str
+    document_id: str
+    chunks_stored: int = 0
+    chunks_skipped: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class BulkReport:
+    files: int = 0
+    files_failed: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+    files_per_sec: float = 0.0
+    chunks_per_sec: float = 0.0
+    results: List[FileResult] = field(default_factory=list)
+
+    def as_dict(self) -> Dict:
+        return asdict(self)
+
+
+# ──────────────── Worker processes ────────────────
+def _init_worker(slots) -> None:
+    ocr.init_worker(slots)
+    # files are the unit of parallelism here; no nested page-shard pools
+    db_settings.PDF_WORKERS = 1
+
+
+def _parse_file(path: str) -> List[RawEntry]:
+    """Runs in a worker process: the parsed entries of one file."""
+    return list(parse_document(path))
+
+
+def _new_pool(workers: int) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=ocr.mp_context,
+        initializer=_init_worker,
+        initargs=(ocr.ocr_slots(),),
+    )
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = _new_pool(max(1, db_settings.BULK_WORKERS))
+    return _pool
+
+
+def _replace_pool(broken: ProcessPoolExecutor) -> ProcessPoolExecutor:
+    """Drop ``broken`` (a worker died) unless another job already has; return a live pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+    return _get_pool()
+
+
+def _submit_parse(path: str) -> Tuple[ProcessPoolExecutor, Future]:
+    pool = _get_pool()
+    try:
+        return pool, pool.submit(_parse_file, path)
+    except BrokenProcessPool:  # broke before this file got in
+        pool = _replace_pool(pool)
+        return pool, pool.submit(_parse_file, path)
+
+
+def _parse_isolated(path: str) -> List[RawEntry]:
+    """Parse ``path`` in a process of its own, so a crash fails only this file."""
+    with _new_pool(1) as solo:
+        return solo.submit(_parse_file, path).result()
+
+
+def _parsed(path: str, pool: ProcessPoolExecutor, parsed: Future) -> List[RawEntry]:
+    try:
+        return parsed.result()
+    except BrokenProcessPool:
+        # some worker died; this file may or may not be the one that crashed it
+        _replace_pool(pool)
+        logger.warning("Parser pool broke while parsing %s; retrying it on its own", path)
+        return _parse_isolated(path)
+
+
+# ──────────────── Public API ────────────────
+def find_files(root: str) -> List[str]:
+    """Supported documents under ``root``, in a stable order."""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.rsplit(".", 1)[-1].lower() in SUPPORTED_EXT:
+                found.append(os.path.join(dirpath, name))
+    return found
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def content_document_id(sha256: str) -> str:
+    """Document ID of a file's content: identical uploads share one document."""
+    return str(uuid.uuid5(_CONTENT_NAMESPACE, sha256))
+
+
+def path_document_id(path: str, scope: Optional[str] = None) -> str:
+    """Stable document ID for a file path, so re-runs ingest incrementally.
+
+    Without ``scope`` the absolute path identifies the document; with it,
+    ``scope`` plus the path (e.g. a job ID plus the path inside the upload).
+    """
+    key = f"{scope}/{path}" if scope is not None else os.path.abspath(path)
+    return str(uuid.uuid5(_PATH_NAMESPACE, key))
+
+
+def ingest_files(
+    files: List[Tuple[str, str]],
+    progress: Optional[ProgressCallback] = None,
+    on_document: Optional[Callable[[str], None]] = None,
+) -> BulkReport:
+    """Ingest ``(path, document_id)`` pairs; failures are reported per file.
+
+    At most ``2 × BULK_WORKERS`` files are parsed or waiting at a time, and
+    ``BULK_INGEST_THREADS`` parsed files are chunked / embedded / upserted
+    concurrently.  ``progress("ingesting", files_done, files_total)`` is
+    called as files finish; ``on_document(document_id)`` after each file.
+    """
+    started = time.perf_counter()
+    report = BulkReport(files=len(files))
+    lock = threading.Lock()
+    window = max(1, db_settings.BULK_WORKERS) * 2
+
+    def _store(
+        path: str, document_id: str, pool: ProcessPoolExecutor, parsed: Future
+    ) -> FileResult:
+        result = FileResult(name=os.path.basename(path), document_id=document_id)
+        try:
+            stored = ingest_and_store(
+                path, document_id, document_name=result.name,
+                entries=_parsed(path, pool, parsed),
+            )
+            result.chunks_stored, result.chunks_skipped = stored.stored, stored.skipped
+            if stored.chunks == 0:
+                result.error = "No valid text chunks found"
+        except ValueError as exc:
+            result.error = str(exc)
+        except Exception as exc:
+            logger.exception("Bulk ingest of %s failed", path)
+            result.error = f"{type(exc).__name__}: {exc}"
+        finally:
+            if on_document is not None:
+                on_document(document_id)
+        with lock:
+            report.results.append(result)
+            if progress is not None:
+                progress("ingesting", len(report.results), report.files)
+        return result
+
+    in_flight: Deque[Future] = deque()
+    with ThreadPoolExecutor(
+        max_workers=max(1, db_settings.BULK_INGEST_THREADS), thread_name_prefix="bulk-ingest"
+    ) as ingesters:
+        # 1️⃣  keep `window` files in the parse → ingest pipeline
+        for path, document_id in files:
+            in_flight.append(ingesters.submit(_store, path, document_id, *_submit_parse(path)))
+            if len(in_flight) >= window:
+                in_flight.popleft().result()
+        # 2️⃣  drain
+        while in_flight:
+            in_flight.popleft().result()
+
+    # 3️⃣  aggregate throughput
+    report.seconds = time.perf_counter() - started
+    report.files_failed = sum(1 for r in report.results if r.error)
+    report.chunks = sum(r.chunks_stored + r.chunks_skipped for r in report.results)
+    if report.seconds > 0:
+        report.files_per_sec = report.files / report.seconds
+        report.chunks_per_sec = report.chunks / report.seconds
+    logger.info(
+        "Bulk ingest: %d files (%d failed), %d chunks in %.1fs (%.1f files/s, %.0f chunks/s)",
+        report.files, report.files_failed, report.chunks, report.seconds,
+        report.files_per_sec, report.chunks_per_sec,
+    )
+    return report
+
+
+def ingest_directory(
+    root: str,
+    progress: Optional[ProgressCallback] = None,
+    on_document: Optional[Callable[[str], None]] = None,
+    id_scope: Optional[str] = None,
+    by_content: bool = False,
+) -> BulkReport:
+    """Ingest every supported file under ``root``.
+
+    Document IDs are derived from the file paths (see `path_document_id`;
+    relative to ``root`` when ``id_scope`` is given), so running again over
+    the same tree only re-embeds changed chunks.  With ``by_content`` they
+    are derived from the file contents instead (see `content_document_id`),
+    and only the first of several identical files is ingested.
+    """
+    files = find_files(root)
+    if not by_content:
+        ids = [
+            path_document_id(os.path.relpath(p, root) if id_scope else p, id_scope)
+            for p in files
+        ]
+        return ingest_files(list(zip(files, ids)), progress=progress, on_document=on_document)
+    unique: Dict[str, str] = {}
+    for path in files:
+        unique.setdefault(content_document_id(file_sha256(path)), path)
+    pairs = [(path, document_id) for document_id, path in unique.items()]
+    return ingest_files(pairs, progress=progress, on_document=on_document)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ingest every PDF / DOCX / TXT under a directory.")
+    parser.add_argument("root", help="directory to ingest recursively")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes")
+    parser.add_argument("--threads", type=int, default=None, help="concurrent embed / upsert files")
+    parser.add_argument("--fresh-ids", action="store_true",
+                        help="new document IDs instead of ones derived from the absolute paths")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if args.workers:
+        db_settings.BULK_WORKERS = args.workers
+    if args.threads:
+        db_settings.BULK_INGEST_THREADS = args.threads
+    report = ingest_directory(args.root, id_scope=str(uuid.uuid4()) if args.fresh_ids else None)
+    print(json.dumps(report.as_dict(), indent=2))
+    if report.files_failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Context packing — turn reranked chunks into the LLM prompt's context.
+
+* Chunks from the same page (same ``document_id`` and ``page``) are merged
+  into one block, in reading order (``chunk_index``, ``sub_chunk_index``),
+  under a single ``Source:`` header.
+* Consecutive windows of the same entry share the chunker's ``OVERLAP``
+  tokens; that shared text is kept once.  Windows that are not adjacent are
+  separated by an ellipsis line.
+* Blocks are filled greedily in rerank order until ``budget`` tokens
+  (counted with the chunker's tokenizer, headers included) are used; a chunk
+  that does not fit is skipped and later, smaller ones are still tried.  If
+  the best chunk does not fit, it is truncated to the budget (and then
+  nothing else fits).
+
+Blocks keep the rank of their best chunk, and each block is one citation.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+from langchain.schema import Document as LCDocument
+
+from chunker import get_encoder
+from models import db_settings
+
+# shortest shared prefix/suffix accepted as chunk overlap (capped by what
+# OVERLAP tokens can span, at ~4 characters per cl100k token)
+_MIN_OVERLAP_CHARS = 16
+_GAP = "\n…\n"
+_REPLACEMENT = "\ufffd"
+_BLOCK_SEPARATOR = "\n\n"
+
+
+@dataclass
+class ContextBlock:
+    """Merged text of one page's chunks, ready for the prompt."""
+
+    document_name: Optional[str]
+    page: Optional[int]
+    # (chunk_index, sub_chunk_index, text), in rank order
+    segments: Tuple[Tuple[int, int, str], ...] = ()
+    text: str = ""
+    tokens: int = 0  # of `render()` + block separator
+
+    def render(self) -> str:
+        return f"Source: {self.document_name} (page {self.page})\n{self.text}"
+
+    def citation(self) -> dict:
+        return {"document_name": self.document_name, "page": self.page}
+
+
+def count_tokens(text: str) -> int:
+    return len(get_encoder().encode_ordinary(text))
+
+
+def strip_overlap(prev: str, nxt: str, min_chars: int = _MIN_OVERLAP_CHARS) -> Optional[str]:
+    """``nxt`` without the prefix it shares with the end of ``prev``.
+
+    Chunk windows are cut at token boundaries, which can split a multi-byte
+    character; the chunker decodes the halves as U+FFFD, so those are
+    ignored at the end of ``prev`` (the caller drops them) and the start of
+    ``nxt``.  Returns None when the two do not overlap by at least
+    ``min_chars`` (or all of ``nxt``, when it is shorter).
+    """
+    prev = prev.rstrip(_REPLACEMENT)
+    nxt = nxt.lstrip(_REPLACEMENT)
+    probe = nxt[:max(1, min_chars)]
+    if not probe:
+        return nxt
+    # earliest match = longest overlap; it can't be longer than nxt
+    pos = prev.find(probe, max(0, len(prev) - len(nxt)))
+    while pos != -1:
+        if nxt.startswith(prev[pos:]):
+            return nxt[len(prev) - pos:]
+        pos = prev.find(probe, pos + 1)
+    return None
+
+
+def _join(segments: Sequence[Tuple[int, int, str]]) -> str:
+    """Segments in reading order, overlapping neighbours merged."""
+    min_chars = min(_MIN_OVERLAP_CHARS, db_settings.OVERLAP // 4)
+    parts: List[str] = []
+    last: Optional[Tuple[int, int, str]] = None
+    for chunk_index, sub_index, text in sorted(segments, key=lambda s: s[:2]):
+        if last is None:
+            parts.append(text)
+        elif chunk_index == last[0] and sub_index == last[1] + 1:
+            rest = strip_overlap(last[2], text, min_chars) if db_settings.OVERLAP > 0 else None
+            if rest is None:
+                parts.append("\n" + text)
+            else:
+                parts[-1] = parts[-1].rstrip(_REPLACEMENT)
+                parts.append(rest)
+        else:
+            parts.append(_GAP + text)
+        last = (chunk_index, sub_index, text)
+    return "".join(parts)
+
+
+def _block_key(doc: LCDocument) -> Hashable:
+    meta = doc.metadata
+    return meta.get("document_id") or meta.get("document_name"), meta.get("page")
+
+
+def _segment(doc: LCDocument, rank: int) -> Tuple[int, int, str]:
+    meta = doc.metadata
+    chunk_index = meta.get("chunk_index")
+    sub_index = meta.get("sub_chunk_index")
+    if chunk_index is None or sub_index is None:
+        # no position: never adjacent, ahead of positioned chunks, in rank order
+        return rank - (1 << 31), 0, doc.page_content
+    return chunk_index, sub_index, doc.page_content
+
+
+def _with(block: ContextBlock, segment: Tuple[int, int, str]) -> ContextBlock:
+    segments = block.segments + (segment,)
+    grown = replace(block, segments=segments, text=_join(segments))
+    grown.tokens = count_tokens(grown.render() + _BLOCK_SEPARATOR)
+    return grown
+
+
+def _truncated(block: ContextBlock, budget: int) -> ContextBlock:
+    encoder = get_encoder()
+    header = count_tokens(replace(block, text="").render() + _BLOCK_SEPARATOR)
+    tokens = encoder.encode_ordinary(block.text)[: max(0, budget - header)]
+    return replace(block, text=encoder.decode(tokens), tokens=header + len(tokens))
+
+
+def pack_context(docs: Sequence[LCDocument], budget: int) -> List[ContextBlock]:
+    """Blocks for ``docs`` (best first) within ``budget`` tokens (0 = no limit)."""
+    blocks: Dict[Hashable, ContextBlock] = {}
+    used = 0
+    for rank, doc in enumerate(docs):
+        key = _block_key(doc)
+        block = blocks.get(key)
+        base = block or ContextBlock(doc.metadata.get("document_name"), doc.metadata.get("page"))
+        grown = _with(base, _segment(doc, rank))
+        added = grown.tokens - (block.tokens if block else 0)
+        if budget > 0 and used + added > budget:
+            if rank > 0:
+                continue
+            grown = _truncated(grown, budget)  # the best chunk is always sent
+            added = grown.tokens
+        blocks[key] = grown  # a new key keeps its place; dicts preserve insertion order
+        used += added
+    return list(blocks.values())
+
+
+def render_context(blocks: Sequence[ContextBlock]) -> str:
+    return _BLOCK_SEPARATOR.join(block.render() for block in blocks)
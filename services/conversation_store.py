@@ -0,0 +1,374 @@
+"""Conversation memory — bounded, token-budgeted, pluggable storage.
+
+Each conversation keeps only its most recent turns that fit within
+``token_budget`` tokens (tiktoken ``cl100k_base``, the chunker's encoding).
+Conversations idle for longer than ``idle_ttl`` seconds expire, and the
+least recently used ones are evicted once ``max_conversations`` is reached.
+
+Backends:
+
+* ``memory`` — in-process ``OrderedDict``; fastest, private to one worker.
+* ``sqlite`` — a WAL SQLite file; shared by all workers on the same host.
+* ``redis``  — any Redis-protocol server (Redis, Valkey, KeyDB, a local
+  stand-in…); shared across hosts.  Idle TTL is the key expiry; LRU eviction
+  is left to the server's ``maxmemory-policy``.
+
+Appending a turn is one atomic read-modify-write (`ConversationBackend.update`)
+on every backend, so concurrent requests on one conversation never drop
+each other's turns.
+"""
+from __future__ import annotations
+
+import abc
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from chunker import get_encoder
+from models import db_settings
+
+logger = logging.getLogger(__name__)
+
+Turn = Dict[str, Any]  # {"query": str, "answer": str, "tokens": int}
+
+def count_tokens(text: str) -> int:
+    return len(get_encoder().encode_ordinary(text))
+
+
+def truncate_tokens(text: str, limit: int) -> str:
+    """``text`` cut to its first ``limit`` tokens."""
+    encoder = get_encoder()
+    tokens = encoder.encode_ordinary(text)
+    return text if len(tokens) <= limit else encoder.decode(tokens[: max(0, limit)])
+
+
+# ──────────────── Backends ────────────────
+class ConversationBackend(abc.ABC):
+    """Storage interface: a conversation is a list of turns under an ID.
+
+    ``get`` refreshes the conversation's idle timer (and LRU position) and
+    returns ``None`` for unknown or expired IDs.
+    """
+
+    @abc.abstractmethod
+    def get(self, conv_id: str) -> Optional[List[Turn]]:
+        ...
+
+    @abc.abstractmethod
+    def put(self, conv_id: str, turns: List[Turn]) -> None:
+        ...
+
+    @abc.abstractmethod
+    def update(self, conv_id: str, fn: Callable[[List[Turn]], List[Turn]]) -> None:
+        """Atomically replace the turns of ``conv_id`` with ``fn(turns)``.
+
+        ``turns`` is ``[]`` for an unknown or expired conversation; ``fn`` may
+        be called more than once (optimistic backends retry on conflict).
+        """
+
+    @abc.abstractmethod
+    def delete(self, conv_id: str) -> None:
+        ...
+
+    @abc.abstractmethod
+    def count(self) -> int:
+        ...
+
+
+class InMemoryBackend(ConversationBackend):
+    def __init__(self, idle_ttl: float, max_conversations: int) -> None:
+        self.idle_ttl = idle_ttl
+        self.max_conversations = max(1, max_conversations)
+        self._data: "OrderedDict[str, Tuple[List[Turn], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, conv_id: str) -> Optional[List[Turn]]:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            item = self._data.get(conv_id)
+            if item is None:
+                return None
+            self._data[conv_id] = (item[0], now)
+            self._data.move_to_end(conv_id)
+            return list(item[0])
+
+    def put(self, conv_id: str, turns: List[Turn]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._data[conv_id] = (list(turns), now)
+            self._data.move_to_end(conv_id)
+            while len(self._data) > self.max_conversations:
+                self._data.popitem(last=False)
+
+    def update(self, conv_id: str, fn: Callable[[List[Turn]], List[Turn]]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            item = self._data.get(conv_id)
+            self._data[conv_id] = (fn(list(item[0]) if item else []), now)
+            self._data.move_to_end(conv_id)
+            while len(self._data) > self.max_conversations:
+                self._data.popitem(last=False)
+
+    def delete(self, conv_id: str) -> None:
+        with self._lock:
+            self._data.pop(conv_id, None)
+
+    def count(self) -> int:
+        with self._lock:
+            self._expire(time.monotonic())
+            return len(self._data)
+
+    def _expire(self, now: float) -> None:
+        # entries are kept in access order, so the stale ones are at the front
+        while self._data:
+            conv_id, (_, accessed) = next(iter(self._data.items()))
+            if now - accessed <= self.idle_ttl:
+                break
+            del self._data[conv_id]
+
+
+class SQLiteBackend(ConversationBackend):
+    """One row per conversation; expired / excess rows are purged every few writes."""
+
+    _PURGE_EVERY = 100  # writes between purges
+
+    def __init__(self, path: str, idle_ttl: float, max_conversations: int) -> None:
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.idle_ttl = idle_ttl
+        self.max_conversations = max(1, max_conversations)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS conversations (
+                id          TEXT PRIMARY KEY,
+                turns       TEXT NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_conv_accessed ON conversations(accessed_at)"
+        )
+        self._conn.commit()
+
+    def get(self, conv_id: str) -> Optional[List[Turn]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT turns FROM conversations WHERE id = ? AND accessed_at >= ?",
+                (conv_id, now - self.idle_ttl),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE conversations SET accessed_at = ? WHERE id = ?", (now, conv_id)
+            )
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, conv_id: str, turns: List[Turn]) -> None:
+        with self._lock:
+            self._write(conv_id, turns, time.time())
+            self._conn.commit()
+
+    def update(self, conv_id: str, fn: Callable[[List[Turn]], List[Turn]]) -> None:
+        now = time.time()
+        with self._lock:
+            # the write lock is taken before reading, so other processes queue up
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT turns FROM conversations WHERE id = ? AND accessed_at >= ?",
+                    (conv_id, now - self.idle_ttl),
+                ).fetchone()
+                self._write(conv_id, fn(json.loads(row[0]) if row else []), now)
+            except BaseException:
+                self._conn.rollback()
+                raise
+            self._conn.commit()
+
+    def delete(self, conv_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM conversations WHERE id = ?", (conv_id,))
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            self._purge()
+            self._conn.commit()
+            return self._conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+    def _write(self, conv_id: str, turns: List[Turn], now: float) -> None:
+        """Store ``turns`` (caller holds the lock and commits)."""
+        self._conn.execute(
+            "INSERT OR REPLACE INTO conversations (id, turns, accessed_at) VALUES (?, ?, ?)",
+            (conv_id, json.dumps(turns), now),
+        )
+        self._writes += 1
+        if self._writes % self._PURGE_EVERY == 0:
+            self._purge()
+
+    def _purge(self) -> None:
+        """Drop expired rows, then the least recently used beyond the cap."""
+        self._conn.execute(
+            "DELETE FROM conversations WHERE accessed_at < ?", (time.time() - self.idle_ttl,)
+        )
+        self._conn.execute(
+            """
+            DELETE FROM conversations WHERE id IN (
+                SELECT id FROM conversations ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_conversations,),
+        )
+
+
+class RedisBackend(ConversationBackend):
+    """Conversations as JSON strings under ``<prefix><id>`` with an idle expiry.
+
+    ``client`` may be any object with the redis-py ``get`` / ``set`` /
+    ``expire`` / ``delete`` / ``scan_iter`` / ``pipeline`` methods, e.g.
+    ``redis.Redis`` connected to a local stand-in server.  `update` is a
+    WATCH / MULTI transaction, retried when another writer got there first.
+    """
+
+    def __init__(self, client: Any, idle_ttl: float, prefix: str = "conv:") -> None:
+        self.client = client
+        self.idle_ttl = max(1, int(idle_ttl))
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, idle_ttl: float) -> "RedisBackend":
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError(
+                "CONVERSATION_BACKEND=redis needs the 'redis' package (pip install .[redis])"
+            ) from exc
+        return cls(redis.Redis.from_url(url), idle_ttl)
+
+    def get(self, conv_id: str) -> Optional[List[Turn]]:
+        key = self.prefix + conv_id
+        raw = self.client.get(key)
+        if raw is None:
+            return None
+        self.client.expire(key, self.idle_ttl)
+        return json.loads(raw)
+
+    def put(self, conv_id: str, turns: List[Turn]) -> None:
+        self.client.set(self.prefix + conv_id, json.dumps(turns), ex=self.idle_ttl)
+
+    def update(self, conv_id: str, fn: Callable[[List[Turn]], List[Turn]]) -> None:
+        from redis.exceptions import WatchError
+
+        key = self.prefix + conv_id
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    raw = pipe.get(key)
+                    turns = fn(json.loads(raw) if raw is not None else [])
+                    pipe.multi()
+                    pipe.set(key, json.dumps(turns), ex=self.idle_ttl)
+                    pipe.execute()
+                    return
+                except WatchError:
+                    continue
+
+    def delete(self, conv_id: str) -> None:
+        self.client.delete(self.prefix + conv_id)
+
+    def count(self) -> int:
+        return sum(1 for _ in self.client.scan_iter(match=self.prefix + "*"))
+
+
+def create_backend() -> ConversationBackend:
+    """Backend selected by ``CONVERSATION_BACKEND`` (memory | sqlite | redis)."""
+    kind = db_settings.CONVERSATION_BACKEND
+    ttl = db_settings.CONVERSATION_TTL_SECONDS
+    cap = db_settings.CONVERSATION_MAX
+    if kind == "memory":
+        return InMemoryBackend(ttl, cap)
+    if kind == "sqlite":
+        return SQLiteBackend(db_settings.CONVERSATION_DB_PATH, ttl, cap)
+    if kind == "redis":
+        return RedisBackend.from_url(db_settings.CONVERSATION_REDIS_URL, ttl)
+    raise ValueError(f"Unknown conversation backend: {kind}")
+
+
+# ──────────────── Store ────────────────
+class ConversationStore:
+    """Token-budgeted conversation history on top of a backend.
+
+    A ``token_budget`` of 0 keeps no history.
+    """
+
+    def __init__(self, backend: ConversationBackend, token_budget: int) -> None:
+        self.backend = backend
+        self.token_budget = max(0, token_budget)
+
+    def create(self) -> str:
+        conv_id = str(uuid.uuid4())
+        self.backend.put(conv_id, [])
+        return conv_id
+
+    def history(self, conv_id: str) -> Optional[List[Turn]]:
+        """Turns of ``conv_id`` (oldest first), or ``None`` if unknown / expired."""
+        return self.backend.get(conv_id)
+
+    def append(self, conv_id: str, query: str, answer: str) -> None:
+        """Add a turn, then drop the oldest turns until the budget is met.
+
+        The new turn itself is always kept; if it alone is over the budget,
+        its answer (then its query) is truncated to fit.
+        """
+        turn = self._fit(query, answer)
+
+        def _add(turns: List[Turn]) -> List[Turn]:
+            if turn is None:
+                return []
+            kept = [turn]
+            used = turn["tokens"]
+            for old in reversed(turns):
+                used += old["tokens"]
+                if used > self.token_budget:
+                    break
+                kept.append(old)
+            return kept[::-1]
+
+        self.backend.update(conv_id, _add)
+
+    def _fit(self, query: str, answer: str) -> Optional[Turn]:
+        """The turn for ``query`` / ``answer``, cut down to the token budget."""
+        if self.token_budget == 0:
+            return None
+        query_tokens = count_tokens(query)
+        if query_tokens >= self.token_budget:
+            query, answer = truncate_tokens(query, self.token_budget), ""
+        else:
+            answer = truncate_tokens(answer, self.token_budget - query_tokens)
+        return {"query": query, "answer": answer, "tokens": count_tokens(query) + count_tokens(answer)}
+
+    @staticmethod
+    def render(turns: List[Turn]) -> str:
+        """Turns formatted for the LLM prompt."""
+        return "\n".join(f"User: {t['query']}\nAssistant: {t['answer']}" for t in turns)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self.backend).__name__,
+            "conversations": self.backend.count(),
+            "token_budget": self.token_budget,
+        }
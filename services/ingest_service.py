@@ -1,14 +1,22 @@
+import hashlib
 import logging
 import itertools
-from typing import List
+import queue
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Deque, Iterable, Iterator, List, Optional
 
 from qdrant_client.http.models import PointStruct
 
+import metrics
 from parsers import pdf_parser, docx_parser, txt_parser
 from chunker import chunk_text
 from embedder import embed_text
-from storage.qdrant_client import upsert_points
-from models import RawEntry, Chunk
+from storage.vector_store import get_store
+from models import RawEntry, Chunk, db_settings
 
 logger = logging.getLogger(__name__)
 
@@ -35,13 +43,61 @@ def _grouper(iterable, size):
         yield chunk
 
 
-def ingest_and_store(path: str, document_id: str, batch: int = 1000) -> int:
-    """Parse file → chunk → embed → upsert to Qdrant.
+_DONE = object()
 
-    Returns the number of vectors stored.
+
+class _StageError:
+    """Carries an exception from a producer thread to the consumer."""
+
+    def __init__(self, exc: BaseException) -> None:
+        self.exc = exc
+
+
+def _prefetch(iterable: Iterable, depth: int) -> Iterator:
+    """Run ``iterable`` in a background thread, handing items over a bounded queue.
+
+    At most ``depth`` items are buffered, so the producer stage stalls instead of
+    racing ahead of the consumer.
     """
+    q: "queue.Queue" = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+
+    def _put(item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
 
-    # 1️⃣  Detect file type & parse -------------------------------------------------
+    def _worker() -> None:
+        try:
+            for item in iterable:
+                if not _put(item):
+                    return
+        except BaseException as exc:  # re-raised in the consumer thread
+            _put(_StageError(exc))
+        else:
+            _put(_DONE)
+
+    thread = threading.Thread(target=_worker, name="ingest-prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _StageError):
+                raise item.exc
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+def parse_document(path: str) -> Iterator[RawEntry]:
+    """Detect file type and stream `RawEntry` objects from the matching parser."""
     ext = path.rsplit(".", 1)[-1].lower()
     if ext == "pdf":
         raw_entries = pdf_parser.ingest_pdf(path)
@@ -53,52 +109,198 @@ def ingest_and_store(path: str, document_id: str, batch: int = 1000) -> int:
         logger.error("Unsupported extension: %s", ext)
         raise ValueError(f"Unsupported document type: {ext}")
 
-    if not raw_entries:
-        logger.warning("No extractable text in %s", path)
-        return 0
-
-    # Coerce to RawEntry (parsers may still return dicts)
-    entries: List[RawEntry] = [
+    # Coerce to RawEntry (legacy parsers may still return dicts)
+    return (
         _dict_to_raw(e, idx) if not isinstance(e, RawEntry) else e
         for idx, e in enumerate(raw_entries)
-    ]
-    # after raw_entries fetched
-    # entries: List[RawEntry] = [
-    #     _dict_to_raw(e, idx) if not isinstance(e, RawEntry) else e
-    #     for idx, e in enumerate(raw_entries)
-    # ]
-
-    # 2️⃣  Chunk -------------------------------------------------------------------
-    chunks: List[Chunk] = chunk_text(entries)
-    if not chunks:
-        logger.warning("Chunker produced zero output for %s", path)
-        return 0
-
-    # 3️⃣  Embed + build PointStructs -----------------------------------
-    points: List[PointStruct] = []
+    )
+
 
-    for idx, ch in enumerate(chunks):
-        vec = embed_text(ch.text)
+_POINT_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "rag-chatbot/chunks")
 
+
+def chunk_point_id(document_id: str, chunk: Chunk) -> str:
+    """Deterministic point ID: document + position in it + content hash.
+
+    Re-ingesting unchanged text yields the same ID, so the point can be kept
+    as is; an edit changes the ID, so the old point shows up as stale.
+    """
+    digest = hashlib.sha1(chunk.text.encode("utf-8")).hexdigest()
+    position = f"{chunk.source}:{chunk.chunk_index}:{chunk.sub_chunk_index}"
+    return str(uuid.uuid5(_POINT_NAMESPACE, f"{document_id}:{position}:{digest}"))
+
+
+def _to_points(
+    chunks: List[Chunk], ids: List[str], document_id: str, document_name: Optional[str]
+) -> List[PointStruct]:
+    """Embed one batch of chunks and wrap them as Qdrant points."""
+    vectors = embed_text([ch.text for ch in chunks])
+    store = get_store()
+    points: List[PointStruct] = []
+    for point_id, ch, vec in zip(ids, chunks, vectors):
         # convert Pydantic → dict, then rename `text` → `page_content`
         payload = ch.model_dump()
         payload["page_content"] = payload.pop("text")          # ← crucial
         payload["document_id"] = document_id
+        if document_name:
+            payload["document_name"] = document_name  # not the spool file name
 
         points.append(
             PointStruct(
-                id=idx,         # unsigned‑int ID
-                vector=vec,
+                id=point_id,
+                vector=store.point_vector(vec, ch.text),   # dense (+ BM25 sparse)
                 payload=payload,
             )
         )
+    return points
 
 
+def _upsert(points: List[PointStruct], wait: Optional[bool] = None) -> int:
+    with metrics.ingest_stage("upsert"):
+        get_store().upsert(points, wait=wait)
+    return len(points)
 
 
-    # 4️⃣  Batched upsert ----------------------------------------------------------
-    for chunk in _grouper(points, batch):
-        upsert_points(chunk)
-    logger.info("Ingested %d chunks for %s", len(points), document_id)
+def _count_ocr(entries: Iterable[RawEntry]) -> Iterator[RawEntry]:
+    for entry in entries:
+        if entry.is_ocr:
+            metrics.OCR_PAGES.inc()
+        yield entry
 
-    return len(points)
+
+ProgressCallback = Callable[[str, int, Optional[int]], None]
+
+
+@dataclass
+class IngestResult:
+    stored: int   # chunks embedded + upserted
+    skipped: int  # unchanged chunks already stored from a previous ingest
+    deleted: int  # stale chunks of a previous ingest removed
+
+    @property
+    def chunks(self) -> int:
+        """Chunks the document now has in the collection."""
+        return self.stored + self.skipped
+
+
+def ingest_and_store(
+    path: str,
+    document_id: str,
+    batch: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+    document_name: Optional[str] = None,
+    entries: Optional[Iterable[RawEntry]] = None,
+) -> IngestResult:
+    """Parse file → chunk → embed → upsert to Qdrant, streaming in batches.
+
+    The stages are pipelined: parsing + chunking run in a prefetch thread,
+    embedding runs in the caller, and upserts run on ``QDRANT_UPLOAD_PARALLEL``
+    uploader threads.
+    Bounded queues between them keep peak memory at a few batches, regardless
+    of document size, while batch N is upserted as batch N+1 is embedded:
+    ``INGEST_QUEUE_DEPTH`` chunk batches wait for embedding, and at most as
+    many embedded batches wait for or are in upload (the last one included).
+
+    The last batch is held back and upserted with ``wait=True`` once the
+    others are done, so every point is searchable when this returns, even
+    with ``QDRANT_UPSERT_WAIT=false``.
+
+    Ingest is incremental: chunks whose deterministic ID is already stored
+    for ``document_id`` are skipped (neither embedded nor upserted), and
+    points of a previous ingest that no longer occur are deleted once every
+    new chunk has been stored.  Skipped chunks get ``document_name`` too, in
+    case the document was re-uploaded under another name.
+
+    ``progress(stage, chunks_done, chunks_total)`` is called after every
+    batch; ``chunks_total`` stays ``None`` until chunking has finished.
+    ``document_name`` overrides the file name recorded in the payload.
+    ``entries`` may carry already-parsed content of ``path`` (bulk ingest
+    parses in worker processes), in which case the file is not parsed again.
+    """
+    batch = batch or db_settings.INGEST_BATCH_SIZE
+    depth = db_settings.INGEST_QUEUE_DEPTH
+    uploaders = max(1, db_settings.QDRANT_UPLOAD_PARALLEL)
+    # embedded batches in upload, besides the one held back for the final upsert
+    max_in_flight = max(1, depth - 1)
+    produced = {"chunks": 0, "complete": False}
+
+    def _counted(chunks: Iterable[Chunk]) -> Iterator[Chunk]:
+        for ch in chunks:
+            produced["chunks"] += 1
+            yield ch
+        produced["complete"] = True
+
+    def _report(stage: str, done: int) -> None:
+        if progress is not None:
+            progress(stage, done, produced["chunks"] if produced["complete"] else None)
+
+    # 1️⃣  Parse + 2️⃣  Chunk (lazy, in a prefetch thread) ---------------------------
+    # `parse_document` rejects unsupported types here, before any thread starts.
+    if entries is None:
+        entries = parse_document(path)
+    existing = get_store().document_ids(document_id)  # empty for a new document
+    # parse time = time spent producing entries; chunk time = the rest
+    parse_timer, chunk_timer = metrics.IterTimer(), metrics.IterTimer()
+    chunks_iter = chunk_timer.wrap(chunk_text(parse_timer.wrap(_count_ocr(entries))))
+    chunk_batches = _prefetch(_grouper(_counted(chunks_iter), batch), depth)
+    _report("parsing", 0)
+
+    # 3️⃣  Embed + 4️⃣  Upsert changed chunks only (parallel uploaders, bounded) ---
+    stored = skipped = 0
+    seen = set()
+    held: Optional[List[PointStruct]] = None
+    in_flight: Deque[Future] = deque()
+    with ThreadPoolExecutor(max_workers=uploaders, thread_name_prefix="ingest-upsert") as uploader:
+        try:
+            for chunks in chunk_batches:
+                ids = [chunk_point_id(document_id, ch) for ch in chunks]
+                seen.update(ids)
+                fresh = [i for i, pid in enumerate(ids) if pid not in existing]
+                skipped += len(chunks) - len(fresh)
+                if fresh:
+                    with metrics.ingest_stage("embed"):
+                        points = _to_points(
+                            [chunks[i] for i in fresh], [ids[i] for i in fresh],
+                            document_id, document_name,
+                        )
+                    if held is not None:
+                        while len(in_flight) >= max_in_flight:
+                            stored += in_flight.popleft().result()
+                        in_flight.append(uploader.submit(_upsert, held))
+                    held = points
+                _report("embedding", stored + skipped)
+            while in_flight:
+                stored += in_flight.popleft().result()
+            if held is not None:
+                stored += _upsert(held, wait=True)
+            _report("embedding", stored + skipped)
+        finally:
+            chunk_batches.close()
+            for fut in in_flight:
+                fut.cancel()
+
+    # 5️⃣  Drop what a previous ingest stored but this one no longer produced ------
+    stale = existing - seen
+    if stale:
+        with metrics.ingest_stage("delete"):
+            get_store().delete_points(document_id, stale)
+    if skipped and document_name:
+        get_store().rename_document(document_id, document_name)
+    result = IngestResult(stored=stored, skipped=skipped, deleted=len(stale))
+
+    metrics.INGEST_STAGE_SECONDS.labels("parse").observe(parse_timer.seconds)
+    metrics.INGEST_STAGE_SECONDS.labels("chunk").observe(chunk_timer.seconds - parse_timer.seconds)
+    metrics.INGEST_CHUNKS.labels("stored").inc(stored)
+    metrics.INGEST_CHUNKS.labels("skipped").inc(skipped)
+    metrics.INGEST_CHUNKS.labels("deleted").inc(len(stale))
+    metrics.INGEST_DOCUMENT_CHUNKS.observe(result.chunks)
+
+    if result.chunks == 0:
+        logger.warning("No extractable text in %s", path)
+        return result
+
+    logger.info(
+        "Ingested %s: %d stored, %d unchanged, %d removed",
+        document_id, stored, skipped, len(stale),
+    )
+    return result
@@ -0,0 +1,470 @@
+"""Ingest job queue — persistent, prioritised background ingestion.
+
+Uploads are spooled to disk and recorded in a small SQLite table; a fixed
+pool of worker threads picks them up in priority order (lower value first,
+FIFO within a priority) and runs :func:`ingest_and_store`, writing stage and
+chunk progress back to the table.
+
+Several server processes may share one ``JOBS_DB_PATH``: a worker claims a
+job with a single conditional ``UPDATE`` (``queued`` → ``running``, stamped
+with its process as ``owner``), so each job runs exactly once.  On start,
+queued jobs are picked up again, and ``running`` jobs are re-queued only when
+their owner process is gone (not when another live server is running them).
+
+Within a queue, jobs for the same ``document_id`` run one at a time, in the
+order they were dequeued: a re-upload waits for the ingest already running
+for that document instead of racing it over the same points.
+
+Bulk jobs (``kind="bulk"``) point at a spooled directory instead of a file
+and are run by a separate handler that reports per-file results in the
+job's ``summary``.
+"""
+from __future__ import annotations
+
+import heapq
+import itertools
+import json
+import logging
+import os
+import queue
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+DOCUMENT = "document"  # one uploaded file
+BULK = "bulk"          # a spooled directory of files, see services.bulk_ingest
+
+_COLUMNS = (
+    "id", "document_id", "filename", "path", "priority", "status", "stage",
+    "chunks_done", "chunks_total", "chunks_stored", "error", "created_at", "updated_at",
+    "content_hash", "chunks_skipped", "chunks_deleted", "kind", "summary", "owner",
+)
+
+# columns added after the first release: name → SQL type
+_ADDED_COLUMNS = {
+    "content_hash": "TEXT",
+    "chunks_skipped": "INTEGER",
+    "chunks_deleted": "INTEGER",
+    "kind": f"TEXT NOT NULL DEFAULT '{DOCUMENT}'",
+    "summary": "TEXT",
+    "owner": "TEXT",
+}
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name == "nt":  # no signal-0 probe; assume one server per job database
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # exists, owned by another user
+        return True
+    return True
+
+
+def _owner_gone(owner: Optional[str], own: str) -> bool:
+    """Whether the process that claimed a job (``host:pid:token``) no longer runs."""
+    if not owner:
+        return True  # claimed by a release without owners
+    host, pid, token = owner.rsplit(":", 2)
+    if host != socket.gethostname():
+        return False  # can't tell from here; its own host recovers it
+    if int(pid) == os.getpid():
+        return owner != own  # an earlier incarnation with a recycled PID (e.g. PID 1)
+    return not _pid_alive(int(pid))
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the number of queued jobs reaches ``max_queued``."""
+
+
+class JobStore:
+    """SQLite table of ingest jobs; safe to share across threads."""
+
+    def __init__(self, path: str) -> None:
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id            TEXT PRIMARY KEY,
+                document_id   TEXT NOT NULL,
+                filename      TEXT,
+                path          TEXT NOT NULL,
+                priority      INTEGER NOT NULL,
+                status        TEXT NOT NULL,
+                stage         TEXT,
+                chunks_done   INTEGER NOT NULL DEFAULT 0,
+                chunks_total  INTEGER,
+                chunks_stored INTEGER,
+                error         TEXT,
+                created_at    REAL NOT NULL,
+                updated_at    REAL NOT NULL,
+                content_hash  TEXT,
+                chunks_skipped INTEGER,
+                chunks_deleted INTEGER,
+                kind          TEXT NOT NULL DEFAULT 'document',
+                summary       TEXT,
+                owner         TEXT
+            )
+            """
+        )
+        existing = {r[1] for r in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, sql_type in _ADDED_COLUMNS.items():  # tables from older releases
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {sql_type}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_hash ON jobs(content_hash)")
+        self._conn.commit()
+
+    def create(self, job: Dict[str, Any]) -> None:
+        now = time.time()
+        row = {c: None for c in _COLUMNS}
+        row.update(chunks_done=0, created_at=now, updated_at=now, kind=DOCUMENT)
+        row.update(job)
+        with self._lock:
+            if row["kind"] == DOCUMENT and row["document_id"]:
+                # the document's earlier contents are no longer what it holds
+                self._conn.execute(
+                    "UPDATE jobs SET content_hash = NULL, updated_at = ? WHERE document_id = ?",
+                    (now, row["document_id"]),
+                )
+            self._conn.execute(
+                f"INSERT INTO jobs ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                [row[c] for c in _COLUMNS],
+            )
+            self._conn.commit()
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ?", [*fields.values(), job_id]
+            )
+            self._conn.commit()
+
+    def claim(self, job_id: str, owner: str, stage: str) -> Optional[Dict[str, Any]]:
+        """Atomically move a queued job to running for ``owner``; None if it was not queued."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, owner = ?, stage = ?, updated_at = ? "
+                "WHERE id = ? AND status = ?",
+                (RUNNING, owner, stage, time.time(), job_id, QUEUED),
+            )
+            self._conn.commit()
+        return self.get(job_id) if cursor.rowcount == 1 else None
+
+    def requeue(self, job_id: str, owner: Optional[str]) -> bool:
+        """Give an orphaned running job back to the queue, unless someone else already did."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, owner = NULL, stage = NULL, chunks_done = 0, "
+                "updated_at = ? WHERE id = ? AND status = ? AND owner IS ?",
+                (QUEUED, time.time(), job_id, RUNNING, owner),
+            )
+            self._conn.commit()
+        return cursor.rowcount == 1
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return dict(zip(_COLUMNS, row)) if row else None
+
+    def find_by_hash(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Most recent job for identical content that has not failed.
+
+        Only a document's latest job keeps its hash (see `create`), so a
+        match is content the document still holds, or is about to."""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs "
+                "WHERE content_hash = ? AND status != ? ORDER BY created_at DESC LIMIT 1",
+                (content_hash, FAILED),
+            ).fetchone()
+        return dict(zip(_COLUMNS, row)) if row else None
+
+    def forget_document(self, document_id: str) -> None:
+        """Stop matching ``document_id``'s jobs in `find_by_hash` (the document was deleted)."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET content_hash = NULL, updated_at = ? WHERE document_id = ?",
+                (time.time(), document_id),
+            )
+            self._conn.commit()
+
+    def has_document(self, document_id: str) -> bool:
+        """Whether any job was submitted for ``document_id`` itself."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM jobs WHERE document_id = ? LIMIT 1", (document_id,)
+            ).fetchone()
+        return row is not None
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        """Jobs that were queued or running, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE status IN (?, ?) "
+                "ORDER BY created_at",
+                (QUEUED, RUNNING),
+            ).fetchall()
+        return [dict(zip(_COLUMNS, r)) for r in rows]
+
+
+class IngestJobQueue:
+    """Bounded worker pool that drains persisted ingest jobs by priority."""
+
+    def __init__(
+        self,
+        store: JobStore,
+        handler: Callable[..., Any],
+        workers: int,
+        max_queued: int,
+        on_finished: Optional[Callable[[str], None]] = None,
+        bulk_handler: Optional[Callable[..., Any]] = None,
+    ) -> None:
+        self.store = store
+        self._handler = handler
+        self._bulk_handler = bulk_handler
+        self._on_finished = on_finished
+        self._workers = max(1, workers)
+        self._max_queued = max_queued
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._threads: List[threading.Thread] = []
+        self._stopping = threading.Event()
+        # document_id → heap of the (priority, seq, job_id) entries waiting for
+        # the job running for that document, so they run in queue order
+        self._waiting: Dict[str, List[Tuple[float, int, str]]] = {}
+        self._waiting_lock = threading.Lock()
+        # identifies this process (and this queue) as the owner of the jobs it runs
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    # ───────────────────── lifecycle ─────────────────────
+    def start(self) -> None:
+        """Queue unfinished jobs (those of dead owners included) and start the workers."""
+        for job in self.store.unfinished():
+            if job["status"] == RUNNING:
+                if not _owner_gone(job["owner"], self.owner):
+                    continue  # another live server is running it
+                if not self.store.requeue(job["id"], job["owner"]):
+                    continue
+                logger.info("Re-queued ingest job %s of %s", job["id"], job["owner"])
+            if not os.path.exists(job["path"]):
+                self.store.update(job["id"], status=FAILED, error="Upload lost before processing")
+                continue
+            self._queue.put((job["priority"], next(self._seq), job["id"]))
+
+        for i in range(self._workers):
+            t = threading.Thread(target=self._run, name=f"ingest-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: float | None = None) -> None:
+        self._stopping.set()
+        for _ in self._threads:
+            self._queue.put((float("inf"), next(self._seq), None))
+        for t in self._threads:
+            t.join(timeout)
+        self._threads.clear()
+
+    # ───────────────────── public API ─────────────────────
+    def submit(
+        self,
+        path: str,
+        document_id: str,
+        filename: str,
+        priority: int = 10,
+        content_hash: Optional[str] = None,
+        kind: str = DOCUMENT,
+    ) -> str:
+        """Persist a job for the spooled file (or, for bulk jobs, directory)
+        at ``path`` and queue it."""
+        if self.queued() >= self._max_queued:
+            raise QueueFullError("Ingest queue is full, retry later")
+        job_id = str(uuid.uuid4())
+        self.store.create(
+            {
+                "id": job_id,
+                "document_id": document_id,
+                "filename": filename,
+                "path": path,
+                "priority": priority,
+                "status": QUEUED,
+                "content_hash": content_hash,
+                "kind": kind,
+            }
+        )
+        self._queue.put((priority, next(self._seq), job_id))
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.store.get(job_id)
+        if job is not None and job["summary"]:
+            job["summary"] = json.loads(job["summary"])
+        return job
+
+    def find_duplicate(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        return self.store.find_by_hash(content_hash)
+
+    def has_document(self, document_id: str) -> bool:
+        return self.store.has_document(document_id)
+
+    def forget_document(self, document_id: str) -> None:
+        """After a delete, identical content is ingested again instead of deduplicated."""
+        self.store.forget_document(document_id)
+
+    def queued(self) -> int:
+        with self._waiting_lock:
+            waiting = sum(len(jobs) for jobs in self._waiting.values())
+        return self._queue.qsize() + waiting
+
+    # ───────────────────── worker ─────────────────────
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            entry = self._queue.get()
+            job_id = entry[2]
+            if job_id is None:
+                return
+            job = self.store.get(job_id)
+            if job is None:
+                continue
+            if job["kind"] == BULK:
+                self._execute(job)
+                continue
+            document_id = job["document_id"]
+            if not self._enter(document_id, entry):
+                continue  # runs once the job ingesting this document is done
+            try:
+                while job is not None:
+                    self._execute(job)
+                    job = self._next_waiting(document_id)
+            except BaseException:
+                with self._waiting_lock:
+                    self._waiting.pop(document_id, None)  # parked jobs stay queued in the store
+                raise
+
+    def _enter(self, document_id: str, entry: Tuple[float, int, str]) -> bool:
+        """Mark ``document_id`` busy, or park the queue ``entry`` behind the job running for it."""
+        with self._waiting_lock:
+            if document_id in self._waiting:
+                heapq.heappush(self._waiting[document_id], entry)
+                return False
+            self._waiting[document_id] = []
+            return True
+
+    def _next_waiting(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """The next parked job for ``document_id``; frees the document when none is left."""
+        while True:
+            with self._waiting_lock:
+                waiting = self._waiting[document_id]
+                if not waiting or self._stopping.is_set():
+                    # parked jobs stay queued in the store and are picked up on restart
+                    del self._waiting[document_id]
+                    return None
+                _, _, job_id = heapq.heappop(waiting)
+            job = self.store.get(job_id)
+            if job is not None:
+                return job
+
+    def _execute(self, job: Dict[str, Any]) -> None:
+        stage = "ingesting" if job["kind"] == BULK else "parsing"
+        job = self.store.claim(job["id"], self.owner, stage)
+        if job is None:
+            return  # claimed by another worker or server, or no longer queued
+        # sampled pyinstrument profile of the whole job (PROFILE_SAMPLE_RATE)
+        with metrics.profiled(f"ingest {job['filename']}"):
+            if job["kind"] == BULK:
+                self._process_bulk(job)
+            else:
+                self._process(job)
+
+    def _process(self, job: Dict[str, Any]) -> None:
+        job_id = job["id"]
+
+        def progress(stage: str, done: int, total: Optional[int]) -> None:
+            self.store.update(job_id, stage=stage, chunks_done=done, chunks_total=total)
+
+        try:
+            result = self._handler(
+                job["path"], job["document_id"], progress=progress, document_name=job["filename"]
+            )
+        except ValueError as ve:
+            # Parser raised unsupported / empty etc.
+            logger.warning("Ingest error in job %s: %s", job_id, ve)
+            self.store.update(job_id, status=FAILED, error=str(ve))
+        except Exception:
+            logger.exception("Fatal ingest error in job %s", job_id)
+            self.store.update(job_id, status=FAILED, error="Embedding failed, see server logs")
+        else:
+            counts = dict(
+                chunks_stored=result.stored,
+                chunks_skipped=result.skipped,
+                chunks_deleted=result.deleted,
+                chunks_done=result.chunks,
+                chunks_total=result.chunks,
+            )
+            if result.chunks == 0:
+                self.store.update(job_id, status=FAILED, stage="done",
+                                  error="No valid text chunks found", **counts)
+            else:
+                self.store.update(job_id, status=SUCCEEDED, stage="done", **counts)
+        finally:
+            try:
+                os.remove(job["path"])
+            except FileNotFoundError:
+                pass
+            if self._on_finished is not None:
+                # runs on failure too: a partial ingest may have written points
+                self._on_finished(job["document_id"])
+
+    def _process_bulk(self, job: Dict[str, Any]) -> None:
+        """Run a bulk job; per-file failures are reported in its summary."""
+        job_id = job["id"]
+
+        def progress(stage: str, done: int, total: Optional[int]) -> None:
+            summary = json.dumps({"files_done": done, "files": total})
+            self.store.update(job_id, stage=stage, summary=summary)
+
+        try:
+            report = self._bulk_handler(
+                job["path"], job_id, progress=progress, on_document=self._on_finished
+            )
+        except Exception:
+            logger.exception("Fatal bulk ingest error in job %s", job_id)
+            self.store.update(job_id, status=FAILED, error="Bulk ingest failed, see server logs")
+        else:
+            ok = report.files - report.files_failed
+            self.store.update(
+                job_id,
+                status=SUCCEEDED if ok else FAILED,
+                stage="done",
+                chunks_stored=sum(r.chunks_stored for r in report.results),
+                chunks_skipped=sum(r.chunks_skipped for r in report.results),
+                chunks_done=report.chunks,
+                chunks_total=report.chunks,
+                error=None if ok else "No file could be ingested",
+                summary=json.dumps(report.as_dict()),
+            )
+        finally:
+            shutil.rmtree(job["path"], ignore_errors=True)
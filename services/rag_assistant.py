@@ -1,17 +1,34 @@
 from __future__ import annotations
 
-from typing import List, Tuple, Optional
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, List, Sequence, Tuple, Optional, Union
 
 from langchain_openai import ChatOpenAI
-from langchain_huggingface.embeddings import HuggingFaceEmbeddings
 from langchain_core.prompts import PromptTemplate
 from langchain.schema import Document as LCDocument
-from langchain_qdrant import QdrantVectorStore
-from qdrant_client import QdrantClient  
-from qdrant_client.http.models import Filter, FieldCondition, MatchValue
-from sentence_transformers import CrossEncoder
 
+import metrics
+from embedder import SharedEmbeddings
 from models import db_settings
+from services.answer_cache import SemanticAnswerCache
+from services.context_packer import ContextBlock, pack_context, render_context
+from services.reranker import Reranker
+from storage.vector_store import SearchRequest, VectorStore, get_store
+
+logger = logging.getLogger(__name__)
+
+NO_CONTEXT_ANSWER = "I couldn't find relevant information."
+
+
+def _point_to_doc(point) -> LCDocument:
+    """Scored point with our flat ingest payload → LangChain document."""
+    payload = dict(point.payload or {})
+    content = payload.pop("page_content", "")
+    payload["_id"] = point.id
+    payload["_score"] = point.score
+    return LCDocument(page_content=content, metadata=payload)
 
 
 class ChatbotManager:
@@ -23,6 +40,7 @@ class ChatbotManager:
         llm_model: str | None = None,
         llm_temperature: float = 0.7,
         reranker_model: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        reranker_backend: str | None = None,
     ) -> None:
         # LLM
         self.llm = ChatOpenAI(
@@ -36,41 +54,107 @@ class ChatbotManager:
         self.prompt = PromptTemplate.from_template(
             "Use the following context to answer the question. "
             "If you don't know the answer, say you don't know.\n\n"
-            "Context:\n{context}\n---\nQuestion: {question}\nAnswer:"
+            "{history}Context:\n{context}\n---\nQuestion: {question}\nAnswer:"
         )
 
-        # Embeddings
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=db_settings.EMBEDDING_MODEL_NAME,
-            model_kwargs={"device": "cpu"},
-            encode_kwargs={"normalize_embeddings": True},
+        # Embeddings (same registry model as ingest, via the shared batcher/cache)
+        self.embeddings = SharedEmbeddings()
+
+        # Vector store backend (VECTOR_BACKEND)
+        self.vectors: VectorStore = get_store()
+        self.vectors.ensure()
+
+        # Cross‑encoder reranker (model loaded by the registry on first use)
+        self.reranker_engine = Reranker(
+            reranker_model,
+            backend=reranker_backend,  # torch | onnx (None → settings)
+            pool_factor=db_settings.RERANK_POOL_FACTOR,
+            pool_min=db_settings.RERANK_POOL_MIN,
+            pool_max=db_settings.RERANK_POOL_MAX,
+            skip_margin=db_settings.RERANK_SKIP_MARGIN,
+            cache_size=db_settings.RERANK_CACHE_SIZE,
         )
 
-        # Qdrant vector store
-        self.client = QdrantClient(
-            url=db_settings.QDRANT_URL,
-            api_key=db_settings.QDRANT_API_KEY,
-            prefer_grpc=False,
+        # Semantic answer cache (per document scope)
+        self.answer_cache: SemanticAnswerCache | None = (
+            SemanticAnswerCache(
+                threshold=db_settings.ANSWER_CACHE_THRESHOLD,
+                ttl_seconds=db_settings.ANSWER_CACHE_TTL_SECONDS,
+                max_entries=db_settings.ANSWER_CACHE_MAX_ENTRIES,
+            )
+            if db_settings.ANSWER_CACHE_ENABLED
+            else None
         )
-        self.store = QdrantVectorStore(
-            client=self.client,
-            collection_name=db_settings.COLLECTION_NAME,
-            embedding=self.embeddings,
+
+    @property
+    def reranker(self):
+        return self.reranker_engine.model
+
+    # ───────────────────── helpers: rerank / prompt / cite ─────────────────────
+    def _rerank(
+        self, query: str, docs: List[LCDocument], top_k: int
+    ) -> List[LCDocument]:
+        return self.reranker_engine.rerank(query, docs, top_k)
+
+    def _pack(self, top_docs: List[LCDocument]) -> List[ContextBlock]:
+        """Merge same-page chunks and fit them into ``CONTEXT_TOKEN_BUDGET``."""
+        with metrics.query_stage("pack"):
+            return pack_context(top_docs, db_settings.CONTEXT_TOKEN_BUDGET)
+
+    def _build_prompt(self, query: str, blocks: List[ContextBlock], history: str = "") -> str:
+        history = f"Conversation so far:\n{history}\n---\n" if history else ""
+        return self.prompt.format(
+            history=history, context=render_context(blocks), question=query
         )
 
-        # Default retriever (no filter)
-        self.retriever = self._build_retriever()
+    @staticmethod
+    def _citations(blocks: List[ContextBlock], require_citations: bool) -> List[dict]:
+        """One citation per context block, i.e. per page sent to the LLM."""
+        if not require_citations:
+            return []
+        return [block.citation() for block in blocks]
 
-        # Cross‑encoder reranker
-        self.reranker = CrossEncoder(reranker_model)
+    # ───────────────────── helpers: answer cache ─────────────────────
+    def _generation(self, document_id: Optional[str]) -> Optional[int]:
+        """Taken before retrieval; `_remember` skips answers invalidated since."""
+        return None if self.answer_cache is None else self.answer_cache.generation(document_id)
 
-    # ───────────────────── helper: build retriever ─────────────────────
-    def _build_retriever(self, filt: Optional[Filter] = None):
-        k_initial = max(1, db_settings.MAX_TOKENS // 100)
-        kwargs = {"k": k_initial}
-        if filt:
-            kwargs["filter"] = filt
-        return self.store.as_retriever(search_kwargs=kwargs)
+    def _cached(
+        self, query_vector, top_k: int, document_id: Optional[str], use_cache: bool
+    ) -> Optional[Tuple[str, List[dict]]]:
+        if not use_cache or self.answer_cache is None:
+            return None
+        hit = self.answer_cache.lookup(document_id, top_k, query_vector)
+        metrics.ANSWER_CACHE_LOOKUPS.labels("miss" if hit is None else "hit").inc()
+        return hit
+
+    def _remember(
+        self,
+        query_vector,
+        top_k: int,
+        document_id: Optional[str],
+        use_cache: bool,
+        answer: str,
+        blocks: List[ContextBlock],
+        started: float,
+        generation: Optional[int],
+    ) -> None:
+        if not use_cache or self.answer_cache is None or not blocks:
+            return
+        self.answer_cache.store(
+            document_id,
+            top_k,
+            query_vector,
+            answer,
+            self._citations(blocks, True),
+            compute_seconds=time.perf_counter() - started,
+            generation=generation,
+        )
+
+    def invalidate_document(self, document_id: Optional[str]) -> None:
+        """Forget cached answers after `document_id` was (re-)ingested or deleted."""
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate(document_id)
 
     # ───────────────────── public API ─────────────────────
     def get_response(
@@ -79,55 +163,283 @@ class ChatbotManager:
         top_k: int = 3,
         document_id: Optional[str] = None,
         require_citations: bool = True,
+        use_cache: bool = True,
+        history: str = "",
     ) -> Tuple[str, List[dict]]:
-        """Return answer & citations for a user query."""
-
-        # 1️⃣  Build / reuse retriever with correct filter
-        if document_id:
-            filt = Filter(
-                must=[
-                    FieldCondition(
-                        key="document_id",
-                        match=MatchValue(value=document_id),
-                    )
-                ]
-            )
-            retriever = self._build_retriever(filt)
-        else:
-            retriever = self.retriever
+        """Return answer & citations for a user query.
+
+        ``history`` (earlier turns) goes into the LLM prompt only; retrieval
+        and reranking see just ``query``.  Answers with history are not cached.
+        """
+        started = time.perf_counter()
+        use_cache = use_cache and not history
 
-        docs: List[LCDocument] = retriever.invoke(query)
-        # print(docs)
+        # 0️⃣  Embed once: used for the answer cache and the vector search
+        with metrics.query_stage("embed"):
+            query_vector = self.embeddings.embed_query(query)
+        generation = self._generation(document_id)
+        hit = self._cached(query_vector, top_k, document_id, use_cache)
+        if hit is not None:
+            answer, citations = hit
+            return answer, citations if require_citations else []
+
+        # 1️⃣  Hybrid dense + BM25 search (filter passed per call)
+        with metrics.query_stage("retrieve"):
+            points = self.vectors.search(
+                query_vector,
+                limit=self.reranker_engine.pool_size(top_k),
+                document_id=document_id,
+                query_text=query,
+            )
+        docs = [_point_to_doc(p) for p in points]
         if not docs:
-            return "I couldn't find relevant information.", []
+            return NO_CONTEXT_ANSWER, []
 
         # 2️⃣  Rerank
-        scores = self.reranker.predict([(query, d.page_content) for d in docs])
-        ranked = sorted(zip(docs, scores), key=lambda x: x[1], reverse=True)
-        top_docs = [d for d, _ in ranked[:top_k]]
-
-        # 3️⃣  Prepare LLM context
-        context = "\n\n".join(
-            f"Source: {d.metadata.get('document_name')} "
-            f"(page {d.metadata.get('page')})\n{d.page_content}"
-            for d in top_docs
-        )
-        prompt_str = self.prompt.format(context=context, question=query)
+        with metrics.query_stage("rerank"):
+            top_docs = self._rerank(query, docs, top_k)
+
+        # 3️⃣  Prepare LLM context (same-page chunks merged, token budget)
+        blocks = self._pack(top_docs)
+        prompt_str = self._build_prompt(query, blocks, history)
 
         # 4️⃣  Call LLM (extract .content from AIMessage)
-        answer = self.llm.invoke(prompt_str).content
+        with metrics.query_stage("llm"):
+            message = self.llm.invoke(prompt_str)
+        metrics.record_llm_usage(message)
+        answer = message.content
+        self._remember(
+            query_vector, top_k, document_id, use_cache, answer, blocks, started, generation
+        )
 
         # 5️⃣  Citations
-        citations = (
-            [
-                {
-                    "document_name": d.metadata.get("document_name"),
-                    "page": d.metadata.get("page"),
-                }
-                for d in top_docs
-            ]
-            if require_citations
-            else []
+        return answer, self._citations(blocks, require_citations)
+
+    async def aget_response(
+        self,
+        query: str,
+        top_k: int = 3,
+        document_id: Optional[str] = None,
+        require_citations: bool = True,
+        use_cache: bool = True,
+        history: str = "",
+    ) -> Tuple[str, List[dict]]:
+        """Async `get_response`: never blocks the event loop.
+
+        The vector store is queried asynchronously and the LLM through
+        `ainvoke`; the CPU-bound query embedding and cross-encoder scoring run
+        in the default executor.
+        """
+        started = time.perf_counter()
+        use_cache = use_cache and not history
+        query_vector = await self._aembed(query)
+        generation = self._generation(document_id)
+        hit = self._cached(query_vector, top_k, document_id, use_cache)
+        if hit is not None:
+            answer, citations = hit
+            return answer, citations if require_citations else []
+
+        top_docs = await self._aretrieve(query, query_vector, top_k, document_id)
+        if not top_docs:
+            return NO_CONTEXT_ANSWER, []
+
+        # 3️⃣  Prepare LLM context + 4️⃣  async LLM call
+        blocks = self._pack(top_docs)
+        prompt_str = self._build_prompt(query, blocks, history)
+        with metrics.query_stage("llm"):
+            message = await self.llm.ainvoke(prompt_str)
+        metrics.record_llm_usage(message)
+        answer = message.content
+        self._remember(
+            query_vector, top_k, document_id, use_cache, answer, blocks, started, generation
         )
 
-        return answer, citations
+        # 5️⃣  Citations
+        return answer, self._citations(blocks, require_citations)
+
+    async def astream_response(
+        self,
+        query: str,
+        top_k: int = 3,
+        document_id: Optional[str] = None,
+        require_citations: bool = True,
+        use_cache: bool = True,
+        history: str = "",
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Stream an answer: one ``("citations", list)`` event, then
+        ``("token", str)`` events as the LLM produces them.  A cached answer
+        is sent as a single token event."""
+        started = time.perf_counter()
+        use_cache = use_cache and not history
+        query_vector = await self._aembed(query)
+        generation = self._generation(document_id)
+        hit = self._cached(query_vector, top_k, document_id, use_cache)
+        if hit is not None:
+            answer, citations = hit
+            yield "citations", citations if require_citations else []
+            yield "token", answer
+            return
+
+        top_docs = await self._aretrieve(query, query_vector, top_k, document_id)
+        blocks = self._pack(top_docs)
+        yield "citations", self._citations(blocks, require_citations)
+
+        if not blocks:
+            yield "token", NO_CONTEXT_ANSWER
+            return
+
+        prompt_str = self._build_prompt(query, blocks, history)
+        parts: List[str] = []
+        with metrics.query_stage("llm"):
+            async for chunk in self.llm.astream(prompt_str):
+                metrics.record_llm_usage(chunk)  # usage arrives on the last chunk
+                if chunk.content:
+                    parts.append(chunk.content)
+                    yield "token", chunk.content
+        self._remember(
+            query_vector, top_k, document_id, use_cache, "".join(parts), blocks, started,
+            generation,
+        )
+
+    async def aget_batch_responses(
+        self,
+        queries: Sequence[Tuple[str, int, Optional[str]]],
+        use_cache: bool = True,
+        concurrency: int = 8,
+    ) -> List[Union[Tuple[str, List[dict]], Exception]]:
+        """Answer many ``(query, top_k, document_id)`` at once.
+
+        The shared stages are batched: one priority-lane embedding call for
+        all queries, one vector store batch search, one cross-encoder call
+        for every (query, passage) pair.  The LLM calls then run at most
+        ``concurrency`` at a time.  Returns, per query, ``(answer, citations)``
+        or the exception that query failed with: when a batched stage fails,
+        it is retried query by query, so only the queries that fail on their
+        own get an error.
+        """
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        results: List[Any] = [None] * len(queries)
+        generations = [self._generation(document_id) for _, _, document_id in queries]
+
+        def run(fn, *args):
+            return loop.run_in_executor(None, fn, *args)
+
+        async def per_query(stage: str, pending: List[int], batched, single) -> Dict[int, Any]:
+            """``batched(pending)``, or ``single(i)`` for each query if that fails;
+            queries that fail on their own get their exception as result."""
+            try:
+                outputs = await batched(pending)
+            except Exception:
+                logger.warning("Batched %s failed; retrying query by query", stage, exc_info=True)
+                outputs = await asyncio.gather(*(single(i) for i in pending), return_exceptions=True)
+            done = {}
+            for i, output in zip(pending, outputs):
+                if isinstance(output, Exception):
+                    results[i] = output
+                else:
+                    done[i] = output
+            return done
+
+        # 0️⃣  Embed every query in one call (cache lookups per query)
+        with metrics.query_stage("embed"):
+            vectors = await per_query(
+                "embedding",
+                list(range(len(queries))),
+                lambda pending: run(self.embeddings.embed_queries, [queries[i][0] for i in pending]),
+                lambda i: run(self.embeddings.embed_query, queries[i][0]),
+            )
+        pending = []
+        for i, vector in vectors.items():
+            _, top_k, document_id = queries[i]
+            results[i] = self._cached(vector, top_k, document_id, use_cache)
+            if results[i] is None:
+                pending.append(i)
+
+        # 1️⃣  One batch search for the cache misses
+        def request(i: int) -> SearchRequest:
+            query, top_k, document_id = queries[i]
+            return vectors[i], self.reranker_engine.pool_size(top_k), document_id, query
+
+        with metrics.query_stage("retrieve"):
+            point_lists = await per_query(
+                "search",
+                pending,
+                lambda pending: self.vectors.asearch_batch([request(i) for i in pending]),
+                lambda i: self.vectors.asearch(*request(i)),
+            )
+        candidates: Dict[int, List[LCDocument]] = {}
+        for i, points in point_lists.items():
+            if points:
+                candidates[i] = [_point_to_doc(p) for p in points]
+            else:
+                results[i] = (NO_CONTEXT_ANSWER, [])
+
+        # 2️⃣  Rerank all (query, passage) pairs in one cross-encoder call
+        def rerank_request(i: int) -> Tuple[str, List[LCDocument], int]:
+            return queries[i][0], candidates[i], queries[i][1]
+
+        with metrics.query_stage("rerank"):
+            ranked = await per_query(
+                "rerank",
+                list(candidates),
+                lambda pending: run(
+                    self.reranker_engine.rerank_batch, [rerank_request(i) for i in pending]
+                ),
+                lambda i: run(self._rerank, *rerank_request(i)),
+            )
+
+        # 3️⃣  Prepare LLM context + 4️⃣  LLM calls, bounded concurrency
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def answer(i: int, top_docs: List[LCDocument]) -> Tuple[str, List[dict]]:
+            query, top_k, document_id = queries[i]
+            blocks = self._pack(top_docs)
+            prompt_str = self._build_prompt(query, blocks)
+            async with semaphore:
+                with metrics.query_stage("llm"):
+                    message = await self.llm.ainvoke(prompt_str)
+            metrics.record_llm_usage(message)
+            self._remember(
+                vectors[i], top_k, document_id, use_cache, message.content, blocks, started,
+                generations[i],
+            )
+            return message.content, self._citations(blocks, True)
+
+        outcomes = await asyncio.gather(
+            *(answer(i, top_docs) for i, top_docs in ranked.items()),
+            return_exceptions=True,
+        )
+        for i, outcome in zip(ranked, outcomes):
+            results[i] = outcome
+        return results
+
+    async def _aembed(self, query: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        with metrics.query_stage("embed"):
+            return await loop.run_in_executor(None, self.embeddings.embed_query, query)
+
+    async def _aretrieve(
+        self,
+        query: str,
+        query_vector: List[float],
+        top_k: int,
+        document_id: Optional[str],
+    ) -> List[LCDocument]:
+        """Async hybrid search + rerank; returns the `top_k` best documents."""
+        # 1️⃣  Async hybrid search (filter passed per call)
+        with metrics.query_stage("retrieve"):
+            points = await self.vectors.asearch(
+                query_vector,
+                limit=self.reranker_engine.pool_size(top_k),
+                document_id=document_id,
+                query_text=query,
+            )
+        docs = [_point_to_doc(p) for p in points]
+        if not docs:
+            return []
+
+        # 2️⃣  Rerank off the event loop
+        loop = asyncio.get_running_loop()
+        with metrics.query_stage("rerank"):
+            return await loop.run_in_executor(None, self._rerank, query, docs, top_k)
@@ -0,0 +1,186 @@
+"""Cross-encoder reranking with adaptive candidate pool and score cache.
+
+* The candidate pool fetched from the vector store scales with ``top_k``
+  (``top_k * pool_factor``, clamped to ``[pool_min, pool_max]``).
+* Scores are cached per ``(query, point id)``, so repeated questions over the
+  same chunks skip the cross-encoder for pairs it has already seen.
+* With ``skip_margin > 0`` the cross-encoder is skipped entirely when the
+  first-stage dense (cosine) scores already separate the top ``top_k`` from
+  the rest by at least that margin.  Hybrid results are ordered by fused RRF
+  scores, which only encode ranks, so the store attaches each point's dense
+  score as ``_dense_score`` and the rule uses that instead.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from langchain.schema import Document as LCDocument
+
+from model_registry import get_cross_encoder
+
+
+class Reranker:
+    """Thread-safe reranker; the model itself comes from the model registry."""
+
+    def __init__(
+        self,
+        model_name: str,
+        backend: Optional[str] = None,
+        pool_factor: int = 2,
+        pool_min: int = 5,
+        pool_max: int = 30,
+        skip_margin: float = 0.0,
+        cache_size: int = 10_000,
+    ) -> None:
+        self.model_name = model_name
+        self.backend = backend
+        self.pool_factor = max(1, pool_factor)
+        self.pool_min = max(1, pool_min)
+        self.pool_max = max(self.pool_min, pool_max)
+        self.skip_margin = skip_margin
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._queries = 0
+        self._skipped = 0
+        self._pairs_scored = 0
+        self._cache_hits = 0
+        self._seconds_total = 0.0
+        self._seconds_max = 0.0
+
+    @property
+    def model(self):
+        return get_cross_encoder(self.model_name, backend=self.backend)
+
+    def pool_size(self, top_k: int) -> int:
+        """Number of first-stage candidates to fetch for a `top_k` answer."""
+        return min(self.pool_max, max(self.pool_min, top_k * self.pool_factor))
+
+    # ───────────────────── public API ─────────────────────
+    def rerank(self, query: str, docs: List[LCDocument], top_k: int) -> List[LCDocument]:
+        """Return the `top_k` best documents for `query`."""
+        started = time.perf_counter()
+        skipped = self._clearly_separated(docs, top_k)
+        if skipped:
+            ranked = docs[:top_k]
+        else:
+            scores = self._scores(query, docs)
+            order = sorted(range(len(docs)), key=lambda i: scores[i], reverse=True)
+            ranked = [docs[i] for i in order[:top_k]]
+        self._record(time.perf_counter() - started, skipped)
+        return ranked
+
+    def rerank_batch(
+        self, requests: Sequence[Tuple[str, List[LCDocument], int]]
+    ) -> List[List[LCDocument]]:
+        """`rerank` for several ``(query, docs, top_k)`` at once.
+
+        The uncached pairs of all queries are scored in a single
+        cross-encoder call.
+        """
+        started = time.perf_counter()
+        skipped = [self._clearly_separated(docs, top_k) for _, docs, top_k in requests]
+        scored = [(query, docs) for (query, docs, _), skip in zip(requests, skipped) if not skip]
+        all_scores = iter(self._scores_many(scored))
+        results = []
+        for (query, docs, top_k), skip in zip(requests, skipped):
+            if skip:
+                results.append(docs[:top_k])
+                continue
+            scores = next(all_scores)
+            order = sorted(range(len(docs)), key=lambda i: scores[i], reverse=True)
+            results.append([docs[i] for i in order[:top_k]])
+        share = (time.perf_counter() - started) / max(1, len(requests))
+        for skip in skipped:
+            self._record(share, skip)
+        return results
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "queries": self._queries,
+                "skipped": self._skipped,
+                "pairs_scored": self._pairs_scored,
+                "cache_hits": self._cache_hits,
+                "cache_entries": len(self._cache),
+                "avg_ms": self._seconds_total / self._queries * 1000 if self._queries else 0.0,
+                "max_ms": self._seconds_max * 1000,
+                "pool_factor": self.pool_factor,
+                "pool_min": self.pool_min,
+                "pool_max": self.pool_max,
+                "skip_margin": self.skip_margin,
+            }
+
+    # ───────────────────── internals ─────────────────────
+    def _clearly_separated(self, docs: List[LCDocument], top_k: int) -> bool:
+        """Every dense score of the first top_k is ≥ skip_margin above the rest."""
+        if self.skip_margin <= 0 or len(docs) <= top_k:
+            return False
+        dense = [_dense_score(d) for d in docs]
+        if any(s is None for s in dense):
+            return False
+        return min(dense[:top_k]) - max(dense[top_k:]) >= self.skip_margin
+
+    def _scores(self, query: str, docs: List[LCDocument]) -> List[float]:
+        return self._scores_many([(query, docs)])[0]
+
+    def _scores_many(self, groups: Sequence[Tuple[str, List[LCDocument]]]) -> List[List[float]]:
+        """Scores of every (query, doc) pair; cache misses go to one ``predict``."""
+        keys = []
+        for query, docs in groups:
+            qkey = hashlib.sha1(query.encode("utf-8")).hexdigest()
+            keys.append([(qkey, _doc_key(d)) for d in docs])
+        scores: List[List[Optional[float]]] = []
+        with self._lock:
+            for group_keys in keys:
+                group_scores = []
+                for key in group_keys:
+                    score = self._cache.get(key)
+                    if score is not None:
+                        self._cache.move_to_end(key)
+                    group_scores.append(score)
+                scores.append(group_scores)
+        missing = [
+            (g, i) for g, group_scores in enumerate(scores)
+            for i, s in enumerate(group_scores) if s is None
+        ]
+
+        if missing:
+            fresh = self.model.predict(
+                [(groups[g][0], groups[g][1][i].page_content) for g, i in missing]
+            )
+            with self._lock:
+                for (g, i), score in zip(missing, fresh):
+                    scores[g][i] = float(score)
+                    self._cache[keys[g][i]] = float(score)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        with self._lock:
+            self._pairs_scored += len(missing)
+            self._cache_hits += sum(len(k) for k in keys) - len(missing)
+        return scores  # type: ignore[return-value]
+
+    def _record(self, seconds: float, skipped: bool) -> None:
+        with self._lock:
+            self._queries += 1
+            self._skipped += int(skipped)
+            self._seconds_total += seconds
+            self._seconds_max = max(self._seconds_max, seconds)
+
+
+def _dense_score(doc: LCDocument) -> Optional[float]:
+    """Dense similarity of a first-stage hit; ``None`` if only a fused score is known."""
+    if "_dense_score" in doc.metadata:
+        return doc.metadata["_dense_score"]
+    return doc.metadata.get("_score")
+
+
+def _doc_key(doc: LCDocument) -> str:
+    # content hash guards against a point ID being reused for new text
+    digest = hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()[:16]
+    return f"{doc.metadata.get('_id')}:{digest}"
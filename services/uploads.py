@@ -0,0 +1,133 @@
+"""Upload handling — constant-memory spooling with size limit and hashing.
+
+Uploads are copied to disk in fixed-size chunks; the byte limit is enforced
+as data arrives and a SHA-256 of the content is computed in the same pass,
+so duplicate uploads can be recognised without re-reading the file.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import zipfile
+from dataclasses import dataclass
+from typing import Collection, List
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+SPOOL_CHUNK_BYTES = 1024 * 1024
+
+
+@dataclass
+class SpooledUpload:
+    path: str
+    size: int
+    sha256: str
+
+
+async def spool_upload(
+    file: UploadFile, dest_dir: str, suffix: str, max_bytes: int
+) -> SpooledUpload:
+    """Copy ``file`` into ``dest_dir`` chunk by chunk, hashing as it goes.
+
+    Raises ``HTTPException(413)`` (and removes the partial file) as soon as
+    more than ``max_bytes`` have been read; ``file.size`` is not trusted.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False, dir=dest_dir) as tmp:
+        try:
+            while chunk := await file.read(SPOOL_CHUNK_BYTES):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(413, f"File larger than {max_bytes // (1024 * 1024)} MB")
+                digest.update(chunk)
+                tmp.write(chunk)
+        except BaseException:
+            tmp.close()
+            os.remove(tmp.name)
+            raise
+    return SpooledUpload(path=tmp.name, size=size, sha256=digest.hexdigest())
+
+
+def unique_path(dest_dir: str, name: str) -> str:
+    """``dest_dir/name`` with a numeric prefix if that file already exists."""
+    name = os.path.basename(name) or "upload"
+    path = os.path.join(dest_dir, name)
+    n = 1
+    while os.path.exists(path):
+        path = os.path.join(dest_dir, f"{n}-{name}")
+        n += 1
+    return path
+
+
+def extract_archive(
+    archive: str, dest_dir: str, allowed_ext: Collection[str], max_bytes: int
+) -> List[str]:
+    """Extract supported members of a zip into ``dest_dir``; return their paths.
+
+    Members are written under flattened, de-duplicated names (no path from the
+    archive is trusted), and the uncompressed total is counted as it is
+    written, raising ``HTTPException(413)`` beyond ``max_bytes``.
+    """
+    written: List[str] = []
+    total = 0
+    try:
+        with zipfile.ZipFile(archive) as zf:
+            for info in zf.infolist():
+                ext = info.filename.rsplit(".", 1)[-1].lower()
+                if info.is_dir() or ext not in allowed_ext:
+                    continue
+                target = unique_path(dest_dir, info.filename.replace("\\", "/").rsplit("/", 1)[-1])
+                with zf.open(info) as src, open(target, "wb") as dst:
+                    while chunk := src.read(SPOOL_CHUNK_BYTES):
+                        total += len(chunk)
+                        if total > max_bytes:
+                            raise HTTPException(
+                                413, f"Archive expands beyond {max_bytes // (1024 * 1024)} MB"
+                            )
+                        dst.write(chunk)
+                written.append(target)
+    except zipfile.BadZipFile:
+        raise HTTPException(400, f"Not a valid zip archive: {os.path.basename(archive)}")
+    return written
+
+
+class UploadSizeLimitMiddleware:
+    """Reject request bodies on upload routes once they exceed ``max_bytes``.
+
+    A declared ``Content-Length`` above the limit is refused before any body
+    is read; otherwise bytes are counted as they are received, so an
+    oversized chunked upload is aborted mid-stream instead of being spooled
+    in full by the multipart parser.
+    """
+
+    def __init__(self, app, max_bytes: int, paths: tuple[str, ...]) -> None:
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Request body larger than {self.max_bytes // (1024 * 1024)} MB"
+        declared = dict(scope["headers"]).get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > self.max_bytes:
+            await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(413, detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
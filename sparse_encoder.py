@@ -0,0 +1,74 @@
+"""Sparse lexical encoder — BM25 term weights for Qdrant sparse vectors.
+
+Dense embeddings blur exact identifiers (error codes, SKUs, version
+numbers); a sparse lexical vector stored next to the dense one lets the
+first stage match them verbatim.  Documents get the BM25 term-frequency
+component ``tf·(k1+1) / (tf + k1·(1 − b + b·dl/avgdl))``; the IDF component
+is applied server-side by Qdrant (``Modifier.IDF``), so no corpus
+statistics have to be kept here.  Queries are plain term sets.
+
+Token indices are CRC32 hashes, stable across processes and restarts.
+"""
+from __future__ import annotations
+
+import re
+import zlib
+from collections import Counter
+from typing import Dict, List
+
+from qdrant_client.http.models import SparseVector
+
+from models import db_settings
+
+# words, numbers and identifiers such as ERR-404, v1.2.3, SKU_8812
+_TOKEN_RE = re.compile(r"\w+(?:[-_./]\w+)*", re.UNICODE)
+_SPLIT_RE = re.compile(r"[-_./]")
+
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have if in into is it its of on or "
+    "such that the their then there these they this to was were will with".split()
+)
+
+_K1 = 1.2
+_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased terms; compound identifiers also contribute their parts."""
+    terms: List[str] = []
+    for match in _TOKEN_RE.finditer(text.lower()):
+        token = match.group(0)
+        if token in _STOPWORDS:
+            continue
+        terms.append(token)
+        if _SPLIT_RE.search(token):
+            terms.extend(p for p in _SPLIT_RE.split(token) if p and p not in _STOPWORDS)
+    return terms
+
+
+def _index(term: str) -> int:
+    return zlib.crc32(term.encode("utf-8")) & 0x7FFFFFFF
+
+
+def _to_sparse(weights: Dict[int, float]) -> SparseVector:
+    indices = sorted(weights)
+    return SparseVector(indices=indices, values=[weights[i] for i in indices])
+
+
+def encode_document(text: str) -> SparseVector:
+    """BM25 term-frequency weights for one chunk."""
+    terms = tokenize(text)
+    if not terms:
+        return SparseVector(indices=[], values=[])
+    norm = _K1 * (1 - _B + _B * len(terms) / db_settings.BM25_AVG_DOC_TERMS)
+    weights: Dict[int, float] = {}
+    for term, tf in Counter(terms).items():
+        idx = _index(term)
+        # hash collisions are rare; add rather than overwrite when they happen
+        weights[idx] = weights.get(idx, 0.0) + tf * (_K1 + 1) / (tf + norm)
+    return _to_sparse(weights)
+
+
+def encode_query(text: str) -> SparseVector:
+    """Unit weight per distinct query term (IDF is applied by Qdrant)."""
+    return _to_sparse({_index(t): 1.0 for t in set(tokenize(text))})
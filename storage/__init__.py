@@ -1 +1,2 @@
-from .qdrant_client import client
\ No newline at end of file
+from .qdrant_client import get_client, get_async_client, ensure_collection
+from .vector_store import VectorStore, get_store
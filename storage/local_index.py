@@ -0,0 +1,479 @@
+"""Embedded vector index — ``VECTOR_BACKEND=local``, no Qdrant required.
+
+Layout of ``LOCAL_INDEX_PATH``:
+
+* ``vectors.float32`` / ``vectors.float16`` — a row-major matrix of unit
+  vectors, memory-mapped, so the OS pages it in and out instead of the
+  process holding it; float16 halves disk and page-cache use at a small
+  precision cost.
+* ``points.sqlite3`` — the sidecar: row number → point ID, ``document_id``
+  and JSON payload (WAL).  Payloads are read only for the rows returned.
+
+Search is exact (a blocked matrix–vector product) unless ``hnsw`` is on,
+`hnswlib` is installed and the index holds at least ``hnsw_min`` points;
+then unfiltered searches use an in-memory HNSW graph, built when the index
+is opened and updated on every upsert / delete.  Searches filtered to one
+document always scan just that document's rows exactly.
+
+Rows freed by deletes are reused; the matrix grows by doubling.  Hybrid
+(keyword) retrieval is not supported: ``query_text`` is ignored.
+
+Row allocation lives in process memory, so one process at a time may open
+an index: `ensure` takes an exclusive ``flock`` on ``LOCK`` in the index
+directory and refuses to open it while another process holds it (run one
+server worker, or use Qdrant for several).
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set
+
+import numpy as np
+from qdrant_client.http.models import PointStruct, ScoredPoint
+
+try:
+    import fcntl
+except ImportError:  # not on Windows: no cross-process guard there
+    fcntl = None
+
+from storage.vector_store import PointId, SearchRequest, VectorStore
+
+logger = logging.getLogger(__name__)
+
+_SCAN_BLOCK = 65_536  # rows per matrix-vector product in exact search
+_BATCH_SCORES = 1 << 24  # score-matrix cells per query group in `search_batch`
+_MIN_CAPACITY = 1024
+
+
+class IndexLockedError(RuntimeError):
+    """The local index is open for writing in another process."""
+
+
+def _dense(vector: Any) -> List[float]:
+    """The dense part of a point vector (``{"": dense, "bm25": ...}`` or a list)."""
+    return vector[""] if isinstance(vector, dict) else vector
+
+
+def _unit(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class LocalVectorStore(VectorStore):
+    """Memory-mapped matrix + SQLite sidecar; ``path=None`` keeps both in memory."""
+
+    def __init__(
+        self,
+        path: Optional[str],
+        dim: int,
+        dtype: str = "float32",
+        hnsw: bool = True,
+        hnsw_min: int = 20_000,
+        hnsw_m: int = 16,
+        hnsw_ef: int = 64,
+    ) -> None:
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"LOCAL_INDEX_DTYPE must be float32 or float16, not {dtype}")
+        self.path = path
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.hnsw_enabled = hnsw
+        self.hnsw_min = hnsw_min
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef = hnsw_ef
+        self._lock = threading.RLock()
+        self._ready = False
+        self._lock_file = None
+
+    # ───────────────────── open / grow ─────────────────────
+    def ensure(self) -> None:
+        if self._ready:
+            return
+        with self._lock:
+            if self._ready:
+                return
+            if self.path is not None:
+                os.makedirs(self.path, exist_ok=True)
+                self._acquire_writer()
+                self._matrix_file = os.path.join(self.path, f"vectors.{self.dtype.name}")
+                db = os.path.join(self.path, "points.sqlite3")
+            else:
+                self._matrix_file = None
+                db = ":memory:"
+            self._conn = sqlite3.connect(db, check_same_thread=False)
+            try:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS points (
+                        row         INTEGER PRIMARY KEY,
+                        id          TEXT NOT NULL UNIQUE,
+                        document_id TEXT,
+                        payload     TEXT NOT NULL
+                    )
+                    """
+                )
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+                )
+                self._check_meta()
+                self._conn.commit()
+            except BaseException:
+                self._conn.close()
+                self._release_writer()
+                raise
+
+            self._capacity = 0
+            self._matrix = np.zeros((0, self.dim), dtype=self.dtype)
+            self._alive = np.zeros(0, dtype=bool)
+            self._ids: List[Optional[str]] = []
+            self._docs: List[Optional[str]] = []
+            self._rows: Dict[str, int] = {}
+            self._doc_rows: Dict[str, Set[int]] = {}
+            self._hnsw = None
+            self._open_matrix()
+            self._size = 0
+            for row, point_id, document_id in self._conn.execute(
+                "SELECT row, id, document_id FROM points"
+            ):
+                self._register(row, point_id, document_id)
+                self._size = max(self._size, row + 1)
+            self._free = [r for r in range(self._size) if not self._alive[r]]
+            self._ready = True
+            self._maybe_build_hnsw()
+            logger.info("Local vector index %s: %d points", self.path or ":memory:", len(self._rows))
+
+    def _acquire_writer(self) -> None:
+        """Take the index's exclusive writer lock, or raise `IndexLockedError`."""
+        if fcntl is None:
+            return
+        lock_file = open(os.path.join(self.path, "LOCK"), "a+")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.seek(0)
+            holder = lock_file.read().strip() or "another process"
+            lock_file.close()
+            raise IndexLockedError(
+                f"Local index at {self.path} is in use by {holder}; it supports one "
+                "process at a time (use VECTOR_BACKEND=qdrant for several workers)"
+            ) from None
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(f"pid {os.getpid()}")
+        lock_file.flush()
+        self._lock_file = lock_file
+
+    def close(self) -> None:
+        """Flush and release the index (and its writer lock); `ensure` reopens it."""
+        with self._lock:
+            if not self._ready:
+                return
+            if self._matrix_file is not None:
+                self._matrix.flush()
+            self._conn.close()
+            self._matrix = np.zeros((0, self.dim), dtype=self.dtype)
+            self._hnsw = None
+            self._release_writer()
+            self._ready = False
+
+    def _release_writer(self) -> None:
+        if self._lock_file is not None:
+            self._lock_file.close()  # closing the descriptor drops the flock
+            self._lock_file = None
+
+    def _check_meta(self) -> None:
+        meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+        want = {"dim": str(self.dim), "dtype": self.dtype.name}
+        if not meta:
+            self._conn.executemany("INSERT INTO meta VALUES (?, ?)", want.items())
+        elif meta != want:
+            raise ValueError(
+                f"Local index at {self.path} was built with {meta}, settings ask for {want}"
+            )
+
+    def _open_matrix(self) -> None:
+        if self._matrix_file is None:
+            return
+        row_bytes = self.dim * self.dtype.itemsize
+        if not os.path.exists(self._matrix_file):
+            with open(self._matrix_file, "wb") as f:
+                f.truncate(_MIN_CAPACITY * row_bytes)
+        capacity = os.path.getsize(self._matrix_file) // row_bytes
+        self._matrix = np.memmap(
+            self._matrix_file, dtype=self.dtype, mode="r+", shape=(capacity, self.dim)
+        )
+        self._grow_bookkeeping(capacity)
+
+    def _grow_bookkeeping(self, capacity: int) -> None:
+        alive = np.zeros(capacity, dtype=bool)
+        alive[: len(self._alive)] = self._alive
+        self._alive = alive
+        self._ids.extend([None] * (capacity - len(self._ids)))
+        self._docs.extend([None] * (capacity - len(self._docs)))
+        self._capacity = capacity
+
+    def _reserve(self, rows: int) -> None:
+        """Make room for ``rows`` rows (doubling); searches in flight keep the old map."""
+        if rows <= self._capacity:
+            return
+        capacity = max(rows, self._capacity * 2, _MIN_CAPACITY)
+        if self._matrix_file is not None:
+            self._matrix.flush()
+            with open(self._matrix_file, "r+b") as f:
+                f.truncate(capacity * self.dim * self.dtype.itemsize)
+            matrix = np.memmap(
+                self._matrix_file, dtype=self.dtype, mode="r+", shape=(capacity, self.dim)
+            )
+        else:
+            matrix = np.zeros((capacity, self.dim), dtype=self.dtype)
+            matrix[: self._capacity] = self._matrix
+        self._matrix = matrix
+        self._grow_bookkeeping(capacity)
+        if self._hnsw is not None:
+            self._hnsw.resize_index(capacity)
+
+    def _register(self, row: int, point_id: str, document_id: Optional[str]) -> None:
+        self._ids[row] = point_id
+        self._docs[row] = document_id
+        self._alive[row] = True
+        self._rows[point_id] = row
+        self._doc_rows.setdefault(document_id, set()).add(row)
+
+    def _release(self, rows: List[int]) -> None:
+        for row in rows:
+            point_id, document_id = self._ids[row], self._docs[row]
+            self._rows.pop(point_id, None)
+            doc_rows = self._doc_rows.get(document_id)
+            if doc_rows is not None:
+                doc_rows.discard(row)
+                if not doc_rows:
+                    del self._doc_rows[document_id]
+            self._ids[row] = self._docs[row] = None
+            self._alive[row] = False
+            self._free.append(row)
+            if self._hnsw is not None:
+                self._hnsw.mark_deleted(row)
+                self._hnsw_deleted.add(row)
+        self._conn.executemany("DELETE FROM points WHERE row = ?", [(r,) for r in rows])
+        self._conn.commit()
+
+    # ───────────────────── HNSW ─────────────────────
+    def _maybe_build_hnsw(self) -> None:
+        if self._hnsw is not None or not self.hnsw_enabled or len(self._rows) < self.hnsw_min:
+            return
+        try:
+            import hnswlib
+        except ImportError:
+            logger.info("hnswlib not installed; local index keeps using exact search")
+            self.hnsw_enabled = False
+            return
+        rows = np.flatnonzero(self._alive)
+        index = hnswlib.Index(space="ip", dim=self.dim)  # unit vectors: ip = cosine
+        index.init_index(
+            max_elements=max(self._capacity, _MIN_CAPACITY), M=self.hnsw_m, ef_construction=200
+        )
+        if rows.size:
+            index.add_items(np.asarray(self._matrix[rows], dtype=np.float32), rows)
+        index.set_ef(self.hnsw_ef)
+        self._hnsw = index
+        self._hnsw_deleted: Set[int] = set()
+        logger.info("Built HNSW graph over %d local index points", len(rows))
+
+    def _hnsw_add(self, vectors: np.ndarray, rows: List[int]) -> None:
+        for row in rows:
+            if row in self._hnsw_deleted:  # a freed row being reused
+                self._hnsw.unmark_deleted(row)
+                self._hnsw_deleted.discard(row)
+        self._hnsw.add_items(vectors, rows)
+
+    # ───────────────────── VectorStore API ─────────────────────
+    def upsert(self, points: List[PointStruct], wait: Optional[bool] = None) -> None:
+        # points are searchable on return either way
+        if not points:
+            return
+        self.ensure()
+        vectors = _unit(np.asarray([_dense(p.vector) for p in points], dtype=np.float32))
+        with self._lock:
+            rows: List[int] = []
+            records = []
+            for point in points:
+                point_id = str(point.id)
+                payload = dict(point.payload or {})
+                document_id = payload.get("document_id")
+                row = self._rows.get(point_id)
+                if row is not None:
+                    self._release_doc(row)
+                elif self._free:
+                    row = self._free.pop()
+                else:
+                    row = self._size
+                    self._size += 1
+                    self._reserve(self._size)
+                self._register(row, point_id, document_id)
+                rows.append(row)
+                records.append((row, point_id, document_id, json.dumps(payload)))
+            self._matrix[rows] = vectors.astype(self.dtype)
+            if self._matrix_file is not None:
+                self._matrix.flush()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO points (row, id, document_id, payload) VALUES (?, ?, ?, ?)",
+                records,
+            )
+            self._conn.commit()
+            if self._hnsw is not None:
+                self._hnsw_add(vectors, rows)
+            else:
+                self._maybe_build_hnsw()
+
+    def _release_doc(self, row: int) -> None:
+        """Detach ``row`` from its document before it is rewritten in place."""
+        doc_rows = self._doc_rows.get(self._docs[row])
+        if doc_rows is not None:
+            doc_rows.discard(row)
+            if not doc_rows:
+                del self._doc_rows[self._docs[row]]
+
+    def search(
+        self,
+        query_vector: List[float],
+        limit: int = 3,
+        document_id: Optional[str] = None,
+        query_text: Optional[str] = None,
+    ) -> List[ScoredPoint]:
+        self.ensure()
+        query = _unit(np.asarray(query_vector, dtype=np.float32))
+        with self._lock:
+            matrix, alive, size, index = self._matrix, self._alive, self._size, self._hnsw
+            rows = (
+                np.fromiter(self._doc_rows.get(document_id, ()), dtype=np.int64)
+                if document_id
+                else None
+            )
+            live = len(self._rows)
+        if limit <= 0 or live == 0 or (rows is not None and rows.size == 0):
+            return []
+
+        if rows is None and index is not None:
+            try:
+                labels, distances = index.knn_query(query, k=min(limit, live))
+                return self._scored(labels[0], 1.0 - distances[0])
+            except RuntimeError:  # too few live items reachable; scan instead
+                pass
+
+        if rows is not None:
+            scores = np.asarray(matrix[rows], dtype=np.float32) @ query
+        else:
+            rows = np.arange(size)
+            scores = np.empty(size, dtype=np.float32)
+            for start in range(0, size, _SCAN_BLOCK):
+                block = np.asarray(matrix[start:min(start + _SCAN_BLOCK, size)], dtype=np.float32)
+                scores[start:start + len(block)] = block @ query
+            scores[~alive[:size]] = -np.inf
+        return self._top(rows, scores, limit, document_id)
+
+    def search_batch(self, requests: Sequence[SearchRequest]) -> List[List[ScoredPoint]]:
+        """Unfiltered exact searches share each pass over the matrix (one
+        matrix-matrix product per block); the rest go through `search`."""
+        self.ensure()
+        with self._lock:
+            matrix, alive, size, index = self._matrix, self._alive, self._size, self._hnsw
+            live = len(self._rows)
+        results: List[Optional[List[ScoredPoint]]] = [None] * len(requests)
+        shared = [
+            i for i, (_, limit, document_id, _) in enumerate(requests)
+            if not document_id and limit > 0
+        ]
+        if index is None and live and len(shared) > 1:
+            rows = np.arange(size)
+            group = max(1, _BATCH_SCORES // size)
+            for g in range(0, len(shared), group):
+                members = shared[g:g + group]
+                queries = _unit(np.asarray([requests[i][0] for i in members], dtype=np.float32))
+                scores = np.empty((len(members), size), dtype=np.float32)
+                for start in range(0, size, _SCAN_BLOCK):
+                    block = np.asarray(matrix[start:min(start + _SCAN_BLOCK, size)], dtype=np.float32)
+                    scores[:, start:start + len(block)] = queries @ block.T
+                scores[:, ~alive[:size]] = -np.inf
+                for i, row_scores in zip(members, scores):
+                    results[i] = self._top(rows, row_scores, requests[i][1])
+        return [
+            result if result is not None else self.search(*request)
+            for result, request in zip(results, requests)
+        ]
+
+    def _top(
+        self, rows: np.ndarray, scores: np.ndarray, limit: int, document_id: Optional[str] = None
+    ) -> List[ScoredPoint]:
+        k = min(limit, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        top = top[np.isfinite(scores[top])]
+        return self._scored(rows[top], scores[top], document_id)
+
+    def _scored(
+        self, rows: Iterable[int], scores: Iterable[float], document_id: Optional[str] = None
+    ) -> List[ScoredPoint]:
+        """Points of the scanned ``rows``; a row freed and reused since the scan
+        may now belong to another document, so the filter is checked again."""
+        rows = [int(r) for r in rows]
+        with self._lock:
+            placeholders = ",".join("?" * len(rows))
+            found = {
+                row: (point_id, payload)
+                for row, point_id, row_document_id, payload in self._conn.execute(
+                    "SELECT row, id, document_id, payload FROM points "
+                    f"WHERE row IN ({placeholders})",
+                    rows,
+                )
+                if not document_id or row_document_id == document_id
+            }
+        return [
+            ScoredPoint(
+                id=found[row][0], version=0, score=float(score), payload=json.loads(found[row][1])
+            )
+            for row, score in zip(rows, scores)
+            if row in found  # deleted (or moved to another document) since the scan
+        ]
+
+    def document_ids(self, document_id: str) -> Set[PointId]:
+        self.ensure()
+        with self._lock:
+            return {self._ids[r] for r in self._doc_rows.get(document_id, ())}
+
+    def delete_points(self, document_id: str, ids: Iterable[PointId]) -> None:
+        self.ensure()
+        with self._lock:
+            rows = [
+                row
+                for row in (self._rows.get(str(i)) for i in ids)
+                if row is not None and self._docs[row] == document_id
+            ]
+            if rows:
+                self._release(rows)
+
+    def delete_document(self, document_id: str) -> None:
+        self.ensure()
+        with self._lock:
+            rows = list(self._doc_rows.get(document_id, ()))
+            if rows:
+                self._release(rows)
+
+    def rename_document(self, document_id: str, document_name: str) -> None:
+        self.ensure()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE points SET payload = json_set(payload, '$.document_name', ?) "
+                "WHERE document_id = ? AND json_extract(payload, '$.document_name') IS NOT ?",
+                (document_name, document_id, document_name),
+            )
+            self._conn.commit()
+
+    def count(self) -> int:
+        self.ensure()
+        with self._lock:
+            return len(self._rows)
@@ -0,0 +1,54 @@
+"""Apply the configured Qdrant storage profile to an existing collection.
+
+New collections are created with the profile already; collections created
+earlier keep their settings until this command is run.  Qdrant re-indexes /
+re-quantizes in the background, so search keeps working during migration.
+
+    python -m storage.migrate            # show current vs. target, then apply
+    python -m storage.migrate --dry-run  # only show
+"""
+from __future__ import annotations
+
+import argparse
+import json
+from typing import Any, Dict
+
+from storage.qdrant_client import COL, apply_storage_profile, get_client, storage_profile
+
+
+def collection_settings() -> Dict[str, Any]:
+    """The collection's current storage-related settings."""
+    info = get_client().get_collection(COL)
+    params = info.config.params
+    vectors = params.vectors
+    quantization = info.config.quantization_config
+    return {
+        "points": info.points_count,
+        "status": str(info.status),
+        "on_disk_vectors": getattr(vectors, "on_disk", None),
+        "on_disk_payload": params.on_disk_payload,
+        "quantization": type(quantization).__name__ if quantization else "none",
+        "hnsw_m": info.config.hnsw_config.m,
+        "hnsw_ef_construct": info.config.hnsw_config.ef_construct,
+        "sparse_vectors": sorted(params.sparse_vectors or {}),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="report without changing anything")
+    args = parser.parse_args()
+
+    report: Dict[str, Any] = {
+        "collection": COL,
+        "current": collection_settings(),
+        "target": storage_profile(),
+    }
+    if not args.dry_run:
+        apply_storage_profile()
+        report["after"] = collection_settings()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
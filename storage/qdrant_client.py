@@ -1,79 +1,532 @@
+import asyncio
+import functools
 import itertools
-from typing import List, Optional
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Union
 
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import VectorParams, Distance, PointStruct, Filter, FieldCondition, MatchValue
+import numpy as np
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.http.models import (
+    VectorParams, Distance, PointStruct, Filter, FieldCondition, MatchValue, ScoredPoint,
+    SparseVectorParams, Modifier, Prefetch, FusionQuery, Fusion, HasIdCondition,
+    HnswConfigDiff, ScalarQuantization, ScalarQuantizationConfig, ScalarType,
+    BinaryQuantization, BinaryQuantizationConfig, Disabled, SearchParams,
+    QuantizationSearchParams, VectorParamsDiff, CollectionParamsDiff, QueryRequest,
+)
 
+import sparse_encoder
 from models import db_settings
+from storage.vector_store import VECTOR_SIZE, PointId, SearchRequest, VectorStore
 
-# ──────────────── Init client & collection ────────────────
-client = QdrantClient(
-    url=db_settings.QDRANT_URL,
-    api_key=db_settings.QDRANT_API_KEY,
-    prefer_grpc=False,
-)
+logger = logging.getLogger(__name__)
 
-VECTOR_SIZE = 384  # BGE‑small‑en v1.5
+SPARSE_VECTOR = "bm25"
+COL = db_settings.COLLECTION_NAME
 
-client = QdrantClient(
-    url=db_settings.QDRANT_URL,
-    api_key=db_settings.QDRANT_API_KEY,
-    prefer_grpc=False,
-)
+# ──────────────── Lazy clients & collection ────────────────
+# Nothing touches the network at import time: clients are built on first use
+# and the collection is checked / created once, on the first operation.
+_client: Optional[QdrantClient] = None
+_async_client: Optional[AsyncQdrantClient] = None
+_collection_ready = False
+_hybrid_ready = False
+_upload_pool: Optional[ThreadPoolExecutor] = None
+_init_lock = threading.Lock()
+# The in-process store (``:memory:``) is not thread-safe; every call on the
+# local client goes through this one lock.  Re-entrant, since a client
+# method may call another.
+_local_lock = threading.RLock()
+
+
+def is_local() -> bool:
+    """``QDRANT_URL=:memory:`` runs Qdrant in-process (offline benchmarks, tests)."""
+    return db_settings.QDRANT_URL == ":memory:"
+
+
+def _client_kwargs() -> Dict[str, Any]:
+    if is_local():
+        return {"location": ":memory:"}
+    return {
+        "url": db_settings.QDRANT_URL,
+        "api_key": db_settings.QDRANT_API_KEY,
+        "prefer_grpc": db_settings.QDRANT_PREFER_GRPC,
+        "grpc_port": db_settings.QDRANT_GRPC_PORT,
+    }
+
+
+class _LockedClient:
+    """`QdrantClient` wrapper whose methods all run under `_local_lock`."""
+
+    def __init__(self, client: QdrantClient):
+        self._client = client
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def locked(*args: Any, **kwargs: Any) -> Any:
+            with _local_lock:
+                return attr(*args, **kwargs)
+
+        return locked
+
+
+def get_client() -> QdrantClient:
+    """Sync client; for the in-process store, one that serialises every call."""
+    global _client
+    if _client is None:
+        with _init_lock:
+            if _client is None:
+                client = QdrantClient(**_client_kwargs())
+                _client = _LockedClient(client) if is_local() else client
+    return _client
+
+
+def get_async_client() -> AsyncQdrantClient:
+    """Async twin for the query path; it opens connections on first request."""
+    global _async_client
+    if _async_client is None:
+        with _init_lock:
+            if _async_client is None:
+                _async_client = AsyncQdrantClient(**_client_kwargs())
+    return _async_client
+
+
+# ──────────────── Storage profile ────────────────
+# On-disk storage, quantization and HNSW parameters come from settings; they
+# are applied when the collection is created and, for existing collections,
+# by `python -m storage.migrate`.
+
+def _quantization_config():
+    kind = db_settings.QDRANT_QUANTIZATION
+    always_ram = db_settings.QDRANT_QUANTIZATION_ALWAYS_RAM
+    if kind == "scalar":
+        return ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=always_ram)
+        )
+    if kind == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=always_ram))
+    if kind == "none":
+        return None
+    raise ValueError(f"Unknown quantization: {kind}")
+
+
+def _hnsw_config() -> HnswConfigDiff:
+    return HnswConfigDiff(m=db_settings.QDRANT_HNSW_M, ef_construct=db_settings.QDRANT_HNSW_EF_CONSTRUCT)
 
-VECTOR_SIZE = 384
-COL = db_settings.COLLECTION_NAME
 
-if COL not in [c.name for c in client.get_collections().collections]:
-    # 1) create collection
-    client.create_collection(
+def storage_profile() -> Dict[str, Any]:
+    """Current profile, as reported by the migration command."""
+    return {
+        "prefer_grpc": db_settings.QDRANT_PREFER_GRPC,
+        "on_disk_vectors": db_settings.QDRANT_ON_DISK_VECTORS,
+        "on_disk_payload": db_settings.QDRANT_ON_DISK_PAYLOAD,
+        "quantization": db_settings.QDRANT_QUANTIZATION,
+        "rescore": db_settings.QDRANT_RESCORE,
+        "oversampling": db_settings.QDRANT_OVERSAMPLING,
+        "hnsw_m": db_settings.QDRANT_HNSW_M,
+        "hnsw_ef_construct": db_settings.QDRANT_HNSW_EF_CONSTRUCT,
+        "hnsw_ef": db_settings.QDRANT_HNSW_EF,
+        "upload_parallel": db_settings.QDRANT_UPLOAD_PARALLEL,
+        "upsert_wait": db_settings.QDRANT_UPSERT_WAIT,
+    }
+
+
+def apply_storage_profile() -> None:
+    """Bring an existing collection in line with the configured profile.
+
+    Qdrant rebuilds indexes / quantized vectors in the background; the
+    sparse vector of hybrid search cannot be added this way.
+    """
+    ensure_collection()
+    get_client().update_collection(
         collection_name=COL,
-        vectors_config=VectorParams(size=VECTOR_SIZE, distance=Distance.COSINE),
+        vectors_config={"": VectorParamsDiff(on_disk=db_settings.QDRANT_ON_DISK_VECTORS)},
+        collection_params=CollectionParamsDiff(on_disk_payload=db_settings.QDRANT_ON_DISK_PAYLOAD),
+        hnsw_config=_hnsw_config(),
+        quantization_config=_quantization_config() or Disabled.DISABLED,
     )
-    # 2) add payload indexes we care about
-    client.create_payload_index(COL, field_name="document_id", field_schema="keyword")
-    client.create_payload_index(COL, field_name="page", field_schema="integer")
-    client.create_payload_index(COL, field_name="is_ocr", field_schema="boolean")
+
+
+@functools.lru_cache(maxsize=None)
+def search_params() -> Optional[SearchParams]:
+    """Search-time ``ef`` and quantization rescoring for the dense branch."""
+    quantization = None
+    if db_settings.QDRANT_QUANTIZATION != "none":
+        quantization = QuantizationSearchParams(
+            rescore=db_settings.QDRANT_RESCORE,
+            oversampling=db_settings.QDRANT_OVERSAMPLING,
+        )
+    hnsw_ef = db_settings.QDRANT_HNSW_EF or None  # 0 → server default
+    if quantization is None and hnsw_ef is None:
+        return None
+    return SearchParams(hnsw_ef=hnsw_ef, quantization=quantization)
+
+
+def ensure_collection() -> None:
+    """Create the collection + payload indexes if missing (once per process).
+
+    New collections get an unnamed dense vector plus a ``bm25`` sparse vector
+    (IDF applied by Qdrant).  Existing collections without the sparse vector
+    keep working dense-only until they are re-created.
+    """
+    global _collection_ready, _hybrid_ready
+    if _collection_ready:
+        return
+    client = get_client()
+    with _init_lock:
+        if _collection_ready:
+            return
+        if COL not in [c.name for c in client.get_collections().collections]:
+            # 1) create collection
+            client.create_collection(
+                collection_name=COL,
+                vectors_config=VectorParams(
+                    size=VECTOR_SIZE,
+                    distance=Distance.COSINE,
+                    on_disk=db_settings.QDRANT_ON_DISK_VECTORS,
+                ),
+                sparse_vectors_config={
+                    SPARSE_VECTOR: SparseVectorParams(modifier=Modifier.IDF)
+                },
+                on_disk_payload=db_settings.QDRANT_ON_DISK_PAYLOAD,
+                hnsw_config=_hnsw_config(),
+                quantization_config=_quantization_config(),
+            )
+            # 2) add payload indexes we care about
+            client.create_payload_index(COL, field_name="document_id", field_schema="keyword")
+            client.create_payload_index(COL, field_name="page", field_schema="integer")
+            client.create_payload_index(COL, field_name="is_ocr", field_schema="boolean")
+        sparse = client.get_collection(COL).config.params.sparse_vectors or {}
+        _hybrid_ready = SPARSE_VECTOR in sparse
+        if db_settings.HYBRID_SEARCH and not _hybrid_ready:
+            logger.warning(
+                "Collection '%s' has no '%s' sparse vector; using dense-only search "
+                "(re-create the collection to enable hybrid retrieval)", COL, SPARSE_VECTOR,
+            )
+        _collection_ready = True
+
+
+def hybrid_enabled() -> bool:
+    """Hybrid search is requested and the collection supports it."""
+    ensure_collection()
+    return db_settings.HYBRID_SEARCH and _hybrid_ready
+
+
+def ping() -> None:
+    """Cheap round trip used by the readiness probe; raises when unreachable."""
+    get_client().get_collections()
 
 
 # ──────────────── Helper APIs ────────────────
-def upsert_points(points: List[PointStruct], batch: int = 1000) -> None:
+def point_vector(dense: List[float], text: str) -> Any:
+    """Vector struct for a point: dense only, or dense + BM25 sparse."""
+    if not hybrid_enabled():
+        return dense
+    return {"": dense, SPARSE_VECTOR: sparse_encoder.encode_document(text)}
+
+
+def _get_upload_pool() -> ThreadPoolExecutor:
+    global _upload_pool
+    if _upload_pool is None:
+        with _init_lock:
+            if _upload_pool is None:
+                _upload_pool = ThreadPoolExecutor(
+                    max_workers=max(1, db_settings.QDRANT_UPLOAD_PARALLEL),
+                    thread_name_prefix="qdrant-upload",
+                )
+    return _upload_pool
+
+
+def upsert_points(
+    points: List[PointStruct], batch: int = 1000, wait: Optional[bool] = None
+) -> None:
     """
     Upsert in batches to avoid request-size limits.
+
+    Batches are sent concurrently (``QDRANT_UPLOAD_PARALLEL`` at a time,
+    shared process-wide; one by one to an in-process Qdrant).  With ``QDRANT_UPSERT_WAIT=false`` each request
+    returns once Qdrant has accepted it, before it is indexed, so points
+    become searchable shortly after this returns.  ``wait`` overrides the
+    setting; Qdrant applies updates in order, so a waited upsert also
+    covers every upsert accepted before it.
+    """
+    ensure_collection()
+    client = get_client()
+    wait = db_settings.QDRANT_UPSERT_WAIT if wait is None else wait
+
+    def _send(chunk: List[PointStruct]) -> None:
+        client.upsert(collection_name=db_settings.COLLECTION_NAME, points=chunk, wait=wait)
+
+    chunks = list(_grouper(points, batch))
+    if len(chunks) == 1 or is_local():
+        # the in-process store takes one call at a time anyway
+        for chunk in chunks:
+            _send(chunk)
+        return
+    for fut in [_get_upload_pool().submit(_send, c) for c in chunks]:
+        fut.result()
+
+
+@functools.lru_cache(maxsize=db_settings.FILTER_CACHE_SIZE)
+def document_filter(document_id: Optional[str]) -> Optional[Filter]:
+    """Compiled `document_id` filter, built once per ID and shared read-only."""
+    if not document_id:
+        return None
+    return Filter(
+        must=[FieldCondition(key="document_id", match=MatchValue(value=document_id))]
+    )
+
+
+def _query_args(
+    query_vector: List[float],
+    limit: int,
+    document_id: Optional[str],
+    query_text: Optional[str],
+) -> Dict[str, Any]:
+    """`query_points` kwargs: plain dense search, or dense + BM25 fused with RRF.
+
+    The hybrid form is a single request: both branches run as prefetches
+    inside Qdrant and only the fused top ``limit`` comes back.  When the
+    reranker may skip on score separation, the dense vectors of those points
+    come back too, for `_with_dense_scores`.
     """
-    for chunk in _grouper(points, batch):
-        client.upsert(collection_name=db_settings.COLLECTION_NAME, points=chunk)
+    query_filter = document_filter(document_id)
+    args: Dict[str, Any] = {
+        "collection_name": db_settings.COLLECTION_NAME,
+        "limit": limit,
+        "with_payload": True,
+    }
+    if not (query_text and db_settings.HYBRID_SEARCH and _hybrid_ready):
+        args.update(query=query_vector, query_filter=query_filter, search_params=search_params())
+        return args
+
+    branch = limit * max(1, db_settings.HYBRID_PREFETCH_FACTOR)
+    args.update(
+        prefetch=[
+            Prefetch(
+                query=query_vector, limit=branch, filter=query_filter, params=search_params()
+            ),
+            Prefetch(
+                query=sparse_encoder.encode_query(query_text),
+                using=SPARSE_VECTOR,
+                limit=branch,
+                filter=query_filter,
+            ),
+        ],
+        query=FusionQuery(fusion=Fusion.RRF),
+    )
+    if db_settings.RERANK_SKIP_MARGIN > 0:
+        args["with_vectors"] = [""]  # the unnamed dense vector only
+    return args
+
+
+def _with_dense_scores(
+    prefetch: Optional[List[Prefetch]], points: List[ScoredPoint]
+) -> List[ScoredPoint]:
+    """Attach each hybrid hit's dense (cosine) score as payload ``_dense_score``.
+
+    Fused RRF scores only encode ranks, so they say nothing about how far
+    apart the hits are.  ``None`` when the dense vector was not requested.
+    """
+    if not prefetch:
+        return points
+    query = np.asarray(prefetch[0].query, dtype=np.float32)
+    query /= np.linalg.norm(query) or 1.0
+    for point in points:
+        vector = point.vector.get("") if isinstance(point.vector, dict) else point.vector
+        # cosine collections store normalised vectors
+        score = float(np.dot(query, vector)) if vector is not None else None
+        point.payload = {**(point.payload or {}), "_dense_score": score}
+        point.vector = None
+    return points
 
 
 def search_points(
     query_vector: List[float],
     limit: int = 3,
     document_id: Optional[str] = None,
-):
-    payload_filter = None
-    if document_id:
-        payload_filter = Filter(
-            must=[FieldCondition(key="document_id", match=MatchValue(value=document_id))]
+    query_text: Optional[str] = None,
+) -> List[ScoredPoint]:
+    """Top ``limit`` points; hybrid (dense + BM25) when ``query_text`` is given."""
+    ensure_collection()
+    args = _query_args(query_vector, limit, document_id, query_text)
+    return _with_dense_scores(args.get("prefetch"), get_client().query_points(**args).points)
+
+
+async def asearch_points(
+    query_vector: List[float],
+    limit: int = 3,
+    document_id: Optional[str] = None,
+    query_text: Optional[str] = None,
+) -> List[ScoredPoint]:
+    """Async variant of `search_points`; does not block the event loop."""
+    if is_local():
+        # the in-process store belongs to the sync client; an async local
+        # client would be a second, empty one
+        return await asyncio.to_thread(
+            search_points, query_vector, limit, document_id, query_text
         )
+    if not _collection_ready:
+        await asyncio.to_thread(ensure_collection)
+    args = _query_args(query_vector, limit, document_id, query_text)
+    response = await get_async_client().query_points(**args)
+    return _with_dense_scores(args.get("prefetch"), response.points)
 
-    return client.search(
-        collection_name=db_settings.COLLECTION_NAME,
-        query_vector=query_vector,
-        limit=limit,
-        query_filter=payload_filter,
+
+def _batch_request(request: SearchRequest) -> QueryRequest:
+    """One `search_points` call as an entry of a `query_batch_points` request."""
+    args = _query_args(*request)
+    return QueryRequest(
+        query=args["query"],
+        prefetch=args.get("prefetch"),
+        filter=args.get("query_filter"),
+        params=args.get("search_params"),
+        limit=args["limit"],
         with_payload=True,
+        with_vector=args.get("with_vectors"),
+    )
+
+
+def search_points_batch(requests: Sequence[SearchRequest]) -> List[List[ScoredPoint]]:
+    """`search_points` for every request, in one round trip."""
+    if not requests:
+        return []
+    ensure_collection()
+    batch = [_batch_request(r) for r in requests]
+    responses = get_client().query_batch_points(db_settings.COLLECTION_NAME, requests=batch)
+    return [_with_dense_scores(b.prefetch, r.points) for b, r in zip(batch, responses)]
+
+
+async def asearch_points_batch(requests: Sequence[SearchRequest]) -> List[List[ScoredPoint]]:
+    """Async variant of `search_points_batch`."""
+    if not requests:
+        return []
+    if is_local():
+        return await asyncio.to_thread(search_points_batch, requests)
+    if not _collection_ready:
+        await asyncio.to_thread(ensure_collection)
+    batch = [_batch_request(r) for r in requests]
+    responses = await get_async_client().query_batch_points(
+        db_settings.COLLECTION_NAME, requests=batch
     )
+    return [_with_dense_scores(b.prefetch, r.points) for b, r in zip(batch, responses)]
 
 
 def delete_by_document(document_id: str) -> None:
-    client.delete(
+    ensure_collection()
+    get_client().delete(
+        collection_name=db_settings.COLLECTION_NAME,
+        points_selector=document_filter(document_id),
+        wait=True,
+    )
+
+
+def rename_document_points(document_id: str, document_name: str) -> None:
+    """Set ``document_name`` on the points of ``document_id`` that carry another one."""
+    ensure_collection()
+    get_client().set_payload(
         collection_name=db_settings.COLLECTION_NAME,
-        points_selector=Filter(
-            must=[FieldCondition(key="document_id", match=MatchValue(value=document_id))]
+        payload={"document_name": document_name},
+        points=Filter(
+            must=[FieldCondition(key="document_id", match=MatchValue(value=document_id))],
+            must_not=[FieldCondition(key="document_name", match=MatchValue(value=document_name))],
         ),
     )
 
 
+def document_point_ids(document_id: str) -> Set[Union[int, str]]:
+    """IDs of every point stored for ``document_id`` (no payloads / vectors)."""
+    ensure_collection()
+    client = get_client()
+    ids: Set[Union[int, str]] = set()
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=db_settings.COLLECTION_NAME,
+            scroll_filter=document_filter(document_id),
+            limit=1000,
+            offset=offset,
+            with_payload=False,
+            with_vectors=False,
+        )
+        ids.update(p.id for p in points)
+        if offset is None:
+            return ids
+
+
+def delete_document_points(
+    document_id: str, ids: Iterable[Union[int, str]], batch: int = 1000
+) -> None:
+    """Delete the given points, scoped to ``document_id`` like `delete_by_document`."""
+    ensure_collection()
+    client = get_client()
+    for chunk in _grouper(ids, batch):
+        client.delete(
+            collection_name=db_settings.COLLECTION_NAME,
+            points_selector=Filter(
+                must=[
+                    FieldCondition(key="document_id", match=MatchValue(value=document_id)),
+                    HasIdCondition(has_id=chunk),
+                ]
+            ),
+            wait=True,  # the ingest reports success after this
+        )
+
+
+# ──────────────── VectorStore backend ────────────────
+class QdrantStore(VectorStore):
+    """``VECTOR_BACKEND=qdrant``: the module functions above, as a `VectorStore`."""
+
+    @property
+    def hybrid(self) -> bool:
+        return hybrid_enabled()
+
+    def ensure(self) -> None:
+        ensure_collection()
+
+    def ping(self) -> None:
+        ping()
+
+    def point_vector(self, dense: List[float], text: str) -> Any:
+        return point_vector(dense, text)
+
+    def upsert(self, points: List[PointStruct], wait: Optional[bool] = None) -> None:
+        upsert_points(points, wait=wait)
+
+    def search(self, query_vector, limit=3, document_id=None, query_text=None):
+        return search_points(query_vector, limit, document_id, query_text)
+
+    async def asearch(self, query_vector, limit=3, document_id=None, query_text=None):
+        return await asearch_points(query_vector, limit, document_id, query_text)
+
+    def search_batch(self, requests):
+        return search_points_batch(requests)
+
+    async def asearch_batch(self, requests):
+        return await asearch_points_batch(requests)
+
+    def document_ids(self, document_id: str) -> Set[PointId]:
+        return document_point_ids(document_id)
+
+    def delete_points(self, document_id: str, ids: Iterable[PointId]) -> None:
+        delete_document_points(document_id, ids)
+
+    def delete_document(self, document_id: str) -> None:
+        delete_by_document(document_id)
+
+    def rename_document(self, document_id: str, document_name: str) -> None:
+        rename_document_points(document_id, document_name)
+
+    def count(self) -> int:
+        ensure_collection()
+        return get_client().count(db_settings.COLLECTION_NAME, exact=True).count
+
+
 # ──────────────── Utils ────────────────
 def _grouper(iterable, n):
     """Yield chunks of size n."""
@@ -0,0 +1,138 @@
+"""Vector store interface — the storage the ingest and query paths talk to.
+
+Backends (``VECTOR_BACKEND``):
+
+* ``qdrant`` — a Qdrant server (or ``QDRANT_URL=:memory:``), with hybrid
+  dense + BM25 retrieval; see `storage.qdrant_client`.
+* ``local``  — an embedded index in ``LOCAL_INDEX_PATH``: a memory-mapped
+  float32 / float16 matrix plus a SQLite payload sidecar, exact search with
+  optional HNSW; no service to run.  Dense-only.  See `storage.local_index`.
+
+Points go in as qdrant-client ``PointStruct`` and come back as
+``ScoredPoint`` for every backend, so callers do not depend on which one
+is configured.  `benchmarks.vector_store` checks that they behave alike.
+"""
+from __future__ import annotations
+
+import abc
+import asyncio
+import threading
+from typing import Any, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+from qdrant_client.http.models import PointStruct, ScoredPoint
+
+from models import db_settings
+
+VECTOR_SIZE = 384  # BGE‑small‑en v1.5
+
+PointId = Union[int, str]
+
+# (query_vector, limit, document_id, query_text): the arguments of `search`
+SearchRequest = Tuple[List[float], int, Optional[str], Optional[str]]
+
+
+class VectorStore(abc.ABC):
+    """Points carry a ``document_id`` payload field; every filter is on it."""
+
+    #: query_text is used for hybrid (dense + keyword) retrieval
+    hybrid = False
+
+    def ensure(self) -> None:
+        """Create / open the underlying storage; called before first use."""
+
+    def ping(self) -> None:
+        """Raise when the store is unreachable (readiness probe)."""
+
+    def close(self) -> None:
+        """Release the underlying storage; `ensure` opens it again."""
+
+    def point_vector(self, dense: List[float], text: str) -> Any:
+        """Vector for a ``PointStruct`` built from ``dense`` and its chunk text."""
+        return dense
+
+    @abc.abstractmethod
+    def upsert(self, points: List[PointStruct], wait: Optional[bool] = None) -> None:
+        """Store ``points``; with ``wait=True`` return only once they are searchable
+        (``None``: the backend's default)."""
+
+    @abc.abstractmethod
+    def search(
+        self,
+        query_vector: List[float],
+        limit: int = 3,
+        document_id: Optional[str] = None,
+        query_text: Optional[str] = None,
+    ) -> List[ScoredPoint]:
+        """Top ``limit`` points by cosine similarity, best first."""
+
+    async def asearch(
+        self,
+        query_vector: List[float],
+        limit: int = 3,
+        document_id: Optional[str] = None,
+        query_text: Optional[str] = None,
+    ) -> List[ScoredPoint]:
+        return await asyncio.to_thread(self.search, query_vector, limit, document_id, query_text)
+
+    def search_batch(self, requests: Sequence[SearchRequest]) -> List[List[ScoredPoint]]:
+        """`search` for several queries; backends override it to answer them in one pass."""
+        return [self.search(*request) for request in requests]
+
+    async def asearch_batch(self, requests: Sequence[SearchRequest]) -> List[List[ScoredPoint]]:
+        return await asyncio.to_thread(self.search_batch, requests)
+
+    @abc.abstractmethod
+    def document_ids(self, document_id: str) -> Set[PointId]:
+        """IDs of every point stored for ``document_id``."""
+
+    @abc.abstractmethod
+    def delete_points(self, document_id: str, ids: Iterable[PointId]) -> None:
+        """Delete ``ids``, but only those that belong to ``document_id``."""
+
+    @abc.abstractmethod
+    def delete_document(self, document_id: str) -> None:
+        """Delete every point of ``document_id``."""
+
+    @abc.abstractmethod
+    def rename_document(self, document_id: str, document_name: str) -> None:
+        """Set the ``document_name`` payload of every point of ``document_id``."""
+
+    @abc.abstractmethod
+    def count(self) -> int:
+        """Number of points stored."""
+
+
+def create_store() -> VectorStore:
+    """Backend selected by ``VECTOR_BACKEND`` (qdrant | local)."""
+    kind = db_settings.VECTOR_BACKEND
+    if kind == "qdrant":
+        from storage.qdrant_client import QdrantStore
+
+        return QdrantStore()
+    if kind == "local":
+        from storage.local_index import LocalVectorStore
+
+        return LocalVectorStore(
+            db_settings.LOCAL_INDEX_PATH,
+            dim=VECTOR_SIZE,
+            dtype=db_settings.LOCAL_INDEX_DTYPE,
+            hnsw=db_settings.LOCAL_INDEX_HNSW,
+            hnsw_min=db_settings.LOCAL_INDEX_HNSW_MIN,
+            hnsw_m=db_settings.LOCAL_INDEX_HNSW_M,
+            hnsw_ef=db_settings.LOCAL_INDEX_HNSW_EF,
+        )
+    raise ValueError(f"Unknown vector backend: {kind}")
+
+
+_store: Optional[VectorStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> VectorStore:
+    """Process-wide store, created on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_store()
+    return _store
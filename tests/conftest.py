@@ -0,0 +1,204 @@
+"""Test settings: in-process Qdrant, every on-disk store in a temp dir, no warm-up.
+
+Settings are read from the environment when `models` is first imported, so
+they are set here, before any test module imports the application.
+"""
+import os
+import tempfile
+
+_TMP = tempfile.mkdtemp(prefix="rag-chatbot-tests-")
+
+os.environ.update(
+    {
+        "QDRANT_URL": ":memory:",
+        "WARMUP_ON_STARTUP": "false",
+        "EMBED_CACHE_ENABLED": "false",
+        "EMBED_CACHE_PATH": os.path.join(_TMP, "embeddings.sqlite3"),
+        "CONVERSATION_BACKEND": "memory",
+        "CONVERSATION_DB_PATH": os.path.join(_TMP, "conversations.sqlite3"),
+        "JOBS_DB_PATH": os.path.join(_TMP, "jobs.sqlite3"),
+        "JOBS_SPOOL_DIR": os.path.join(_TMP, "uploads"),
+        "LOCAL_INDEX_PATH": os.path.join(_TMP, "vector_index"),
+        "ONNX_EXPORT_DIR": os.path.join(_TMP, "onnx"),
+        "PROFILE_DIR": os.path.join(_TMP, "profiles"),
+    }
+)
+
+import hashlib  # noqa: E402
+from typing import List  # noqa: E402
+
+import numpy as np  # noqa: E402
+import pytest  # noqa: E402
+
+from storage import vector_store  # noqa: E402
+from storage.local_index import LocalVectorStore  # noqa: E402
+from storage.vector_store import VECTOR_SIZE  # noqa: E402
+
+
+def fake_embedding(text: str) -> List[float]:
+    """Deterministic unit vector for ``text``, standing in for the model."""
+    seed = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+    vector = np.random.default_rng(seed).standard_normal(VECTOR_SIZE)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+@pytest.fixture
+def fake_embed(monkeypatch):
+    """Replace the embedding model with `fake_embedding`; returns the call log."""
+    calls: List[List[str]] = []
+
+    def embed_text(text, priority=False):
+        texts = [text] if isinstance(text, str) else list(text)
+        calls.append(texts)
+        vectors = [fake_embedding(t) for t in texts]
+        return vectors[0] if isinstance(text, str) else vectors
+
+    import embedder
+    from services import ingest_service
+
+    monkeypatch.setattr(embedder, "embed_text", embed_text)
+    monkeypatch.setattr(ingest_service, "embed_text", embed_text)
+    return calls
+
+
+@pytest.fixture
+def local_store(tmp_path, monkeypatch):
+    """A fresh exact-search `LocalVectorStore` installed as the process store."""
+    store = LocalVectorStore(str(tmp_path / "index"), VECTOR_SIZE, hnsw=False)
+    store.ensure()
+    monkeypatch.setattr(vector_store, "_store", store)
+    yield store
+    store.close()
+
+
+def _write_pdf(path, pages: List[str]) -> str:
+    """Minimal PDF with one line of Helvetica text per page."""
+    objects: List[bytes] = [b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    contents = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        contents.append(len(objects))
+    pages_id = len(objects) + len(pages) + 1
+    kids = []
+    for content in contents:
+        objects.append(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 1 0 R >> >> >>" % (pages_id, content)
+        )
+        kids.append(len(objects))
+    refs = b" ".join(b"%d 0 R" % k for k in kids)
+    objects.append(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (refs, len(kids)))
+    objects.append(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, len(objects), xref,
+    )
+    with open(path, "wb") as f:
+        f.write(out)
+    return str(path)
+
+
+@pytest.fixture
+def make_pdf(tmp_path):
+    """``make_pdf(name, pages)`` writes a text-layer PDF and returns its path."""
+    return lambda name, pages: _write_pdf(tmp_path / name, pages)
+
+
+class FakeCrossEncoder:
+    """Scores a (query, passage) pair by the words they share; counts calls."""
+
+    def __init__(self):
+        self.calls: List[int] = []
+
+    def predict(self, pairs, **kwargs):
+        self.calls.append(len(pairs))
+        return np.array(
+            [len(set(q.lower().split()) & set(p.lower().split())) for q, p in pairs],
+            dtype=np.float32,
+        )
+
+
+@pytest.fixture
+def fake_reranker(monkeypatch):
+    from services import reranker
+
+    model = FakeCrossEncoder()
+    monkeypatch.setattr(reranker, "get_cross_encoder", lambda name, backend=None: model)
+    return model
+
+
+class _Message:
+    def __init__(self, content: str):
+        self.content = content
+        self.usage_metadata = {"input_tokens": 10, "output_tokens": 2, "total_tokens": 12}
+
+
+class FakeLLM:
+    """Chat model stand-in: answers with a fixed text and records every prompt."""
+
+    def __init__(self, answer: str = "The answer.", delay: float = 0.0):
+        self.answer = answer
+        self.delay = delay
+        self.prompts: List[str] = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        return _Message(self.answer)
+
+    async def ainvoke(self, prompt):
+        import asyncio
+
+        self.prompts.append(prompt)
+        await asyncio.sleep(self.delay)
+        return _Message(self.answer)
+
+    async def astream(self, prompt):
+        self.prompts.append(prompt)
+        for word in self.answer.split(" "):
+            yield _Message(word + " ")
+
+
+@pytest.fixture
+def index_chunks(local_store):
+    """``index_chunks(document_id, texts, document_name=...)`` stores one point per text."""
+    import uuid
+
+    from qdrant_client.http.models import PointStruct
+
+    def index(document_id: str, texts: List[str], document_name: str = "doc.pdf") -> None:
+        local_store.upsert([
+            PointStruct(
+                id=str(uuid.uuid5(uuid.NAMESPACE_OID, f"{document_id}:{i}:{text}")),
+                vector=fake_embedding(text),
+                payload={
+                    "document_id": document_id,
+                    "document_name": document_name,
+                    "page": i + 1,
+                    "chunk_index": i,
+                    "sub_chunk_index": 0,
+                    "page_content": text,
+                },
+            )
+            for i, text in enumerate(texts)
+        ])
+
+    return index
+
+
+@pytest.fixture
+def chatbot(local_store, fake_embed, fake_reranker, monkeypatch):
+    """`ChatbotManager` over the temporary local store with fake models."""
+    from services.rag_assistant import ChatbotManager
+
+    manager = ChatbotManager()
+    manager.llm = FakeLLM()
+    return manager
@@ -0,0 +1,128 @@
+import os
+import time
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from models import db_settings
+from services.answer_cache import SemanticAnswerCache
+
+CITES = [{"document_name": "a.pdf", "page": 1}]
+
+
+def _near(vector, noise):
+    rng = np.random.default_rng(0)
+    return (np.asarray(vector) + noise * rng.standard_normal(len(vector))).tolist()
+
+
+def test_near_duplicate_question_hits(monkeypatch):
+    cache = SemanticAnswerCache(threshold=0.95, ttl_seconds=60, max_entries=10)
+    vector = np.ones(8).tolist()
+    cache.store("doc", 3, vector, "answer", CITES, compute_seconds=1.5)
+    assert cache.lookup("doc", 3, _near(vector, 0.01)) == ("answer", CITES)
+    assert cache.lookup("doc", 3, _near(vector, 5.0)) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["latency_saved_seconds"]) == (1, 1, 1.5)
+
+
+def test_scope_is_document_and_top_k():
+    cache = SemanticAnswerCache(threshold=0.9, ttl_seconds=60, max_entries=10)
+    vector = [1.0, 0.0]
+    cache.store("doc", 3, vector, "answer", CITES, 0.1)
+    assert cache.lookup("other", 3, vector) is None
+    assert cache.lookup("doc", 5, vector) is None
+    assert cache.lookup(None, 3, vector) is None
+
+
+def test_entries_expire():
+    cache = SemanticAnswerCache(threshold=0.9, ttl_seconds=0.05, max_entries=10)
+    cache.store("doc", 3, [1.0, 0.0], "answer", CITES, 0.1)
+    time.sleep(0.1)
+    assert cache.lookup("doc", 3, [1.0, 0.0]) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticAnswerCache(threshold=0.99, ttl_seconds=60, max_entries=2)
+    cache.store("doc", 3, [1.0, 0.0], "x", CITES, 0.1)
+    cache.store("doc", 3, [0.0, 1.0], "y", CITES, 0.1)
+    cache.lookup("doc", 3, [1.0, 0.0])  # x is now the most recent
+    cache.store("doc", 3, [1.0, 1.0], "z", CITES, 0.1)
+    assert cache.lookup("doc", 3, [0.0, 1.0]) is None
+    assert cache.lookup("doc", 3, [1.0, 0.0])[0] == "x"
+
+
+def test_invalidation_drops_the_document_and_unscoped_answers():
+    cache = SemanticAnswerCache(threshold=0.9, ttl_seconds=60, max_entries=10)
+    for scope in ("a", "b", None):
+        cache.store(scope, 3, [1.0, 0.0], f"answer {scope}", CITES, 0.1)
+    cache.invalidate("a")
+    assert cache.lookup("a", 3, [1.0, 0.0]) is None
+    assert cache.lookup(None, 3, [1.0, 0.0]) is None
+    assert cache.lookup("b", 3, [1.0, 0.0]) == ("answer b", CITES)
+
+
+def test_answers_computed_before_an_invalidation_are_not_stored():
+    cache = SemanticAnswerCache(threshold=0.95, ttl_seconds=60, max_entries=10)
+    vector = np.ones(8).tolist()
+    doc, other, unscoped = cache.generation("doc"), cache.generation("other"), cache.generation(None)
+    cache.invalidate("doc")  # a re-ingest finished while the answers were computed
+    cache.store("doc", 3, vector, "stale", CITES, 1.0, generation=doc)
+    cache.store(None, 3, vector, "stale", CITES, 1.0, generation=unscoped)
+    cache.store("other", 3, vector, "fresh", CITES, 1.0, generation=other)
+    assert cache.lookup("doc", 3, vector) is None
+    assert cache.lookup(None, 3, vector) is None
+    assert cache.lookup("other", 3, vector) == ("fresh", CITES)
+    assert cache.stats()["stale_skipped"] == 2
+
+    cache.store("doc", 3, vector, "answer", CITES, 1.0, generation=cache.generation("doc"))
+    assert cache.lookup("doc", 3, vector) == ("answer", CITES)
+
+
+def test_manager_does_not_cache_an_answer_overtaken_by_a_reingest(chatbot, index_chunks):
+    if chatbot.answer_cache is None:
+        pytest.skip("answer cache disabled")
+    index_chunks("doc-1", ["Invoices are due within thirty days."])
+    invoke = chatbot.llm.invoke
+
+    def reingested_meanwhile(prompt):
+        chatbot.invalidate_document("doc-1")  # e.g. the job's on_finished hook
+        return invoke(prompt)
+
+    chatbot.llm.invoke = reingested_meanwhile
+    chatbot.get_response("When are invoices due?", top_k=1, document_id="doc-1")
+    chatbot.llm.invoke = invoke
+    chatbot.get_response("When are invoices due?", top_k=1, document_id="doc-1")
+    assert len(chatbot.llm.prompts) == 2  # the first answer was not cached
+    chatbot.get_response("When are invoices due?", top_k=1, document_id="doc-1")
+    assert len(chatbot.llm.prompts) == 2
+
+
+def test_manager_serves_repeated_questions_from_the_cache(chatbot, index_chunks):
+    index_chunks("doc-1", ["Refunds are issued to the original payment method."])
+    first = chatbot.get_response("How are refunds issued?", document_id="doc-1")
+    assert chatbot.get_response("How are refunds issued?", document_id="doc-1") == first
+    assert len(chatbot.llm.prompts) == 1
+    chatbot.invalidate_document("doc-1")
+    chatbot.get_response("How are refunds issued?", document_id="doc-1")
+    assert len(chatbot.llm.prompts) == 2
+
+
+@pytest.fixture
+def client(local_store):
+    os.makedirs(db_settings.JOBS_SPOOL_DIR, exist_ok=True)
+    return TestClient(main.app)
+
+
+def test_reupload_after_delete_is_ingested_again(client):
+    upload = {"file": ("notes.txt", b"unique content for the delete test", "text/plain")}
+    first = client.post("/api/embedding", files=upload).json()
+    assert client.post("/api/embedding", files=upload).json()["status"] == "duplicate"
+
+    assert client.delete(f"/api/documents/{first['document_id']}").json()["status"] == "deleted"
+
+    again = client.post("/api/embedding", files=upload).json()
+    assert again["status"] == "queued"
+    assert again["document_id"] != first["document_id"]
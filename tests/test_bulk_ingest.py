@@ -0,0 +1,190 @@
+import hashlib
+import io
+import zipfile
+from pathlib import Path
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from models import db_settings
+from services import bulk_ingest
+from services.bulk_ingest import content_document_id, file_sha256
+
+
+class _Pool:
+    """Executor stand-in: parses inline; ``crash`` files kill the whole pool."""
+
+    def __init__(self, crash=(), workers=2):
+        self.crash = set(crash)
+        self.workers = workers
+        self.broken = False
+        self.pending = []
+
+    def submit(self, fn, path):
+        if self.broken:
+            raise BrokenProcessPool("pool is broken")
+        fut = Future()
+        self.pending.append((fut, fn, path))
+        if len(self.pending) >= self.workers:
+            self._run()
+        return fut
+
+    def _run(self):
+        pending, self.pending = self.pending, []
+        if any(path.endswith(tuple(self.crash)) for _, _, path in pending):
+            self.broken = True  # a dead worker fails every task in flight
+            for fut, _, _ in pending:
+                fut.set_exception(BrokenProcessPool("a worker died"))
+            return
+        for fut, fn, path in pending:
+            fut.set_result(fn(path))
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self._run()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+
+@pytest.fixture
+def pools(monkeypatch):
+    created = []
+
+    def new_pool(workers, crash=("crash.txt",)):
+        pool = _Pool(crash, workers=workers)
+        created.append(pool)
+        return pool
+
+    monkeypatch.setattr(bulk_ingest, "_new_pool", new_pool)
+    monkeypatch.setattr(bulk_ingest, "_pool", None)
+    monkeypatch.setattr(db_settings, "BULK_WORKERS", 2)
+    return created
+
+
+def _tree(root, files):
+    root.mkdir(exist_ok=True)
+    for name, text in files.items():
+        (root / name).write_text(text)
+    return str(root)
+
+
+def test_a_crashing_file_fails_alone(tmp_path, pools, fake_embed, local_store):
+    root = _tree(tmp_path / "docs", {
+        "a.txt": "Alpha text.", "crash.txt": "Boom.", "c.txt": "Gamma text.", "d.txt": "Delta text.",
+    })
+    report = bulk_ingest.ingest_directory(root, by_content=True)
+
+    failed = {r.name: r.error for r in report.results if r.error}
+    assert list(failed) == ["crash.txt"]
+    assert "BrokenProcessPool" in failed["crash.txt"]
+    assert report.files_failed == 1
+    assert pools[0].broken and bulk_ingest._pool is not pools[0]  # replaced
+    stored = {r.name for r in report.results if r.chunks_stored}
+    assert stored == {"a.txt", "c.txt", "d.txt"}
+
+
+def test_content_ids_dedupe_identical_files(tmp_path, pools, fake_embed, local_store):
+    root = _tree(tmp_path / "docs", {"one.txt": "Same text.", "two.txt": "Same text.", "x.txt": "Other."})
+    report = bulk_ingest.ingest_directory(root, by_content=True)
+
+    ids = {r.name: r.document_id for r in report.results}
+    assert set(ids) == {"one.txt", "x.txt"}
+    assert ids["one.txt"] == content_document_id(file_sha256(f"{root}/two.txt"))
+    assert local_store.count() == 2
+
+    again = bulk_ingest.ingest_directory(root, by_content=True)  # e.g. a re-run after a restart
+    assert sum(r.chunks_skipped for r in again.results) == 2
+    assert sum(r.chunks_stored for r in again.results) == 0
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(db_settings, "JOBS_SPOOL_DIR", str(tmp_path / "spool"))
+    (tmp_path / "spool").mkdir()
+    submitted = []
+
+    def submit(path, document_id, filename, priority=10, content_hash=None, kind="document"):
+        spooled = Path(path)
+        submitted.append(sorted(p.name for p in spooled.iterdir()) if spooled.is_dir() else kind)
+        return "job-1"
+
+    monkeypatch.setattr(main.job_queue, "submit", submit)
+    client = TestClient(main.app)
+    client.submitted = submitted
+    return client
+
+
+def _zip(members):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for name, text in members.items():
+            zf.writestr(name, text)
+    return buf.getvalue()
+
+
+def test_bulk_upload_returns_content_document_ids(client, monkeypatch):
+    earlier = {"document_id": "doc-earlier", "id": "job-0"}
+    known = hashlib.sha256(b"Uploaded before.").hexdigest()
+    monkeypatch.setattr(
+        main.job_queue, "find_duplicate", lambda sha: earlier if sha == known else None
+    )
+    response = client.post("/api/batch/embedding", files=[
+        ("files", ("a.txt", b"New text.", "text/plain")),
+        ("files", ("old.txt", b"Uploaded before.", "text/plain")),
+        ("files", ("docs.zip", _zip({"b.txt": "Zipped text.", "copy.txt": "New text."}), "application/zip")),
+        ("files", ("slides.pptx", b"nope", "application/octet-stream")),
+    ])
+
+    assert response.status_code == 202
+    body = response.json()
+    sha = lambda text: hashlib.sha256(text).hexdigest()
+    assert body["job_id"] == "job-1"
+    assert body["files"] == ["a.txt", "b.txt"]
+    assert body["duplicates"] == ["old.txt", "copy.txt"]
+    assert body["rejected"] == ["slides.pptx"]
+    assert body["document_ids"] == {
+        "a.txt": content_document_id(sha(b"New text.")),
+        "old.txt": "doc-earlier",
+        "b.txt": content_document_id(sha(b"Zipped text.")),
+        "copy.txt": content_document_id(sha(b"New text.")),
+    }
+    assert client.submitted == [["a.txt", "b.txt"]]  # duplicates are not spooled for the job
+
+
+def test_bulk_upload_of_only_known_content_queues_nothing(client, monkeypatch):
+    monkeypatch.setattr(
+        main.job_queue, "find_duplicate", lambda sha: {"document_id": "doc-earlier", "id": "job-0"}
+    )
+    response = client.post("/api/batch/embedding", files=[("files", ("a.txt", b"x", "text/plain"))])
+    assert response.status_code == 202
+    body = response.json()
+    assert (body["job_id"], body["status"]) == (None, "duplicate")
+    assert body["document_ids"] == {"a.txt": "doc-earlier"}
+    assert client.submitted == []
+
+
+def test_single_upload_of_bulk_ingested_content_is_a_duplicate(
+    tmp_path, pools, fake_embed, local_store, client, monkeypatch
+):
+    monkeypatch.setattr(main.job_queue, "find_duplicate", lambda sha: None)
+    # the fake pool runs its tasks once it has one per worker
+    root = _tree(tmp_path / "docs", {"a.txt": "Bulk ingested text.", "b.txt": "Other text."})
+    bulk_ingest.ingest_directory(root, by_content=True)
+    document_id = content_document_id(file_sha256(f"{root}/a.txt"))
+
+    response = client.post("/api/embedding", files={"file": ("a.txt", b"Bulk ingested text.", "text/plain")})
+    assert response.json() == {"job_id": None, "document_id": document_id, "status": "duplicate"}
+    assert client.submitted == []
+
+    # re-ingested with other content since: the content-derived ID no longer holds it
+    monkeypatch.setattr(main.job_queue, "has_document", lambda d: d == document_id)
+    response = client.post("/api/embedding", files={"file": ("a.txt", b"Bulk ingested text.", "text/plain")})
+    assert response.json()["status"] == "queued"
+    assert response.json()["document_id"] != document_id
+    assert client.submitted == ["document"]
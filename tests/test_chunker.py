@@ -0,0 +1,87 @@
+import pytest
+
+from chunker import chunk_text, get_encoder
+from models import RawEntry, db_settings
+
+TEXT = (
+    "Crème brûlée costs 7 € — naïve façade. Ünïcödé ☕ and emoji 🚀🚀 stay intact! "
+    "The second sentence is about invoices. Is the third a question? "
+    "Yes.\nA new line starts here and the text goes on for a while. "
+) * 6
+
+
+@pytest.fixture
+def window(monkeypatch):
+    def _set(max_tokens, overlap, snap=False):
+        monkeypatch.setattr(db_settings, "MAX_TOKENS", max_tokens)
+        monkeypatch.setattr(db_settings, "OVERLAP", overlap)
+        monkeypatch.setattr(db_settings, "CHUNK_SNAP_SENTENCES", snap)
+    return _set
+
+
+def _entry(text, index=0):
+    return RawEntry(
+        document_name="doc.pdf", page=1, text=text, is_ocr=False, source="page", chunk_index=index
+    )
+
+
+def _reference(text, max_tokens, overlap):
+    """Window texts by decoding every token span separately."""
+    encoder = get_encoder()
+    tokens = encoder.encode_ordinary(text)
+    texts, start = [], 0
+    while start < len(tokens):
+        end = min(start + max_tokens, len(tokens))
+        texts.append(encoder.decode_bytes(tokens[start:end]).decode("utf-8", errors="replace"))
+        if end >= len(tokens):
+            break
+        start = max(start + 1, end - overlap)
+    return texts
+
+
+@pytest.mark.parametrize("max_tokens,overlap", [(40, 8), (17, 0), (5, 4), (1000, 50)])
+def test_windows_match_decoding_each_token_span(window, max_tokens, overlap):
+    window(max_tokens, overlap)
+    chunks = list(chunk_text([_entry(TEXT)]))
+    assert [c.text for c in chunks] == _reference(TEXT, max_tokens, overlap)
+    assert [c.sub_chunk_index for c in chunks] == list(range(len(chunks)))
+
+
+def test_no_trailing_window_repeats_only_the_overlap(window):
+    window(10, 5)
+    tokens = get_encoder().encode_ordinary(TEXT)[:15]
+    text = get_encoder().decode(tokens)
+    chunks = list(chunk_text([_entry(text)]))
+    assert len(chunks) == 2
+
+
+def test_entries_keep_order_and_metadata_across_batches(window, monkeypatch):
+    window(20, 2)
+    monkeypatch.setattr(db_settings, "CHUNKER_BATCH_SIZE", 3)
+    entries = [_entry(f"Entry number {i}. " * (i + 1), index=i) for i in range(8)]
+    chunks = list(chunk_text(entries))
+    assert [c.chunk_index for c in chunks] == sorted(c.chunk_index for c in chunks)
+    for i, entry in enumerate(entries):
+        texts = [c.text for c in chunks if c.chunk_index == i]
+        assert texts == _reference(entry.text, 20, 2)
+    assert {(c.document_name, c.page, c.source) for c in chunks} == {("doc.pdf", 1, "page")}
+
+
+def test_windows_snap_to_a_sentence_end(window, monkeypatch):
+    window(60, 0, snap=True)
+    monkeypatch.setattr(db_settings, "CHUNK_SNAP_WINDOW", 0.5)
+    chunks = list(chunk_text([_entry(TEXT)]))
+    assert "".join(c.text for c in chunks) == TEXT
+    for chunk in chunks[:-1]:
+        assert chunk.text.rstrip(" ").endswith((".", "!", "?", "\n"))
+
+
+def test_special_token_text_is_plain_text(window):
+    window(50, 5)
+    [chunk] = chunk_text([_entry("<|endoftext|> is just text")])
+    assert chunk.text == "<|endoftext|> is just text"
+
+
+def test_empty_entries_yield_nothing(window):
+    window(50, 5)
+    assert list(chunk_text([_entry("")])) == []
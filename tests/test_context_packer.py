@@ -0,0 +1,117 @@
+import pytest
+from langchain.schema import Document as LCDocument
+
+from chunker import chunk_text
+from models import RawEntry, db_settings
+from services.context_packer import count_tokens, pack_context, render_context, strip_overlap
+
+TEXT = (
+    "Crème brûlée costs 7 € — naïve façade. Ünïcödé ☕ and emoji 🚀🚀 stay intact! "
+    "The second sentence is about invoices and when they are due. "
+) * 8
+
+
+def _doc(text, page=1, chunk=0, sub=0, document_id="doc-1", name="a.pdf"):
+    return LCDocument(page_content=text, metadata={
+        "document_id": document_id, "document_name": name, "page": page,
+        "chunk_index": chunk, "sub_chunk_index": sub,
+    })
+
+
+def _windows(monkeypatch, text, max_tokens=24, overlap=8):
+    monkeypatch.setattr(db_settings, "MAX_TOKENS", max_tokens)
+    monkeypatch.setattr(db_settings, "OVERLAP", overlap)
+    monkeypatch.setattr(db_settings, "CHUNK_SNAP_SENTENCES", False)
+    entry = RawEntry(document_name="a.pdf", page=1, text=text, is_ocr=False, source="page",
+                     chunk_index=0)
+    return [c.text for c in chunk_text([entry])]
+
+
+def test_strip_overlap_returns_the_new_text():
+    prev = "The first window ends with the shared overlap text"
+    assert strip_overlap(prev, "with the shared overlap text and then goes on.") == " and then goes on."
+
+
+def test_strip_overlap_needs_min_chars_of_overlap():
+    assert strip_overlap("ends with text", "text starts here") is None  # 4 shared characters
+    assert strip_overlap("ends with text", "text starts here", min_chars=4) == " starts here"
+    assert strip_overlap("something else entirely", "nothing shared at all here") is None
+
+
+def test_strip_overlap_ignores_split_characters_at_the_cut():
+    # a token cut through "é" leaves a U+FFFD at the end of one window and
+    # the start of the next
+    prev = "the overlap ends at caf�"
+    nxt = "�the overlap ends at café and more"
+    assert strip_overlap(prev, nxt) == "é and more"
+
+
+def test_strip_overlap_of_a_window_inside_the_previous_one():
+    prev = "a long window whose last words are repeated"
+    assert strip_overlap(prev, "whose last words are repeated") == ""
+
+
+def test_adjacent_windows_merge_back_into_the_original_text(monkeypatch):
+    windows = _windows(monkeypatch, TEXT)
+    assert len(windows) > 4
+    docs = [_doc(text, sub=i) for i, text in enumerate(windows)]
+    [block] = pack_context(list(reversed(docs)), budget=0)  # rank order does not matter
+    assert block.text == TEXT
+    assert block.render().count("Source:") == 1
+
+
+def test_pages_are_separate_blocks_in_rank_order():
+    docs = [
+        _doc("Second page, the best match.", page=2),
+        _doc("First page text.", page=1),
+        _doc("More of the second page.", page=2, chunk=3),
+        _doc("Other document.", page=2, document_id="doc-2", name="b.pdf"),
+    ]
+    blocks = pack_context(docs, budget=0)
+    assert [(b.document_name, b.page) for b in blocks] == [("a.pdf", 2), ("a.pdf", 1), ("b.pdf", 2)]
+    # not adjacent windows: separated, in reading order
+    assert blocks[0].text == "Second page, the best match.\n…\nMore of the second page."
+    assert [b.citation() for b in blocks][0] == {"document_name": "a.pdf", "page": 2}
+
+
+def test_chunks_without_positions_are_never_merged():
+    docs = [LCDocument(page_content=t, metadata={"document_name": "a.pdf", "page": 1})
+            for t in ("One chunk.", "Another chunk.")]
+    [block] = pack_context(docs, budget=0)
+    assert block.text == "One chunk.\n…\nAnother chunk."
+
+
+def test_budget_skips_chunks_that_do_not_fit_but_tries_smaller_ones():
+    big = "word " * 200
+    docs = [_doc("Best chunk.", page=1), _doc(big, page=2), _doc("Small chunk.", page=3)]
+    first_two = count_tokens(render_context(pack_context([docs[0], docs[2]], budget=0)))
+    blocks = pack_context(docs, budget=first_two + 5)
+    assert [b.page for b in blocks] == [1, 3]
+    text = render_context(blocks)
+    assert count_tokens(text) <= sum(b.tokens for b in blocks) <= first_two + 5
+
+
+def test_block_tokens_add_up_to_the_rendered_context(monkeypatch):
+    windows = _windows(monkeypatch, TEXT)
+    docs = [_doc(text, page=i % 3, sub=i) for i, text in enumerate(windows)]
+    blocks = pack_context(docs, budget=0)
+    rendered = render_context(blocks)
+    # every block is counted with its separator; the last one has none
+    assert sum(b.tokens for b in blocks) - count_tokens("\n\n") <= count_tokens(rendered)
+    assert count_tokens(rendered) <= sum(b.tokens for b in blocks)
+
+
+def test_best_chunk_is_truncated_rather_than_replaced():
+    text = "invoice " * 100
+    second = _doc("Second.", page=2)
+    budget = count_tokens(render_context(pack_context([second], budget=0))) + 10
+    [block] = pack_context([_doc(text), second], budget=budget)  # "Second." alone would fit
+    assert block.page == 1 and text.startswith(block.text) and block.text
+    assert block.tokens <= budget
+    assert count_tokens(block.render()) <= budget
+
+
+@pytest.mark.parametrize("budget", [0, 10_000])
+def test_everything_fits_a_large_budget(budget):
+    docs = [_doc(f"Chunk {i}.", page=i) for i in range(5)]
+    assert [b.page for b in pack_context(docs, budget)] == list(range(5))
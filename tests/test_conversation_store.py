@@ -0,0 +1,111 @@
+import threading
+
+import pytest
+
+from services.conversation_store import (
+    ConversationBackend, ConversationStore, InMemoryBackend, RedisBackend, SQLiteBackend,
+    count_tokens,
+)
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryBackend(idle_ttl=60, max_conversations=100)
+    if request.param == "sqlite":
+        return SQLiteBackend(str(tmp_path / "conv.sqlite3"), idle_ttl=60, max_conversations=100)
+    fakeredis = pytest.importorskip("fakeredis")
+    return RedisBackend(fakeredis.FakeRedis(), idle_ttl=60)
+
+
+def _words(n: int, word: str = "word") -> str:
+    return " ".join([word] * n)
+
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        ConversationBackend()
+
+
+def test_oldest_turns_are_dropped_beyond_the_budget(backend):
+    turn_tokens = count_tokens("question 0") + count_tokens(_words(10))
+    store = ConversationStore(backend, token_budget=2 * turn_tokens + 1)
+    conv_id = store.create()
+    assert store.history(conv_id) == []
+    for i in range(5):
+        store.append(conv_id, f"question {i}", _words(10))
+
+    turns = store.history(conv_id)
+    assert [t["query"] for t in turns] == ["question 3", "question 4"]
+    assert [t["tokens"] for t in turns] == [turn_tokens, turn_tokens]
+    assert "User: question 4\nAssistant: word" in store.render(turns)
+
+
+def test_an_oversized_turn_is_kept_truncated(backend):
+    budget = count_tokens("long question") + count_tokens(_words(5))
+    store = ConversationStore(backend, token_budget=budget)
+    conv_id = store.create()
+    store.append(conv_id, "short question", "short answer")
+    store.append(conv_id, "long question", _words(100))
+
+    [turn] = store.history(conv_id)
+    assert turn["query"] == "long question"
+    assert turn["answer"].startswith("word word")
+    assert turn["tokens"] == count_tokens(turn["query"]) + count_tokens(turn["answer"]) <= budget
+
+
+def test_an_oversized_query_is_truncated_too(backend):
+    store = ConversationStore(backend, token_budget=10)
+    conv_id = store.create()
+    store.append(conv_id, _words(50, "why"), "because")
+
+    [turn] = store.history(conv_id)
+    assert turn["answer"] == ""
+    assert 0 < turn["tokens"] <= 10
+
+
+def test_zero_budget_keeps_no_history(backend):
+    store = ConversationStore(backend, token_budget=0)
+    conv_id = store.create()
+    store.append(conv_id, "q", "a")
+    assert store.history(conv_id) == []
+
+
+def test_concurrent_appends_are_all_kept(backend):
+    store = ConversationStore(backend, token_budget=10_000)
+    conv_id = store.create()
+    threads = [
+        threading.Thread(target=store.append, args=(conv_id, f"q{i}", "a")) for i in range(16)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(t["query"] for t in store.history(conv_id)) == sorted(f"q{i}" for i in range(16))
+
+
+def test_sqlite_appends_from_two_connections_are_all_kept(tmp_path):
+    path = str(tmp_path / "conv.sqlite3")
+    stores = [
+        ConversationStore(SQLiteBackend(path, idle_ttl=60, max_conversations=100), 10_000)
+        for _ in range(2)
+    ]
+    conv_id = stores[0].create()
+    threads = [
+        threading.Thread(target=stores[i % 2].append, args=(conv_id, f"q{i}", "a"))
+        for i in range(20)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(stores[1].history(conv_id)) == 20
+
+
+def test_expired_conversations_are_gone(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "conv.sqlite3"), idle_ttl=-1, max_conversations=10)
+    store = ConversationStore(backend, token_budget=100)
+    conv_id = store.create()
+    assert store.history(conv_id) is None
+    store.append(conv_id, "q", "a")  # an expired conversation starts over
+    assert backend.count() == 0
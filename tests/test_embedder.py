@@ -0,0 +1,140 @@
+import threading
+import time
+
+import pytest
+
+from embedder import EmbeddingBatcher
+
+
+class _Recorder:
+    """Encode function that records each batch and can hold the first one."""
+
+    def __init__(self, hold_first: bool = False):
+        self.batches = []
+        self.release = threading.Event()
+        self.started = threading.Event()
+        if not hold_first:
+            self.release.set()
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        self.started.set()
+        self.release.wait(5)
+        return [[float(len(t))] for t in texts]
+
+
+def test_concurrent_requests_share_a_batch():
+    encode = _Recorder()
+    batcher = EmbeddingBatcher(encode, batch_size=8, max_wait_ms=200)
+    futures = [batcher.submit([f"text {i}"]) for i in range(4)]
+    assert [f.result(5) for f in futures] == [[[6.0]]] * 4
+    assert encode.batches == [["text 0", "text 1", "text 2", "text 3"]]
+
+
+def test_embed_slices_to_batch_size_and_keeps_order():
+    encode = _Recorder()
+    batcher = EmbeddingBatcher(encode, batch_size=3, max_wait_ms=0)
+    texts = ["a" * n for n in range(1, 8)]
+    assert batcher.embed(texts) == [[float(n)] for n in range(1, 8)]
+    assert all(len(batch) <= 3 for batch in encode.batches)
+    assert batcher.stats()["texts"] == 7
+
+
+def test_empty_submit_resolves_immediately():
+    batcher = EmbeddingBatcher(_Recorder(), batch_size=4, max_wait_ms=0)
+    assert batcher.submit([]).result(0) == []
+    assert batcher.stats()["batches"] == 0
+
+
+def test_encode_error_fails_every_request_in_the_batch():
+    def broken(texts):
+        raise RuntimeError("model down")
+
+    batcher = EmbeddingBatcher(broken, batch_size=4, max_wait_ms=50)
+    futures = [batcher.submit(["x"]), batcher.submit(["y"])]
+    for fut in futures:
+        with pytest.raises(RuntimeError, match="model down"):
+            fut.result(5)
+
+
+def test_priority_request_overtakes_queued_bulk_batches():
+    encode = _Recorder(hold_first=True)
+    batcher = EmbeddingBatcher(encode, batch_size=4, max_wait_ms=0, priority_max_texts=1)
+    running = batcher.submit(["b0"] * 4)
+    assert encode.started.wait(5)
+    bulk = [batcher.submit([f"b{i}"] * 4) for i in range(1, 4)]
+    query = batcher.submit(["query"])
+    encode.release.set()
+
+    assert query.result(5) == [[5.0]]
+    for fut in [running, *bulk]:
+        fut.result(5)
+    assert encode.batches[1] == ["query"]  # right after the batch that was running
+    stats = batcher.stats()
+    assert stats["priority_batches"] == 1 and stats["batches"] == 5
+
+
+def test_priority_batch_never_mixes_with_bulk():
+    encode = _Recorder(hold_first=True)
+    batcher = EmbeddingBatcher(encode, batch_size=8, max_wait_ms=20, priority_max_texts=2)
+    batcher.submit(["hold"] * 8)
+    assert encode.started.wait(5)
+    bulk = batcher.submit(["bulk"] * 3)
+    query = batcher.submit(["q1", "q2"])
+    encode.release.set()
+    query.result(5)
+    bulk.result(5)
+    assert ["q1", "q2"] in encode.batches
+    assert ["bulk"] * 3 in encode.batches
+
+
+def test_bulk_batch_stops_waiting_for_company_when_a_query_arrives():
+    encode = _Recorder()
+    batcher = EmbeddingBatcher(encode, batch_size=8, max_wait_ms=1000, priority_max_texts=1)
+    bulk = batcher.submit(["bulk"] * 3)  # would wait up to 1 s to fill the batch
+    time.sleep(0.05)
+    started = time.perf_counter()
+    query = batcher.submit(["query"])
+    bulk.result(5)
+    assert time.perf_counter() - started < 0.5
+    query.result(5)
+    assert encode.batches == [["bulk"] * 3, ["query"]]
+
+
+def test_cached_vectors_are_kept_per_backend_variant(tmp_path, monkeypatch):
+    import embedder
+    from embedding_cache import EmbeddingCache
+    from models import db_settings
+
+    encode = _Recorder()
+    monkeypatch.setattr(embedder, "_batcher", EmbeddingBatcher(encode, batch_size=8, max_wait_ms=0))
+    monkeypatch.setattr(embedder, "_cache", EmbeddingCache(str(tmp_path / "cache.sqlite3"), 100))
+    monkeypatch.setattr(db_settings, "EMBEDDING_BACKEND", "torch")
+    embedder.embed_text(["hello"])
+    embedder.embed_text(["hello"])
+    assert encode.batches == [["hello"]]
+
+    monkeypatch.setattr(db_settings, "EMBEDDING_BACKEND", "onnx")
+    monkeypatch.setattr(db_settings, "ONNX_QUANTIZED", True)
+    embedder.embed_text(["hello"])  # int8 ONNX vectors are not torch vectors
+    assert encode.batches == [["hello"], ["hello"]]
+
+
+def test_batch_queries_are_one_priority_request_whatever_the_batch_size(monkeypatch):
+    import embedder
+
+    encode = _Recorder(hold_first=True)
+    batcher = EmbeddingBatcher(encode, batch_size=2, max_wait_ms=0, priority_max_texts=1)
+    monkeypatch.setattr(embedder, "_batcher", batcher)
+    monkeypatch.setattr(embedder, "_cache", None)
+    bulk = batcher.submit(["bulk"] * 2, priority=False)
+    assert encode.started.wait(5)
+    queued = batcher.submit(["queued bulk"] * 2, priority=False)
+    queries = [f"q{i}" for i in range(5)]
+    thread = threading.Thread(target=embedder.SharedEmbeddings().embed_queries, args=(queries,))
+    thread.start()
+    time.sleep(0.05)
+    encode.release.set()
+    thread.join(5)
+    bulk.result(5), queued.result(5)
+    assert encode.batches == [["bulk"] * 2, queries, ["queued bulk"] * 2]
@@ -0,0 +1,72 @@
+import embedding_cache
+from embedding_cache import EmbeddingCache, cache_key
+
+MODEL = "test-model"
+
+
+def _vec(seed: float):
+    return [seed, seed + 1.0, seed + 2.0]
+
+
+def test_round_trip_and_whitespace_normalisation(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "c.sqlite3"), max_entries=100)
+    cache.put_many(MODEL, ["hello  world"], [_vec(1)])
+    assert cache.get_many(MODEL, [" hello world ", "missing"]) == [_vec(1), None]
+    assert cache.get_many("other-model", ["hello world"]) == [None]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 1)
+
+
+def test_duplicate_texts_in_one_lookup_are_all_answered(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "c.sqlite3"), max_entries=100)
+    cache.put_many(MODEL, ["a"], [_vec(1)])
+    assert cache.get_many(MODEL, ["a", "a", "b"]) == [_vec(1), _vec(1), None]
+
+
+def test_lookups_do_not_write(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "c.sqlite3"), max_entries=100)
+    cache.put_many(MODEL, ["a", "b"], [_vec(1), _vec(2)])
+    before = cache._conn.total_changes
+    for _ in range(10):
+        cache.get_many(MODEL, ["a", "b"])
+    assert cache._conn.total_changes == before
+    cache.flush()
+    assert cache._conn.total_changes == before + 2
+
+
+def test_touches_are_written_once_enough_pile_up(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "_TOUCH_BATCH", 3)
+    cache = EmbeddingCache(str(tmp_path / "c.sqlite3"), max_entries=100)
+    cache.put_many(MODEL, ["a", "b", "c"], [_vec(1), _vec(2), _vec(3)])
+    before = cache._conn.total_changes
+    cache.get_many(MODEL, ["a", "b"])
+    assert cache._conn.total_changes == before
+    cache.get_many(MODEL, ["c"])
+    assert cache._conn.total_changes == before + 3
+
+
+def test_recently_read_rows_survive_eviction(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "c.sqlite3"), max_entries=10)
+    texts = [f"t{i}" for i in range(10)]
+    cache.put_many(MODEL, texts, [_vec(i) for i in range(10)])
+    cache.get_many(MODEL, ["t0"])  # oldest row, but just used (touch still pending)
+    cache.put_many(MODEL, ["new"], [_vec(99)])
+    assert cache.stats()["entries"] == 9 and cache.stats()["evictions"] == 2
+    assert cache.get_many(MODEL, ["t0", "new"]) == [_vec(0), _vec(99)]
+    assert cache.get_many(MODEL, ["t1", "t2"]) == [None, None]
+
+
+def test_bound_holds_across_processes_sharing_the_file(tmp_path):
+    path = str(tmp_path / "c.sqlite3")
+    first = EmbeddingCache(path, max_entries=20)
+    second = EmbeddingCache(path, max_entries=20)  # another process's connection
+    for i in range(15):
+        first.put_many(MODEL, [f"a{i}"], [_vec(i)])
+        second.put_many(MODEL, [f"b{i}"], [_vec(i)])
+    count = first._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+    assert count <= 20
+
+
+def test_cache_key_depends_on_model_and_normalised_text():
+    assert cache_key(MODEL, "a\u00a0b") == cache_key(MODEL, "a b")
+    assert cache_key(MODEL, "a b") != cache_key("other", "a b")
@@ -0,0 +1,64 @@
+import uuid
+
+import pytest
+from qdrant_client.http.models import PointStruct
+
+from models import db_settings
+from storage import qdrant_client as store
+from tests.conftest import fake_embedding
+
+
+@pytest.fixture
+def hybrid_points(monkeypatch):
+    monkeypatch.setattr(db_settings, "HYBRID_SEARCH", True)
+    store.ensure_collection()
+    if not store.hybrid_enabled():
+        pytest.skip("collection was created without sparse vectors")
+    document_id = uuid.uuid4().hex
+    texts = ["error code E1234 on boot", "printer jams on paper", "router resets at night"]
+    store.upsert_points([
+        PointStruct(
+            id=str(uuid.uuid4()),
+            vector=store.point_vector(fake_embedding(text), text),
+            payload={"document_id": document_id, "page_content": text},
+        )
+        for text in texts
+    ])
+    yield document_id, texts
+    store.delete_by_document(document_id)
+
+
+def _cosine(a, b):
+    return sum(x * y for x, y in zip(a, b))
+
+
+def test_hybrid_hits_carry_their_dense_score(hybrid_points, monkeypatch):
+    document_id, texts = hybrid_points
+    monkeypatch.setattr(db_settings, "RERANK_SKIP_MARGIN", 0.1)
+    query = fake_embedding("E1234")
+    points = store.search_points(query, 3, document_id, "E1234")
+
+    assert points[0].payload["page_content"] == texts[0]  # the keyword branch finds it
+    for point in points:
+        expected = _cosine(query, fake_embedding(point.payload["page_content"]))
+        assert point.payload["_dense_score"] == pytest.approx(expected, abs=1e-5)
+        assert point.vector is None
+
+    [batched] = store.search_points_batch([(query, 3, document_id, "E1234")])
+    assert [p.payload["_dense_score"] for p in batched] == [
+        p.payload["_dense_score"] for p in points
+    ]
+
+
+def test_vectors_are_not_fetched_without_a_skip_margin(hybrid_points, monkeypatch):
+    document_id, _ = hybrid_points
+    monkeypatch.setattr(db_settings, "RERANK_SKIP_MARGIN", 0.0)
+    points = store.search_points(fake_embedding("E1234"), 3, document_id, "E1234")
+    assert all(p.payload["_dense_score"] is None for p in points)
+
+
+def test_dense_only_hits_keep_their_plain_score(hybrid_points, monkeypatch):
+    document_id, _ = hybrid_points
+    monkeypatch.setattr(db_settings, "RERANK_SKIP_MARGIN", 0.1)
+    points = store.search_points(fake_embedding("printer"), 3, document_id)
+    assert all("_dense_score" not in p.payload for p in points)
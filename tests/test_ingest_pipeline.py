@@ -0,0 +1,169 @@
+import threading
+import time
+
+import pytest
+
+from models import db_settings
+from services import ingest_service
+from services.ingest_service import _grouper, _prefetch, ingest_and_store
+from tests.conftest import fake_embedding
+
+
+def test_grouper_yields_bounded_lists():
+    assert list(_grouper(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(_grouper([], 3)) == []
+
+
+def test_prefetch_buffers_at_most_depth_items():
+    produced = []
+
+    def source():
+        for i in range(100):
+            produced.append(i)
+            yield i
+
+    items = _prefetch(source(), depth=2)
+    assert next(items) == 0
+    time.sleep(0.2)  # give the producer every chance to run ahead
+    # one handed over, `depth` buffered, one blocked in put()
+    assert len(produced) <= 4
+    assert list(items) == list(range(1, 100))
+
+
+def test_prefetch_reraises_producer_errors_in_the_consumer():
+    def source():
+        yield 1
+        raise ValueError("bad page")
+
+    items = _prefetch(source(), depth=1)
+    assert next(items) == 1
+    with pytest.raises(ValueError, match="bad page"):
+        next(items)
+
+
+def test_closing_the_consumer_stops_the_producer():
+    stopped = threading.Event()
+
+    def source():
+        try:
+            i = 0
+            while True:
+                yield i
+                i += 1
+        finally:
+            stopped.set()
+
+    items = _prefetch(source(), depth=1)
+    next(items)
+    items.close()  # joins the producer thread
+    assert not any(t.name == "ingest-prefetch" and t.is_alive() for t in threading.enumerate())
+
+
+def _write_txt(path, paragraphs):
+    path.write_text("\n\n".join(paragraphs), encoding="utf-8")
+    return str(path)
+
+
+def test_ingest_streams_every_chunk_into_the_store(tmp_path, fake_embed, local_store):
+    paragraphs = [f"Paragraph {i} talks about topic {i} in some detail." for i in range(25)]
+    path = _write_txt(tmp_path / "notes.txt", paragraphs)
+    progress = []
+
+    result = ingest_and_store(path, "doc-1", batch=4, progress=lambda *a: progress.append(a))
+
+    assert (result.stored, result.skipped, result.deleted) == (25, 0, 0)
+    assert len(local_store.document_ids("doc-1")) == 25
+    assert all(len(texts) <= 4 for texts in fake_embed)  # embedded batch by batch
+    assert progress[0] == ("parsing", 0, None)
+    assert progress[-1] == ("embedding", 25, 25)
+
+
+def test_unsupported_type_is_rejected_before_any_work(tmp_path, fake_embed, local_store):
+    path = tmp_path / "slides.pptx"
+    path.write_bytes(b"not really")
+    with pytest.raises(ValueError, match="Unsupported document type"):
+        ingest_and_store(str(path), "doc-x")
+    assert fake_embed == []
+
+
+@pytest.fixture(params=["local", "qdrant"])
+def any_store(request, local_store, monkeypatch):
+    if request.param == "local":
+        yield local_store
+        return
+    from storage import vector_store
+    from storage.qdrant_client import QdrantStore
+
+    store = QdrantStore()
+    monkeypatch.setattr(vector_store, "_store", store)
+    yield store
+    store.delete_document("doc-r")
+
+
+def _names(store, document_id):
+    points = store.search(fake_embedding("topic"), 100, document_id)
+    return {p.payload["page_content"]: p.payload["document_name"] for p in points}
+
+
+def test_reingest_embeds_only_changes_and_renames_kept_chunks(tmp_path, fake_embed, any_store):
+    paragraphs = [f"Paragraph {i} talks about topic {i} in some detail." for i in range(6)]
+    path = _write_txt(tmp_path / "v1.txt", paragraphs)
+    ingest_and_store(path, "doc-r", batch=4, document_name="draft.txt")
+    fake_embed.clear()
+
+    edited = paragraphs[:4] + ["A brand new closing paragraph."]
+    path = _write_txt(tmp_path / "v2.txt", edited)
+    result = ingest_and_store(path, "doc-r", batch=4, document_name="final.txt")
+
+    assert (result.stored, result.skipped, result.deleted) == (1, 4, 2)
+    assert [t for batch in fake_embed for t in batch] == ["A brand new closing paragraph."]
+    assert _names(any_store, "doc-r") == {text: "final.txt" for text in edited}
+
+
+def test_ingest_keeps_at_most_queue_depth_batches_in_flight(
+    tmp_path, fake_embed, local_store, monkeypatch
+):
+    monkeypatch.setattr(db_settings, "INGEST_QUEUE_DEPTH", 2)
+    monkeypatch.setattr(db_settings, "QDRANT_UPLOAD_PARALLEL", 4)
+    release = threading.Event()
+    state = {"in_flight": 0, "peak": 0}
+    lock = threading.Lock()
+    upsert = ingest_service._upsert
+
+    def slow_upsert(points, wait=None):
+        with lock:
+            state["in_flight"] += 1
+            state["peak"] = max(state["peak"], state["in_flight"])
+        release.wait(0.05)
+        try:
+            return upsert(points, wait)
+        finally:
+            with lock:
+                state["in_flight"] -= 1
+
+    monkeypatch.setattr(ingest_service, "_upsert", slow_upsert)
+    path = _write_txt(tmp_path / "big.txt", [f"Section {i} text." for i in range(40)])
+    result = ingest_and_store(path, "doc-big", batch=2)
+
+    assert result.stored == 40
+    assert state["peak"] <= 2
+
+
+def test_last_batch_is_upserted_with_wait_after_the_rest(tmp_path, fake_embed, local_store, monkeypatch):
+    monkeypatch.setattr(db_settings, "QDRANT_UPSERT_WAIT", False)
+    calls = []
+    lock = threading.Lock()
+    upsert = local_store.upsert
+
+    def recording_upsert(points, wait=None):
+        time.sleep(0.01)
+        upsert(points, wait)
+        with lock:
+            calls.append((len(points), wait))
+
+    monkeypatch.setattr(local_store, "upsert", recording_upsert)
+    path = _write_txt(tmp_path / "doc.txt", [f"Section {i} text." for i in range(9)])
+    ingest_and_store(path, "doc-w", batch=2)
+
+    assert [wait for _, wait in calls] == [None] * 4 + [True]
+    assert calls[-1][0] == 1
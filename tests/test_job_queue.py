@@ -0,0 +1,229 @@
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from services import job_queue
+from services.job_queue import (
+    FAILED, QUEUED, RUNNING, SUCCEEDED, IngestJobQueue, JobStore, QueueFullError,
+)
+
+
+def _result(stored=3):
+    return SimpleNamespace(stored=stored, skipped=0, deleted=0, chunks=stored)
+
+
+def _spooled(tmp_path, name="upload.txt"):
+    path = tmp_path / name
+    path.write_text("text")
+    return str(path)
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def _dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.sqlite3"))
+
+
+def _create(store, path, job_id="job-1", status=QUEUED, owner=None, priority=10):
+    store.create({"id": job_id, "document_id": f"doc-{job_id}", "filename": "f.txt",
+                  "path": path, "priority": priority, "status": status, "owner": owner})
+
+
+def test_claim_is_atomic_across_connections(tmp_path, store):
+    _create(store, _spooled(tmp_path))
+    other = JobStore(str(tmp_path / "jobs.sqlite3"))  # a second server process
+    barrier = threading.Barrier(8)
+    claims = []
+
+    def claim(s, owner):
+        barrier.wait()
+        claims.append(s.claim("job-1", owner, "parsing"))
+
+    threads = [threading.Thread(target=claim, args=(s, f"h:{i}:t"))
+               for i, s in enumerate([store, other] * 4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    won = [c for c in claims if c is not None]
+    assert len(won) == 1
+    assert won[0]["status"] == RUNNING and won[0]["owner"] == store.get("job-1")["owner"]
+
+
+def test_job_queued_twice_runs_once(tmp_path, store):
+    calls = []
+
+    def handler(path, document_id, progress, document_name):
+        calls.append(document_id)
+        time.sleep(0.05)
+        return _result()
+
+    queue = IngestJobQueue(store, handler, workers=4, max_queued=10)
+    job_id = queue.submit(_spooled(tmp_path), "doc-a", "a.txt")
+    queue._queue.put((10, next(queue._seq), job_id))  # e.g. re-queued by another start()
+    queue.start()
+    try:
+        assert _wait_for(lambda: store.get(job_id)["status"] == SUCCEEDED)
+        time.sleep(0.1)
+    finally:
+        queue.stop(timeout=5)
+    assert calls == ["doc-a"]
+    assert store.get(job_id)["owner"] == queue.owner
+
+
+def test_start_recovers_only_jobs_of_dead_owners(tmp_path, store):
+    host = socket.gethostname()
+    _create(store, _spooled(tmp_path, "a"), "orphan", RUNNING, f"{host}:{_dead_pid()}:dead")
+    _create(store, _spooled(tmp_path, "b"), "live", RUNNING, f"{host}:{os.getppid()}:other")
+    _create(store, _spooled(tmp_path, "c"), "remote", RUNNING, "elsewhere:1:x")
+    _create(store, _spooled(tmp_path, "d"), "legacy", RUNNING, None)
+    ran = []
+
+    def handler(path, document_id, progress, document_name):
+        ran.append(document_id)
+        return _result()
+
+    queue = IngestJobQueue(store, handler, workers=2, max_queued=10)
+    queue.start()
+    try:
+        assert _wait_for(lambda: len(ran) == 2)
+        time.sleep(0.1)
+    finally:
+        queue.stop(timeout=5)
+    assert sorted(ran) == ["doc-legacy", "doc-orphan"]
+    assert store.get("live")["status"] == RUNNING
+    assert store.get("remote")["status"] == RUNNING
+
+
+def test_recycled_pid_of_an_earlier_incarnation_counts_as_gone():
+    own = f"{socket.gethostname()}:{os.getpid()}:now"
+    assert job_queue._owner_gone(f"{socket.gethostname()}:{os.getpid()}:before", own)
+    assert not job_queue._owner_gone(own, own)
+
+
+def test_lost_upload_fails_the_job(tmp_path, store):
+    _create(store, str(tmp_path / "gone.txt"))
+    queue = IngestJobQueue(store, lambda *a, **k: _result(), workers=1, max_queued=10)
+    queue.start()
+    queue.stop(timeout=5)
+    job = store.get("job-1")
+    assert job["status"] == FAILED and "lost" in job["error"]
+
+
+def test_jobs_run_in_priority_order(tmp_path, store):
+    order = []
+    gate = threading.Event()
+
+    def handler(path, document_id, progress, document_name):
+        gate.wait(5)
+        order.append(document_id)
+        return _result()
+
+    queue = IngestJobQueue(store, handler, workers=1, max_queued=10)
+    queue.start()
+    try:
+        queue.submit(_spooled(tmp_path, "0"), "first", "0", priority=10)  # taken at once
+        time.sleep(0.05)
+        queue.submit(_spooled(tmp_path, "1"), "low", "1", priority=20)
+        queue.submit(_spooled(tmp_path, "2"), "high", "2", priority=1)
+        gate.set()
+        assert _wait_for(lambda: len(order) == 3)
+    finally:
+        queue.stop(timeout=5)
+    assert order == ["first", "high", "low"]
+
+
+def test_queue_full_is_rejected(tmp_path, store):
+    queue = IngestJobQueue(store, lambda *a, **k: _result(), workers=1, max_queued=1)
+    queue.submit(_spooled(tmp_path, "0"), "a", "a")
+    with pytest.raises(QueueFullError):
+        queue.submit(_spooled(tmp_path, "1"), "b", "b")
+
+
+def test_failures_and_empty_documents_are_reported(tmp_path, store):
+    def handler(path, document_id, progress, document_name):
+        if document_id == "bad":
+            raise ValueError("Unsupported document type: pptx")
+        return _result(stored=0)
+
+    queue = IngestJobQueue(store, handler, workers=1, max_queued=10)
+    bad = queue.submit(_spooled(tmp_path, "0"), "bad", "x.pptx")
+    empty = queue.submit(_spooled(tmp_path, "1"), "empty", "e.txt")
+    queue.start()
+    try:
+        assert _wait_for(lambda: store.get(empty)["status"] == FAILED)
+    finally:
+        queue.stop(timeout=5)
+    assert store.get(bad)["error"] == "Unsupported document type: pptx"
+    assert store.get(empty)["error"] == "No valid text chunks found"
+    assert not os.path.exists(store.get(bad)["path"])  # spool file removed either way
+
+
+def test_jobs_for_one_document_run_one_at_a_time_in_order(tmp_path, store):
+    running = {}
+    overlaps = []
+    order = []
+    lock = threading.Lock()
+
+    def handler(path, document_id, progress, document_name):
+        with lock:
+            if running.get(document_id):
+                overlaps.append(document_id)
+            running[document_id] = True
+            order.append((document_id, document_name))
+        time.sleep(0.05)
+        with lock:
+            running[document_id] = False
+        return _result()
+
+    queue = IngestJobQueue(store, handler, workers=4, max_queued=10)
+    jobs = [queue.submit(_spooled(tmp_path, f"a{i}"), "doc-a", f"a{i}.txt") for i in range(3)]
+    jobs.append(queue.submit(_spooled(tmp_path, "b"), "doc-b", "b.txt"))
+    queue.start()
+    try:
+        assert _wait_for(lambda: all(store.get(j)["status"] == SUCCEEDED for j in jobs))
+        # start() re-queued the submitted jobs too; those copies drain as no-ops.
+        # Checked before stop(), which queues one marker per worker.
+        assert _wait_for(lambda: queue.queued() == 0)
+    finally:
+        queue.stop(timeout=5)
+    assert overlaps == []
+    assert [name for doc, name in order if doc == "doc-a"] == ["a0.txt", "a1.txt", "a2.txt"]
+    assert order.index(("doc-b", "b.txt")) < 3  # other documents do not wait
+
+
+def test_only_a_documents_latest_content_counts_as_duplicate(tmp_path, store):
+    queue = IngestJobQueue(store, lambda *a, **k: _result(), workers=1, max_queued=10)
+    first = queue.submit(_spooled(tmp_path, "a"), "doc-x", "x.txt", content_hash="hA")
+    assert queue.find_duplicate("hA")["id"] == first
+
+    second = queue.submit(_spooled(tmp_path, "b"), "doc-x", "x.txt", content_hash="hB")
+    assert queue.find_duplicate("hA") is None  # doc-x now holds B
+    assert queue.find_duplicate("hB")["id"] == second
+
+    third = queue.submit(_spooled(tmp_path, "c"), "doc-x", "x.txt", content_hash="hA")
+    assert queue.find_duplicate("hA")["id"] == third
+    assert queue.find_duplicate("hB") is None
+    other = queue.submit(_spooled(tmp_path, "d"), "doc-y", "y.txt", content_hash="hC")
+    assert queue.find_duplicate("hA")["id"] == third  # other documents leave it alone
+    assert queue.find_duplicate("hC")["id"] == other
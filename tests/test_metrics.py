@@ -0,0 +1,194 @@
+import asyncio
+import os
+from collections import defaultdict
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+import metrics
+from models import db_settings
+from services.ingest_service import ingest_and_store
+
+
+class _Recorder:
+    """Metric stand-in: records every observation / increment by label values."""
+
+    def __init__(self):
+        self.values = defaultdict(list)
+        self._labels = ()
+
+    def labels(self, *labels):
+        child = _Recorder.__new__(_Recorder)
+        child.values, child._labels = self.values, labels
+        return child
+
+    def observe(self, value):
+        self.values[self._labels].append(value)
+
+    def inc(self, amount=1):
+        self.values[self._labels].append(amount)
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    names = ("INGEST_STAGE_SECONDS", "INGEST_CHUNKS", "INGEST_DOCUMENT_CHUNKS", "OCR_PAGES",
+             "QUERY_STAGE_SECONDS", "ANSWER_CACHE_LOOKUPS", "LLM_TOKENS", "HTTP_REQUEST_SECONDS")
+    recorders = {name: _Recorder() for name in names}
+    for name, recorder in recorders.items():
+        monkeypatch.setattr(metrics, name, recorder)
+    return {name: r.values for name, r in recorders.items()}
+
+
+def _app():
+    app = FastAPI()
+    app.add_middleware(metrics.InstrumentationMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: str):
+        with metrics.query_stage("retrieve"):
+            await asyncio.sleep(0.01)
+        return {"id": item_id}
+
+    @app.get("/stream")
+    async def stream():
+        with metrics.query_stage("retrieve"):
+            pass
+
+        async def body():
+            with metrics.query_stage("llm"):  # after the headers went out
+                yield b"text"
+
+        return StreamingResponse(body())
+
+    return app
+
+
+def _server_timing(response):
+    return dict(
+        entry.split(";dur=") for entry in response.headers["server-timing"].split(", ")
+    )
+
+
+def test_server_timing_lists_the_request_stages(recorded):
+    response = TestClient(_app()).get("/items/abc")
+    timings = _server_timing(response)
+    assert list(timings) == ["retrieve", "total"]
+    assert 10 <= float(timings["retrieve"]) <= float(timings["total"])
+    assert [len(v) for v in recorded["QUERY_STAGE_SECONDS"].values()] == [1]
+    # labelled by the route template, not the raw path
+    assert list(recorded["HTTP_REQUEST_SECONDS"]) == [("GET", "/items/{item_id}", "200")]
+
+
+def test_streamed_responses_time_only_stages_before_the_first_byte(recorded):
+    response = TestClient(_app()).get("/stream")
+    assert response.text == "text"
+    assert list(_server_timing(response)) == ["retrieve", "total"]
+    assert set(recorded["QUERY_STAGE_SECONDS"]) == {("retrieve",), ("llm",)}
+
+
+def test_stages_outside_requests_are_only_observed(recorded):
+    with metrics.ingest_stage("parse"):
+        pass
+    assert list(recorded["INGEST_STAGE_SECONDS"]) == [("parse",)]
+    assert metrics._request_timings.get() is None
+
+
+def test_iter_timer_counts_only_time_spent_producing_items():
+    import time
+
+    def slow():
+        for i in range(3):
+            time.sleep(0.01)
+            yield i
+
+    timer = metrics.IterTimer()
+    for _ in timer.wrap(slow()):
+        time.sleep(0.02)  # consumer time is not counted
+    assert 0.03 <= timer.seconds < 0.06
+
+
+def test_llm_usage_is_counted_by_kind(recorded):
+    class Message:
+        usage_metadata = {"input_tokens": 120, "output_tokens": 30, "total_tokens": 150}
+
+    metrics.record_llm_usage(Message())
+    metrics.record_llm_usage(object())  # no usage reported
+    assert recorded["LLM_TOKENS"] == {("input",): [120], ("output",): [30]}
+
+
+def test_ingest_records_stages_and_chunk_outcomes(tmp_path, recorded, fake_embed, local_store):
+    path = tmp_path / "doc.txt"
+    path.write_text("\n\n".join(f"Paragraph {i} about topic {i}." for i in range(5)))
+    result = ingest_and_store(str(path), "doc-m")
+    ingest_and_store(str(path), "doc-m")  # unchanged: every chunk skipped
+
+    chunks = recorded["INGEST_CHUNKS"]
+    assert sum(chunks[("stored",)]) == result.stored > 0
+    assert sum(chunks[("skipped",)]) == result.stored
+    assert {"parse", "chunk", "embed", "upsert"} <= {s for (s,) in recorded["INGEST_STAGE_SECONDS"]}
+
+
+def test_query_records_stages_cache_lookups_and_tokens(recorded, chatbot, index_chunks):
+    index_chunks("doc-q", ["Invoices are due in 30 days.", "Refunds take a week."])
+    chatbot.get_response("when are invoices due", top_k=1, document_id="doc-q")
+
+    stages = {s for (s,) in recorded["QUERY_STAGE_SECONDS"]}
+    assert {"embed", "retrieve", "rerank", "llm"} <= stages
+    assert recorded["LLM_TOKENS"] == {("input",): [10], ("output",): [2]}
+    if chatbot.answer_cache is not None:
+        assert recorded["ANSWER_CACHE_LOOKUPS"] == {("miss",): [1]}
+
+
+def test_disabled_metrics_are_noops(monkeypatch):
+    monkeypatch.setattr(db_settings, "METRICS_ENABLED", False)
+    histogram = metrics._histogram("rag_test_seconds", "unused", ("stage",))
+    assert histogram is metrics._NOOP
+    histogram.labels("x").observe(1.0)  # accepted and dropped
+
+    import main
+
+    assert TestClient(main.app).get("/metrics").status_code == 404
+
+
+def test_metrics_endpoint_exposes_the_stage_histograms(monkeypatch):
+    pytest.importorskip("prometheus_client")
+    if not metrics.enabled():
+        pytest.skip("metrics were disabled when the module was imported")
+    import main
+
+    with metrics.query_stage("rerank"):
+        pass
+    response = TestClient(main.app).get("/metrics")
+    assert response.status_code == 200
+    assert 'rag_query_stage_seconds_count{stage="rerank"}' in response.text
+
+
+def test_sampled_profile_is_written(tmp_path, monkeypatch):
+    class FakeProfiler:
+        def __init__(self, interval, async_mode):
+            self.running = False
+
+        def start(self):
+            self.running = True
+
+        def stop(self):
+            self.running = False
+
+        def output_html(self):
+            return "<html>profile</html>"
+
+    monkeypatch.setattr(metrics, "_profiler_class", lambda: FakeProfiler)
+    monkeypatch.setattr(db_settings, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(db_settings, "PROFILE_SAMPLE_RATE", 0.0)
+    with metrics.profiled("GET /api/query"):
+        pass
+    assert os.listdir(tmp_path) == []
+
+    monkeypatch.setattr(db_settings, "PROFILE_SAMPLE_RATE", 1.0)
+    with metrics.profiled("GET /api/query"):
+        pass
+    [report] = os.listdir(tmp_path)
+    assert report.endswith("-GET_api_query.html")
+    assert (tmp_path / report).read_text() == "<html>profile</html>"
@@ -0,0 +1,153 @@
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+import model_registry
+from model_registry import ModelRegistry
+from models import db_settings
+
+
+class _Loader:
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise OSError("download failed")
+        time.sleep(0.01)
+        return object()
+
+
+def test_model_is_loaded_once_for_concurrent_callers():
+    registry = ModelRegistry()
+    loader = _Loader()
+    models = []
+    threads = [
+        threading.Thread(target=lambda: models.append(registry.get("embedding", "m", loader)))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert loader.calls == 1
+    assert len({id(m) for m in models}) == 1
+    assert registry.loaded("embedding", "m")
+    assert set(registry.stats()["embedding:m"]) == {"load_seconds", "rss_delta_mb"}
+
+
+def test_failed_load_is_not_retried_during_backoff(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(model_registry.time, "monotonic", lambda: now[0])
+    registry = ModelRegistry(retry_base_seconds=10, retry_max_seconds=25)
+    loader = _Loader(failures=3)
+
+    for _ in range(3):
+        with pytest.raises(OSError):
+            registry.get("reranker", "m", loader)
+    assert loader.calls == 1
+
+    now[0] += 10  # first backoff over
+    with pytest.raises(OSError):
+        registry.get("reranker", "m", loader)
+    assert loader.calls == 2
+
+    now[0] += 10  # backoff doubled to 20 s: still waiting
+    with pytest.raises(OSError):
+        registry.get("reranker", "m", loader)
+    assert loader.calls == 2
+
+    now[0] += 10
+    with pytest.raises(OSError):
+        registry.get("reranker", "m", loader)
+    now[0] += 25  # capped at retry_max
+    assert registry.get("reranker", "m", loader) is not None
+    assert loader.calls == 4
+
+
+def test_reset_failures_allows_an_immediate_retry():
+    registry = ModelRegistry(retry_base_seconds=3600)
+    loader = _Loader(failures=1)
+    with pytest.raises(OSError):
+        registry.get("embedding", "m", loader)
+    registry.reset_failures()
+    assert registry.get("embedding", "m", loader) is not None
+    assert loader.calls == 2
+
+
+def test_models_are_keyed_on_kind_and_name():
+    registry = ModelRegistry()
+    first = registry.get("embedding", "a", _Loader())
+    assert registry.get("embedding", "a", _Loader()) is first
+    assert registry.get("reranker", "a", _Loader()) is not first
+
+
+class _FakeModel:
+    def __init__(self, path, **kwargs):
+        self.path = path
+        self.kwargs = kwargs
+
+
+@pytest.fixture
+def fresh_registry(monkeypatch):
+    registry = ModelRegistry()
+    monkeypatch.setattr(model_registry, "registry", registry)
+    fake = types.ModuleType("sentence_transformers")
+    fake.SentenceTransformer = fake.CrossEncoder = _FakeModel
+    monkeypatch.setitem(sys.modules, "sentence_transformers", fake)
+    return registry
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="Unknown inference backend"):
+        model_registry._backend_kwargs("m", "tensorrt", False, _FakeModel)
+
+
+def test_torch_backend_needs_no_constructor_kwargs(monkeypatch):
+    monkeypatch.setattr(db_settings, "INFERENCE_THREADS", 0)
+    assert model_registry._backend_kwargs("m", "torch", True, _FakeModel) == {}
+
+
+def test_onnx_backend_sets_provider_and_threads(monkeypatch):
+    ort = pytest.importorskip("onnxruntime")
+    monkeypatch.setattr(db_settings, "INFERENCE_THREADS", 3)
+    kwargs = model_registry._backend_kwargs("m", "onnx", False, _FakeModel)
+    assert kwargs["backend"] == "onnx"
+    assert kwargs["model_kwargs"]["provider"] == "CPUExecutionProvider"
+    assert isinstance(kwargs["model_kwargs"]["session_options"], ort.SessionOptions)
+    assert kwargs["model_kwargs"]["session_options"].intra_op_num_threads == 3
+
+
+def test_backend_variants_are_separate_registry_entries(fresh_registry, monkeypatch):
+    monkeypatch.setattr(
+        model_registry, "_backend_kwargs",
+        lambda name, backend, quantized, cls: {} if backend == "torch" else {"backend": backend},
+    )
+    torch_model = model_registry.get_cross_encoder("ce", backend="torch")
+    onnx_model = model_registry.get_cross_encoder("ce", backend="onnx", quantized=False)
+    assert model_registry.get_cross_encoder("ce", backend="torch") is torch_model
+    assert onnx_model is not torch_model
+    assert onnx_model.kwargs == {"backend": "onnx"}
+    assert fresh_registry.loaded("reranker", "ce@torch")
+    assert fresh_registry.loaded("reranker", "ce@onnx")
+    assert not fresh_registry.loaded("reranker", "ce@onnx-int8")
+
+
+def test_quantized_model_is_loaded_from_its_export(fresh_registry, monkeypatch):
+    monkeypatch.setattr(
+        model_registry, "_backend_kwargs",
+        lambda name, backend, quantized, cls: {
+            "backend": "onnx",
+            "model_name_or_path": "/exports/m",
+            "model_kwargs": {"file_name": "onnx/model_qint8_avx2.onnx"},
+        },
+    )
+    model = model_registry.get_sentence_transformer("m", backend="onnx", quantized=True)
+    assert model.path == "/exports/m"
+    assert "model_name_or_path" not in model.kwargs
+    assert fresh_registry.loaded("embedding", "m@onnx-int8")
@@ -0,0 +1,88 @@
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from models import db_settings
+from parsers import pdf_parser
+
+
+class _InlinePool:
+    """Executor stand-in: runs tasks inline, or fails them all like a dead pool."""
+
+    def __init__(self, broken: bool = False):
+        self.broken = broken
+        self.submitted = []
+        self.shut_down = False
+
+    def submit(self, fn, *args):
+        self.submitted.append(args[1:])
+        fut = Future()
+        if self.broken:
+            fut.set_exception(BrokenProcessPool("a worker died"))
+        else:
+            fut.set_result(fn(*args))
+        return fut
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+@pytest.fixture
+def sharded(monkeypatch):
+    monkeypatch.setattr(db_settings, "PDF_WORKERS", 2)
+    monkeypatch.setattr(db_settings, "PDF_PAGES_PER_SHARD", 2)
+
+
+def _pages(n):
+    return [f"Page {i} body" for i in range(1, n + 1)]
+
+
+def test_serial_extraction_for_short_documents(make_pdf, monkeypatch):
+    monkeypatch.setattr(db_settings, "PDF_WORKERS", 1)
+    entries = list(pdf_parser.ingest_pdf(make_pdf("short.pdf", _pages(3))))
+    assert [e.page for e in entries] == [1, 2, 3]
+    assert [e.text for e in entries] == _pages(3)
+    assert not any(e.is_ocr for e in entries)
+
+
+def test_shards_come_back_in_page_order(make_pdf, sharded, monkeypatch):
+    pool = _InlinePool()
+    monkeypatch.setattr(pdf_parser, "_pool", pool)
+    entries = list(pdf_parser.ingest_pdf(make_pdf("long.pdf", _pages(7))))
+    assert [e.page for e in entries] == list(range(1, 8))
+    assert [e.chunk_index for e in entries] == list(range(7))
+    assert pool.submitted == [(1, 3), (3, 5), (5, 7), (7, 8)]
+
+
+def test_broken_pool_is_replaced_and_the_file_retried(make_pdf, sharded, monkeypatch):
+    broken, fresh = _InlinePool(broken=True), _InlinePool()
+    monkeypatch.setattr(pdf_parser, "_pool", broken)
+    monkeypatch.setattr(pdf_parser, "ProcessPoolExecutor", lambda **kwargs: fresh)
+
+    entries = list(pdf_parser.ingest_pdf(make_pdf("long.pdf", _pages(5))))
+
+    assert [e.page for e in entries] == [1, 2, 3, 4, 5]
+    assert broken.shut_down and pdf_parser._pool is fresh
+
+
+def test_second_crash_fails_only_this_file(make_pdf, sharded, monkeypatch):
+    monkeypatch.setattr(pdf_parser, "_pool", _InlinePool(broken=True))
+    monkeypatch.setattr(pdf_parser, "ProcessPoolExecutor", lambda **kwargs: _InlinePool(broken=True))
+    with pytest.raises(BrokenProcessPool):
+        list(pdf_parser.ingest_pdf(make_pdf("long.pdf", _pages(5))))
+    # the next file gets a new pool instead of the dead one
+    fresh = _InlinePool()
+    monkeypatch.setattr(pdf_parser, "ProcessPoolExecutor", lambda **kwargs: fresh)
+    pdf_parser._replace_pool(pdf_parser._pool)
+    assert pdf_parser._pool is fresh
+
+
+def test_real_process_pool_extracts_pages(make_pdf, sharded, monkeypatch):
+    monkeypatch.setattr(pdf_parser, "_pool", None)
+    try:
+        entries = list(pdf_parser.ingest_pdf(make_pdf("long.pdf", _pages(5))))
+    finally:
+        if pdf_parser._pool is not None:
+            pdf_parser._pool.shutdown()
+    assert [e.text for e in entries] == _pages(5)
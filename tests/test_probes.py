@@ -0,0 +1,67 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from models import db_settings
+
+
+@pytest.fixture
+def client(local_store):
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def warmup_failed(monkeypatch):
+    monkeypatch.setitem(main.startup_report, "warmup", "failed")
+    monkeypatch.setattr(main, "_warmup_attempted", float("-inf"))
+    started = []
+    monkeypatch.setattr(main, "_warm_up", lambda: started.append(time.monotonic()))
+    return started
+
+
+def test_liveness_checks_nothing(client):
+    assert client.get("/api/health").json() == {"status": "healthy"}
+
+
+def test_ready_once_store_reachable_and_warmup_done(client, monkeypatch):
+    monkeypatch.setitem(main.startup_report, "warmup", "disabled")
+    response = client.get("/api/ready")
+    assert response.status_code == 200
+    assert response.json()["checks"] == {"vector_store": "ok", "warmup": "disabled"}
+
+
+def test_not_ready_while_store_unreachable(client, local_store, monkeypatch):
+    monkeypatch.setitem(main.startup_report, "warmup", "done")
+
+    def down():
+        raise ConnectionError("refused")
+
+    monkeypatch.setattr(local_store, "ping", down)
+    response = client.get("/api/ready")
+    assert response.status_code == 503
+    assert response.json()["checks"]["vector_store"] == "unreachable: refused"
+
+
+def test_failed_warmup_is_retried_at_most_once_per_interval(client, warmup_failed, monkeypatch):
+    monkeypatch.setattr(db_settings, "WARMUP_RETRY_SECONDS", 60.0)
+    for _ in range(10):
+        assert client.get("/api/ready").status_code == 503
+    time.sleep(0.1)
+    assert len(warmup_failed) == 1
+
+    monkeypatch.setattr(main, "_warmup_attempted", time.monotonic() - 61)
+    client.get("/api/ready")
+    time.sleep(0.1)
+    assert len(warmup_failed) == 2
+
+
+def test_stats_report_a_disabled_answer_cache(client, chatbot, monkeypatch):
+    monkeypatch.setattr(main, "_chatbot_manager", None)
+    monkeypatch.setattr(db_settings, "ANSWER_CACHE_ENABLED", True)
+    assert client.get("/api/stats").json()["answer_cache"] == {"enabled": True}
+
+    chatbot.answer_cache = None
+    monkeypatch.setattr(main, "_chatbot_manager", chatbot)
+    assert client.get("/api/stats").json()["answer_cache"] == {"enabled": False}
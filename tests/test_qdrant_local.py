@@ -0,0 +1,70 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from qdrant_client.http.models import PointStruct
+
+from storage import qdrant_client as store
+from tests.conftest import fake_embedding
+
+
+def _points(document_id, n):
+    return [
+        PointStruct(
+            id=str(uuid.uuid4()),
+            vector=store.point_vector(fake_embedding(f"text {i}"), f"text {i}"),
+            payload={"document_id": document_id, "page_content": f"text {i}"},
+        )
+        for i in range(n)
+    ]
+
+
+def test_local_client_calls_never_overlap(monkeypatch):
+    store.ensure_collection()
+    inner = store.get_client()._client
+    active, overlaps = [0], []
+    guard = threading.Lock()
+
+    def watched(name):
+        method = getattr(inner, name)
+
+        def call(*args, **kwargs):
+            with guard:
+                active[0] += 1
+                if active[0] > 1:
+                    overlaps.append(name)
+            time.sleep(0.002)
+            try:
+                return method(*args, **kwargs)
+            finally:
+                with guard:
+                    active[0] -= 1
+
+        monkeypatch.setattr(inner, name, call)
+
+    for name in ("upsert", "query_points", "query_batch_points", "scroll",
+                 "delete", "count", "set_payload"):
+        watched(name)
+
+    documents = [uuid.uuid4().hex for _ in range(4)]
+    qdrant = store.QdrantStore()
+
+    def work(document_id):
+        qdrant.upsert(_points(document_id, 5))
+        qdrant.search(fake_embedding("text 1"), 3, document_id)
+        qdrant.search_batch([(fake_embedding("text 2"), 3, document_id, None)])
+        qdrant.rename_document(document_id, "renamed.txt")
+        ids = qdrant.document_ids(document_id)
+        qdrant.delete_points(document_id, list(ids)[:2])
+        qdrant.count()
+        return len(qdrant.document_ids(document_id))
+
+    try:
+        with ThreadPoolExecutor(8) as pool:
+            left = list(pool.map(work, documents * 2))
+    finally:
+        for document_id in documents:
+            qdrant.delete_document(document_id)
+    assert overlaps == []
+    assert all(n >= 3 for n in left)
@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+from services.rag_assistant import NO_CONTEXT_ANSWER
+
+PASSAGES = [
+    "Invoices are due within thirty days of receipt.",
+    "The warehouse ships orders every weekday morning.",
+    "Refunds are issued to the original payment method.",
+]
+
+
+def test_async_and_sync_paths_agree(chatbot, index_chunks):
+    index_chunks("doc-1", PASSAGES)
+    sync = chatbot.get_response("When are invoices due?", top_k=1, use_cache=False)
+    result = asyncio.run(chatbot.aget_response("When are invoices due?", top_k=1, use_cache=False))
+    assert result == sync
+    answer, citations = result
+    assert answer == "The answer."
+    assert citations == [{"document_name": "doc.pdf", "page": 1}]
+    assert "Invoices are due within thirty days" in chatbot.llm.prompts[-1]
+
+
+def test_document_filter_is_passed_per_call(chatbot, index_chunks):
+    index_chunks("doc-1", PASSAGES[:1], document_name="one.pdf")
+    index_chunks("doc-2", PASSAGES[1:], document_name="two.pdf")
+
+    async def both():
+        return await asyncio.gather(
+            chatbot.aget_response("invoices orders refunds", top_k=3, document_id="doc-1"),
+            chatbot.aget_response("invoices orders refunds", top_k=3, document_id="doc-2"),
+        )
+
+    (_, first), (_, second) = asyncio.run(both())
+    assert {c["document_name"] for c in first} == {"one.pdf"}
+    assert {c["document_name"] for c in second} == {"two.pdf"}
+
+
+def test_llm_calls_overlap_instead_of_blocking_the_loop(chatbot, index_chunks):
+    index_chunks("doc-1", PASSAGES)
+    chatbot.llm.delay = 0.2
+
+    async def many():
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            chatbot.aget_response(f"question {i}", use_cache=False) for i in range(5)
+        ))
+        return time.perf_counter() - started
+
+    assert asyncio.run(many()) < 0.2 * 5 * 0.6
+
+
+def test_nothing_retrieved_skips_the_llm(chatbot):
+    answer, citations = asyncio.run(chatbot.aget_response("anything?", document_id="none"))
+    assert (answer, citations) == (NO_CONTEXT_ANSWER, [])
+    assert chatbot.llm.prompts == []
+
+
+def test_history_reaches_the_prompt_only(chatbot, index_chunks):
+    index_chunks("doc-1", PASSAGES)
+    asyncio.run(chatbot.aget_response("When are refunds issued?", history="User: hi\nAssistant: hello"))
+    prompt = chatbot.llm.prompts[-1]
+    assert "Conversation so far:\nUser: hi" in prompt
+    assert prompt.rstrip().endswith("Question: When are refunds issued?\nAnswer:")
@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from models import db_settings
+from services.rag_assistant import NO_CONTEXT_ANSWER
+
+PASSAGES = [
+    "Invoices are due within thirty days of receipt.",
+    "The warehouse ships orders every weekday morning.",
+    "Refunds are issued to the original payment method.",
+]
+
+
+@pytest.fixture
+def client(chatbot, monkeypatch):
+    monkeypatch.setattr(main, "_chatbot_manager", chatbot)
+    return TestClient(main.app)
+
+
+def _batch(*items):
+    return {"queries": [
+        item if isinstance(item, dict) else {"query": item, "top_k": 1} for item in items
+    ]}
+
+
+def test_batch_answers_in_request_order(client, chatbot, index_chunks, fake_embed, fake_reranker):
+    index_chunks("doc-1", PASSAGES[:1], document_name="one.pdf")
+    index_chunks("doc-2", PASSAGES[1:], document_name="two.pdf")
+    fake_embed.clear()
+    response = client.post("/api/query/batch", json=_batch(
+        {"query": "when are invoices due", "top_k": 1, "document_id": "doc-1"},
+        {"query": "how are refunds issued", "top_k": 1, "document_id": "doc-2",
+         "require_citations": False},
+        {"query": "anything", "top_k": 1, "document_id": "no-such-doc"},
+    ))
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["status"], body["succeeded"], body["failed"]) == ("success", 3, 0)
+    first, second, third = body["results"]
+    assert [r["index"] for r in body["results"]] == [0, 1, 2]
+    assert first["response"] == {
+        "answer": "The answer.", "citations": [{"document_name": "one.pdf", "page": 1}],
+    }
+    assert second["response"] == {"answer": "The answer."}
+    assert third["response"]["answer"] == NO_CONTEXT_ANSWER
+    # shared stages run once for the batch; the LLM only for queries with context
+    assert len(fake_embed) == 1 and len(fake_embed[0]) == 3
+    assert len(fake_reranker.calls) == 1
+    assert len(chatbot.llm.prompts) == 2
+    assert "Invoices are due" in chatbot.llm.prompts[0]
+
+
+def test_failed_llm_call_fails_only_its_item(client, chatbot, index_chunks):
+    index_chunks("doc-1", PASSAGES)
+    ainvoke = chatbot.llm.ainvoke
+
+    async def flaky(prompt):
+        if "question 1" in prompt:
+            raise RuntimeError("upstream timeout")
+        return await ainvoke(prompt)
+
+    chatbot.llm.ainvoke = flaky
+    response = client.post("/api/query/batch", json=_batch(*(f"question {i}" for i in range(3))))
+    body = response.json()
+    assert (body["status"], body["succeeded"], body["failed"]) == ("partial", 2, 1)
+    assert [r["status"] for r in body["results"]] == ["success", "error", "success"]
+    assert "upstream timeout" not in response.text
+
+
+def test_llm_calls_are_bounded_by_the_batch_concurrency(client, chatbot, index_chunks, monkeypatch):
+    index_chunks("doc-1", PASSAGES)
+    monkeypatch.setattr(db_settings, "QUERY_BATCH_LLM_CONCURRENCY", 2)
+    active, peak = [0], [0]
+    ainvoke = chatbot.llm.ainvoke
+
+    async def counted(prompt):
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(0.02)
+        try:
+            return await ainvoke(prompt)
+        finally:
+            active[0] -= 1
+
+    chatbot.llm.ainvoke = counted
+    body = client.post("/api/query/batch", json=_batch(*(f"q {i}" for i in range(6)))).json()
+    assert body["succeeded"] == 6
+    assert peak[0] == 2
+
+
+def test_repeated_batches_are_answered_from_the_cache(client, chatbot, index_chunks):
+    if chatbot.answer_cache is None:
+        pytest.skip("answer cache disabled")
+    index_chunks("doc-1", PASSAGES)
+    batch = _batch("when are invoices due", "how are refunds issued")
+    first = client.post("/api/query/batch", json=batch).json()
+    prompts = len(chatbot.llm.prompts)
+    assert client.post("/api/query/batch", json=batch).json() == first
+    assert len(chatbot.llm.prompts) == prompts
+
+
+def test_oversized_batch_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(db_settings, "QUERY_BATCH_MAX_ITEMS", 2)
+    response = client.post("/api/query/batch", json=_batch("a", "b", "c"))
+    assert response.status_code == 413
+
+
+def test_failed_batch_search_is_retried_per_item(client, chatbot, index_chunks, monkeypatch):
+    index_chunks("doc-1", PASSAGES[:1])
+    index_chunks("doc-2", PASSAGES[1:])
+    asearch = chatbot.vectors.asearch
+
+    async def broken_batch(requests):
+        raise RuntimeError("batch search down")
+
+    async def flaky(query_vector, limit=3, document_id=None, query_text=None):
+        if document_id == "doc-2":
+            raise RuntimeError("shard down")
+        return await asearch(query_vector, limit, document_id, query_text)
+
+    monkeypatch.setattr(chatbot.vectors, "asearch_batch", broken_batch)
+    monkeypatch.setattr(chatbot.vectors, "asearch", flaky)
+    response = client.post("/api/query/batch", json=_batch(
+        {"query": "when are invoices due", "top_k": 1, "document_id": "doc-1"},
+        {"query": "how are refunds issued", "top_k": 1, "document_id": "doc-2"},
+    ))
+    body = response.json()
+    assert (body["status"], body["succeeded"], body["failed"]) == ("partial", 1, 1)
+    assert [r["status"] for r in body["results"]] == ["success", "error"]
+    assert "Invoices are due" in chatbot.llm.prompts[0]
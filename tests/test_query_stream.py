@@ -0,0 +1,67 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+def _events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def client(chatbot, monkeypatch):
+    monkeypatch.setattr(main, "_chatbot_manager", chatbot)
+    return TestClient(main.app)
+
+
+def test_stream_sends_citations_then_tokens_then_done(client, chatbot, index_chunks):
+    index_chunks("doc-1", ["Refunds are issued to the original payment method."])
+    chatbot.llm.answer = "To the original method."
+
+    response = client.post("/api/query/stream", json={"query": "How are refunds issued?"})
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _events(response.text)
+    kinds = [kind for kind, _ in events]
+    assert kinds[0] == "citations" and kinds[-1] == "done" and set(kinds[1:-1]) == {"token"}
+    assert events[0][1]["citations"] == [{"document_name": "doc.pdf", "page": 1}]
+    assert "".join(data["text"] for kind, data in events if kind == "token").strip() == (
+        "To the original method."
+    )
+    conversation_id = events[-1][1]["conversation_id"]
+    assert events[0][1]["conversation_id"] == conversation_id
+
+    # the streamed answer was stored as a conversation turn
+    turns = main.conversation_store.history(conversation_id)
+    assert [t["answer"].strip() for t in turns] == ["To the original method."]
+
+
+def test_stream_without_context_sends_the_fallback_answer(client):
+    events = _events(client.post("/api/query/stream", json={"query": "anything?"}).text)
+    assert [kind for kind, _ in events] == ["citations", "token", "done"]
+    assert events[1][1]["text"] == "I couldn't find relevant information."
+
+
+def test_stream_reports_llm_errors_as_an_event(client, chatbot, index_chunks):
+    index_chunks("doc-1", ["Some text."])
+
+    async def broken(prompt):
+        raise RuntimeError("upstream down")
+        yield  # pragma: no cover
+
+    chatbot.llm.astream = broken
+    events = _events(client.post("/api/query/stream", json={"query": "text?"}).text)
+    assert events[-1] == ("error", {"detail": "Query failed, see server logs"})
+
+
+def test_unknown_conversation_is_rejected_before_streaming(client):
+    response = client.post(
+        "/api/query/stream", json={"query": "hi", "conversation_id": "no-such-conversation"}
+    )
+    assert response.status_code == 400
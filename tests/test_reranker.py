@@ -0,0 +1,136 @@
+from langchain.schema import Document as LCDocument
+
+from services.reranker import Reranker
+
+
+def _docs(*texts, scores=None):
+    scores = scores or [None] * len(texts)
+    return [
+        LCDocument(page_content=text, metadata={"_id": f"p{i}", "_score": score})
+        for i, (text, score) in enumerate(zip(texts, scores))
+    ]
+
+
+def test_pool_scales_with_top_k_within_bounds():
+    reranker = Reranker("ce", pool_factor=3, pool_min=5, pool_max=20)
+    assert reranker.pool_size(1) == 5
+    assert reranker.pool_size(4) == 12
+    assert reranker.pool_size(10) == 20
+
+
+def test_rerank_orders_by_cross_encoder_score(fake_reranker):
+    docs = _docs("nothing here", "reset the router password", "router lights")
+    ranked = Reranker("ce").rerank("how to reset router password", docs, top_k=2)
+    assert [d.page_content for d in ranked] == ["reset the router password", "router lights"]
+
+
+def test_repeated_pairs_come_from_the_cache(fake_reranker):
+    reranker = Reranker("ce")
+    docs = _docs("alpha beta", "beta gamma", "gamma delta")
+    reranker.rerank("beta", docs, top_k=1)
+    reranker.rerank("beta", docs[:2] + _docs("x", "y", "epsilon")[2:], top_k=1)
+
+    assert fake_reranker.calls == [3, 1]
+    stats = reranker.stats()
+    assert stats["pairs_scored"] == 4
+    assert stats["cache_hits"] == 2
+    assert stats["cache_entries"] == 4
+    assert stats["queries"] == 2
+
+
+def test_changed_text_under_the_same_id_is_rescored(fake_reranker):
+    reranker = Reranker("ce")
+    reranker.rerank("q", _docs("old text"), top_k=1)
+    reranker.rerank("q", _docs("new text"), top_k=1)
+    assert fake_reranker.calls == [1, 1]
+
+
+def test_cache_evicts_least_recently_used_pairs(fake_reranker):
+    reranker = Reranker("ce", cache_size=2)
+    a, b, c = _docs("a", "b", "c")
+    reranker.rerank("q", [a], 1)
+    reranker.rerank("q", [b], 1)
+    reranker.rerank("q", [a], 1)  # refreshes a
+    reranker.rerank("q", [c], 1)  # evicts b
+    assert fake_reranker.calls == [1, 1, 1]
+    reranker.rerank("q", [a], 1)
+    reranker.rerank("q", [b], 1)
+    assert fake_reranker.calls == [1, 1, 1, 1]
+
+
+def test_batch_scores_every_query_in_one_call(fake_reranker):
+    reranker = Reranker("ce")
+    first = _docs("red apple", "green pear")
+    second = _docs("blue sky", "grey sky rain")
+    results = reranker.rerank_batch([("green pear", first, 1), ("sky rain", second, 1)])
+
+    assert fake_reranker.calls == [4]
+    assert [r[0].page_content for r in results] == ["green pear", "grey sky rain"]
+    assert results == [
+        Reranker("ce").rerank("green pear", first, 1),
+        Reranker("ce").rerank("sky rain", second, 1),
+    ]
+    assert reranker.stats()["queries"] == 2
+
+
+def test_no_skip_without_a_margin(fake_reranker):
+    reranker = Reranker("ce")
+    reranker.rerank("q", _docs("a", "b", scores=[0.9, 0.1]), top_k=1)
+    assert fake_reranker.calls == [2]
+    assert reranker.stats()["skipped"] == 0
+
+
+def _fused(*texts, dense):
+    """Hybrid hits: ordered by RRF, with dense scores attached by the store."""
+    return [
+        LCDocument(
+            page_content=text,
+            metadata={"_id": f"p{i}", "_score": 1 / (2 + i), "_dense_score": score},
+        )
+        for i, (text, score) in enumerate(zip(texts, dense))
+    ]
+
+
+def test_skip_when_dense_scores_are_clearly_separated(fake_reranker):
+    reranker = Reranker("ce", skip_margin=0.2)
+    docs = _docs("a", "b", "c", scores=[0.9, 0.5, 0.45])
+    assert reranker.rerank("q", docs, top_k=1) == docs[:1]
+    assert fake_reranker.calls == []
+
+    reranker.rerank("q", docs, top_k=2)  # 0.5 vs 0.45: too close
+    assert fake_reranker.calls == [3]
+    assert reranker.stats()["skipped"] == 1
+
+
+def test_fused_results_are_judged_on_dense_scores(fake_reranker):
+    reranker = Reranker("ce", skip_margin=0.2)
+    # RRF scores (0.5, 0.33, 0.25) are far apart, the dense scores are not
+    reranker.rerank("q", _fused("a", "b", "c", dense=[0.81, 0.8, 0.79]), top_k=1)
+    assert fake_reranker.calls == [3]
+
+    # fused order is not dense order: the top_k must beat every other hit
+    reranker.rerank("q", _fused("d", "e", "f", dense=[0.9, 0.4, 0.85]), top_k=1)
+    assert fake_reranker.calls == [3, 3]
+
+    docs = _fused("g", "h", "i", dense=[0.9, 0.4, 0.6])
+    assert reranker.rerank("q", docs, top_k=1) == docs[:1]
+    assert fake_reranker.calls == [3, 3]
+
+
+def test_fused_results_without_dense_scores_are_reranked(fake_reranker):
+    reranker = Reranker("ce", skip_margin=0.01)
+    reranker.rerank("q", _fused("a", "b", dense=[None, None]), top_k=1)
+    assert fake_reranker.calls == [2]
+
+
+def test_batch_leaves_out_skipped_queries_and_cached_pairs(fake_reranker):
+    reranker = Reranker("ce", skip_margin=0.2)
+    clear = _docs("a", "b", "c", scores=[0.9, 0.5, 0.45])
+    close = _docs("red apple", "green pear", scores=[0.6, 0.59])
+    reranker.rerank("green pear", close[:1], 1)  # one pair already scored
+
+    results = reranker.rerank_batch([("q", clear, 1), ("green pear", close, 1), ("q", [], 1)])
+    assert results == [clear[:1], [close[1]], []]
+    assert fake_reranker.calls == [1, 1]  # only the uncached pair
+    assert reranker.stats()["skipped"] == 1
+    assert reranker.rerank_batch([]) == []
@@ -0,0 +1,24 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from storage.qdrant_client import document_filter
+
+
+def test_document_filters_are_compiled_once_per_id():
+    assert document_filter(None) is None
+    assert document_filter("doc-1") is document_filter("doc-1")
+    assert document_filter("doc-1") is not document_filter("doc-2")
+
+
+def test_concurrent_requests_keep_their_own_scope(chatbot, index_chunks):
+    index_chunks("doc-1", ["Invoices are due within thirty days."], document_name="one.pdf")
+    index_chunks("doc-2", ["Invoices are paid by bank transfer."], document_name="two.pdf")
+
+    def ask(i):
+        document_id = f"doc-{i % 2 + 1}"
+        _, citations = chatbot.get_response("invoices", top_k=3, document_id=document_id, use_cache=False)
+        return document_id, {c["document_name"] for c in citations}
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(ask, range(32)))
+    for document_id, names in results:
+        assert names == {"one.pdf" if document_id == "doc-1" else "two.pdf"}
@@ -0,0 +1,112 @@
+import asyncio
+import hashlib
+import io
+import os
+import zipfile
+
+import pytest
+from fastapi import FastAPI, HTTPException, Request, UploadFile
+from fastapi.testclient import TestClient
+
+from services import uploads
+from services.uploads import (
+    UploadSizeLimitMiddleware, extract_archive, spool_upload, unique_path,
+)
+
+
+def _spool(data: bytes, tmp_path, max_bytes: int):
+    upload = UploadFile(io.BytesIO(data), filename="doc.txt")
+    return asyncio.run(spool_upload(upload, str(tmp_path), ".txt", max_bytes))
+
+
+def test_spool_writes_and_hashes_in_one_pass(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "SPOOL_CHUNK_BYTES", 7)  # many chunks
+    data = b"some uploaded text " * 50
+    spooled = _spool(data, tmp_path, max_bytes=len(data))
+    assert spooled.size == len(data)
+    assert spooled.sha256 == hashlib.sha256(data).hexdigest()
+    assert open(spooled.path, "rb").read() == data
+    assert spooled.path.endswith(".txt")
+
+
+def test_spool_rejects_oversized_uploads_and_removes_the_partial_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "SPOOL_CHUNK_BYTES", 4)
+    with pytest.raises(HTTPException) as err:
+        _spool(b"x" * 100, tmp_path, max_bytes=10)
+    assert err.value.status_code == 413
+    assert os.listdir(tmp_path) == []
+
+
+def test_unique_path_never_overwrites(tmp_path):
+    first = unique_path(str(tmp_path), "../../etc/report.pdf")
+    assert first == str(tmp_path / "report.pdf")
+    open(first, "w").close()
+    assert unique_path(str(tmp_path), "report.pdf") == str(tmp_path / "1-report.pdf")
+
+
+def _zip(tmp_path, members):
+    path = tmp_path / "batch.zip"
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return str(path)
+
+
+def test_extract_archive_flattens_and_filters_members(tmp_path):
+    archive = _zip(tmp_path, {
+        "a/notes.txt": "one", "b/notes.txt": "two", "../evil.txt": "three",
+        "image.png": "skip", "c/": "",
+    })
+    out = tmp_path / "out"
+    out.mkdir()
+    written = extract_archive(archive, str(out), {"txt"}, max_bytes=1000)
+    assert sorted(os.path.basename(p) for p in written) == ["1-notes.txt", "evil.txt", "notes.txt"]
+    assert all(os.path.dirname(p) == str(out) for p in written)
+
+
+def test_extract_archive_counts_uncompressed_bytes(tmp_path):
+    archive = _zip(tmp_path, {"bomb.txt": "0" * 10_000})  # compresses to a few bytes
+    with pytest.raises(HTTPException) as err:
+        extract_archive(archive, str(tmp_path), {"txt"}, max_bytes=1000)
+    assert err.value.status_code == 413
+
+
+def test_extract_archive_rejects_non_zip_files(tmp_path):
+    path = tmp_path / "fake.zip"
+    path.write_bytes(b"not a zip")
+    with pytest.raises(HTTPException) as err:
+        extract_archive(str(path), str(tmp_path), {"txt"}, max_bytes=1000)
+    assert err.value.status_code == 400
+
+
+def _limited_app():
+    app = FastAPI()
+
+    @app.post("/api/upload")
+    async def upload(request: Request):
+        return {"size": len(await request.body())}
+
+    @app.post("/api/other")
+    async def other(request: Request):
+        return {"size": len(await request.body())}
+
+    app.add_middleware(UploadSizeLimitMiddleware, max_bytes=100, paths=("/api/upload",))
+    return TestClient(app, raise_server_exceptions=False)
+
+
+def test_middleware_refuses_a_declared_oversized_body():
+    client = _limited_app()
+    response = client.post("/api/upload", content=b"x" * 101)
+    assert response.status_code == 413
+    assert client.post("/api/upload", content=b"x" * 100).json() == {"size": 100}
+
+
+def test_middleware_counts_streamed_bodies():
+    client = _limited_app()
+
+    def chunks():  # chunked transfer: no Content-Length
+        for _ in range(5):
+            yield b"x" * 50
+
+    assert client.post("/api/upload", content=chunks()).status_code == 413
+    assert client.post("/api/other", content=chunks()).json() == {"size": 250}
@@ -0,0 +1,194 @@
+"""Behaviour every `VectorStore` backend must share (see also `benchmarks.vector_store`)."""
+import asyncio
+import subprocess
+import sys
+import uuid
+
+import numpy as np
+import pytest
+from qdrant_client.http.models import PointStruct
+
+from storage.local_index import IndexLockedError, LocalVectorStore
+from storage.vector_store import VECTOR_SIZE, VectorStore
+
+
+def _unit(rng, n):
+    vectors = rng.standard_normal((n, VECTOR_SIZE))
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture(params=["local", "qdrant"])
+def store(request, tmp_path):
+    if request.param == "local":
+        store = LocalVectorStore(str(tmp_path / "index"), VECTOR_SIZE, hnsw=False)
+    else:
+        from storage.qdrant_client import QdrantStore
+
+        store = QdrantStore()  # the shared in-process collection
+    store.ensure()
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def corpus(store):
+    """30 points over three documents: ``(docs, vectors, points)``."""
+    docs = [uuid.uuid4().hex for _ in range(3)]
+    vectors = _unit(np.random.default_rng(7), 30)
+    points = [
+        PointStruct(
+            id=str(uuid.uuid4()),
+            vector=vector.tolist(),
+            payload={"document_id": docs[i % 3], "document_name": "a.txt", "page": i},
+        )
+        for i, vector in enumerate(vectors)
+    ]
+    before = store.count()
+    store.upsert(points, wait=True)
+    assert store.count() == before + 30
+    yield docs, vectors, points
+    for doc in docs:
+        store.delete_document(doc)
+
+
+def _ids(points, document_id):
+    return {p.id for p in points if p.payload["document_id"] == document_id}
+
+
+def test_document_ids(store, corpus):
+    docs, _, points = corpus
+    for doc in docs:
+        assert store.document_ids(doc) == _ids(points, doc)
+    assert store.document_ids("no-such-doc") == set()
+
+
+def test_nearest_is_self_with_payload(store, corpus):
+    _, vectors, points = corpus
+    hit = store.search(vectors[4].tolist(), limit=1)[0]
+    assert hit.id == points[4].id
+    assert hit.score == pytest.approx(1.0, abs=1e-3)
+    assert hit.payload == points[4].payload
+
+
+def test_results_are_ordered_and_limited(store, corpus):
+    _, vectors, _ = corpus
+    hits = store.search(vectors[0].tolist(), limit=7)
+    scores = [h.score for h in hits]
+    assert len(hits) == 7 and scores == sorted(scores, reverse=True)
+
+
+def test_search_is_scoped_to_the_document(store, corpus):
+    docs, vectors, points = corpus
+    hits = store.search(vectors[0].tolist(), limit=50, document_id=docs[1])
+    assert {h.id for h in hits} == _ids(points, docs[1])
+    assert store.search(vectors[0].tolist(), limit=5, document_id="no-such-doc") == []
+
+
+def test_batch_and_async_search_match_search(store, corpus):
+    docs, vectors, _ = corpus
+    requests = [(vectors[i].tolist(), 5, doc, None) for i, doc in ((0, None), (1, None), (2, docs[2]))]
+    expected = [[h.id for h in store.search(*r)] for r in requests]
+    assert [[h.id for h in hits] for hits in store.search_batch(requests)] == expected
+    batch = asyncio.run(store.asearch_batch(requests))
+    assert [[h.id for h in hits] for hits in batch] == expected
+    assert [h.id for h in asyncio.run(store.asearch(*requests[2]))] == expected[2]
+
+
+def test_upsert_overwrites_in_place(store, corpus):
+    docs, _, points = corpus
+    before = store.count()
+    moved = _unit(np.random.default_rng(8), 1)[0].tolist()
+    store.upsert([PointStruct(id=points[3].id, vector=moved,
+                              payload={**points[3].payload, "document_id": docs[1]})])
+    assert store.count() == before
+    hit = store.search(moved, limit=1)[0]
+    assert hit.id == points[3].id and hit.payload["document_id"] == docs[1]
+    assert points[3].id not in store.document_ids(docs[0])
+    assert points[3].id in store.document_ids(docs[1])
+
+
+def test_delete_points_only_touches_the_document(store, corpus):
+    docs, _, points = corpus
+    own = sorted(_ids(points, docs[0]))[:3]
+    foreign = sorted(_ids(points, docs[2]))[:1]
+    store.delete_points(docs[0], own + foreign)
+    assert store.document_ids(docs[0]) == _ids(points, docs[0]) - set(own)
+    assert store.document_ids(docs[2]) == _ids(points, docs[2])
+
+
+def test_delete_document(store, corpus):
+    docs, vectors, points = corpus
+    before = store.count()
+    store.delete_document(docs[0])
+    assert store.document_ids(docs[0]) == set()
+    assert store.search(vectors[0].tolist(), limit=5, document_id=docs[0]) == []
+    assert store.count() == before - 10
+    assert store.document_ids(docs[1]) == _ids(points, docs[1])
+
+
+def test_rename_document(store, corpus):
+    docs, vectors, _ = corpus
+    store.rename_document(docs[0], "b.txt")
+    names = {
+        doc: {h.payload["document_name"]
+              for h in store.search(vectors[0].tolist(), limit=50, document_id=doc)}
+        for doc in docs
+    }
+    assert names == {docs[0]: {"b.txt"}, docs[1]: {"a.txt"}, docs[2]: {"a.txt"}}
+
+
+def test_backends_implement_the_whole_interface():
+    class Partial(VectorStore):
+        def search(self, query_vector, limit=3, document_id=None, query_text=None):
+            return []
+
+    with pytest.raises(TypeError, match="upsert"):
+        Partial()
+
+
+# ───────────────────── local index only ─────────────────────
+def _open_elsewhere(path):
+    code = (
+        "import sys; from storage.local_index import LocalVectorStore, IndexLockedError\n"
+        f"store = LocalVectorStore({path!r}, {VECTOR_SIZE})\n"
+        "try:\n    store.ensure()\nexcept IndexLockedError as exc:\n    sys.exit(str(exc))\n"
+    )
+    return subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+
+
+def test_local_index_has_one_writer_process(tmp_path):
+    path = str(tmp_path / "index")
+    store = LocalVectorStore(path, VECTOR_SIZE, hnsw=False)
+    store.ensure()
+    refused = _open_elsewhere(path)
+    assert refused.returncode != 0 and "in use by pid" in refused.stderr
+    with pytest.raises(IndexLockedError):
+        LocalVectorStore(path, VECTOR_SIZE, hnsw=False).ensure()
+
+    store.close()
+    assert _open_elsewhere(path).returncode == 0
+
+
+def test_local_index_survives_reopen(tmp_path):
+    path = str(tmp_path / "index")
+    vector = _unit(np.random.default_rng(9), 1)[0].tolist()
+    store = LocalVectorStore(path, VECTOR_SIZE, hnsw=False)
+    store.upsert([PointStruct(id=str(uuid.uuid4()), vector=vector, payload={"document_id": "d"})])
+    store.close()
+    again = LocalVectorStore(path, VECTOR_SIZE, hnsw=False)
+    assert again.search(vector, limit=1)[0].payload == {"document_id": "d"}
+    again.close()
+
+
+def test_rows_reused_by_another_document_are_filtered_out(tmp_path):
+    store = LocalVectorStore(str(tmp_path / "index"), VECTOR_SIZE, hnsw=False)
+    vectors = _unit(np.random.default_rng(10), 2).tolist()
+    store.upsert([PointStruct(id=str(uuid.uuid4()), vector=vectors[0], payload={"document_id": "a"})])
+    [row] = store._doc_rows["a"]
+    # between a scan of document "a" and the payload fetch, its row is freed and reused
+    store.delete_document("a")
+    store.upsert([PointStruct(id=str(uuid.uuid4()), vector=vectors[1], payload={"document_id": "b"})])
+    assert store._doc_rows["b"] == {row}
+    assert store._scored([row], [1.0], "a") == []
+    assert [p.payload["document_id"] for p in store._scored([row], [1.0])] == ["b"]
+    store.close()